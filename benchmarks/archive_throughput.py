@@ -0,0 +1,159 @@
+"""导出、导入历史记录的吞吐量和内存（不依赖 Qt）
+
+    python benchmarks/archive_throughput.py                 # 1M 条
+    python benchmarks/archive_throughput.py --count 100000 --keep
+
+先直接向临时目录的 history.db 写入 count 条典型内容，然后分别导出为
+不压缩的 .jsonl 和 gzip 压缩的 .jsonl.gz，再导入到一个空的数据库；
+最后模拟导入到一半被中断，再从断点继续。导出、导入期间每一批采样一次
+常驻内存，峰值不应随条数增长。
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from blob_store import BlobStore  # noqa: E402
+from clip_archive import ArchiveImporter, export_records, write_archive  # noqa: E402
+from clip_history import bytes_digest  # noqa: E402
+from clip_store import create_schema  # noqa: E402
+from entry_memory import resident_bytes, typical_texts  # noqa: E402
+
+MB = 1024 * 1024
+
+
+class Interrupted(Exception):
+    pass
+
+
+def fill(db_path, count):
+    """写入 count 条互不相同的典型内容，返回正文的总字节数"""
+    conn = sqlite3.connect(db_path)
+    create_schema(conn)
+    total = 0
+    now = time.time()
+
+    def rows():
+        nonlocal total
+        for seq, text in enumerate(typical_texts(count), 1):
+            data = text.encode('utf-8')
+            total += len(data)
+            yield bytes_digest(data), seq, now - count + seq, text
+
+    with conn:
+        conn.executemany('INSERT INTO clips(digest, seq, created, text) VALUES (?, ?, ?, ?)', rows())
+    conn.close()
+    return total
+
+
+class PeakMemory:
+    """在回调里采样常驻内存，记录相对开始时的峰值增量"""
+
+    def __init__(self):
+        self.start = resident_bytes()
+        self.peak = 0
+
+    def sample(self, *args):
+        current = resident_bytes()
+        if current is not None and self.start is not None:
+            self.peak = max(self.peak, current - self.start)
+
+    def sampled(self, records, every=1000):
+        for i, record in enumerate(records):
+            if i % every == 0:
+                self.sample()
+            yield record
+
+
+def run_export(db_path, blob_store, path, level):
+    peak = PeakMemory()
+    started = time.perf_counter()
+    count = write_archive(path, peak.sampled(export_records(db_path, blob_store)), level)
+    return count, time.perf_counter() - started, os.path.getsize(path), peak.peak
+
+
+def run_import(db_path, blob_store, path, stop_at=None):
+    peak = PeakMemory()
+
+    def progress(position):
+        peak.sample()
+        if stop_at is not None and position >= stop_at:
+            raise Interrupted()
+
+    importer = ArchiveImporter(db_path, blob_store)
+    started = time.perf_counter()
+    try:
+        added, skipped = importer.run(path, progress)
+    except Interrupted:
+        added = skipped = None
+    finally:
+        importer.close()
+    return added, skipped, time.perf_counter() - started, peak.peak
+
+
+def count_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute('SELECT COUNT(*) FROM clips').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ClipList export/import throughput')
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--level', type=int, default=1, help='gzip level')
+    parser.add_argument('--keep', action='store_true', help='keep the temporary directory')
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.mkdtemp(prefix='cliplist-archive-')
+    try:
+        source = os.path.join(tmp, 'source.db')
+        blob_store = BlobStore(os.path.join(tmp, 'blobs'))
+        started = time.perf_counter()
+        raw = fill(source, args.count)
+        print(f"filled {args.count} entries ({raw / MB:.0f} MB of text) in {time.perf_counter() - started:.1f} s")
+
+        for name in ('archive.jsonl', 'archive.jsonl.gz'):
+            path = os.path.join(tmp, name)
+            count, seconds, size, peak = run_export(source, blob_store, path, args.level)
+            print(f"export {name:<18} {count / seconds:>9.0f} entries/s {raw / MB / seconds:>7.1f} MB/s "
+                  f"file {size / MB:>7.1f} MB  peak rss +{peak / MB:.1f} MB")
+
+        for name in ('archive.jsonl', 'archive.jsonl.gz'):
+            target = os.path.join(tmp, name + '.db')
+            added, skipped, seconds, peak = run_import(target, blob_store, os.path.join(tmp, name))
+            print(f"import {name:<18} {added / seconds:>9.0f} entries/s {raw / MB / seconds:>7.1f} MB/s "
+                  f"added {added}  peak rss +{peak / MB:.1f} MB")
+
+        # 中断后继续：先导入一半，再对同一个归档重新运行
+        path = os.path.join(tmp, 'archive.jsonl.gz')
+        target = os.path.join(tmp, 'resume.db')
+        _, _, first, _ = run_import(target, blob_store, path, stop_at=args.count // 2)
+        partial = count_rows(target)
+        added, skipped, second, _ = run_import(target, blob_store, path)
+        total = count_rows(target)
+        print(f"resume: interrupted with {partial} rows after {first:.1f} s, "
+              f"resumed +{added} in {second:.1f} s, total {total} "
+              f"({'ok' if total == args.count else 'MISMATCH'})")
+
+        # 再次导入同一个归档到已有这些内容的数据库：全部按哈希跳过
+        again = os.path.join(tmp, 'archive.jsonl')
+        added, skipped, seconds, _ = run_import(os.path.join(tmp, 'archive.jsonl.gz.db'), blob_store, again)
+        print(f"dedup: {skipped} skipped, {added} added in {seconds:.1f} s")
+    finally:
+        if args.keep:
+            print(f"kept {tmp}")
+        else:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+"""每 10k 条典型剪贴板内容占用的内存（不依赖 Qt）
+
+    python benchmarks/entry_memory.py
+    python benchmarks/entry_memory.py --count 50000 --index
+
+典型内容按固定种子生成：七成是短文本（一句话、路径、链接），两成多是
+几百到几千字符的段落或代码，少量是几万字符的日志。文本边生成边加入
+历史记录，不额外保留原始字符串，因此测到的就是历史记录本身占用的内存。
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from clip_history import ClipHistory  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+
+SEED = 20240501
+WORDS = ('clip', 'list', 'paste', 'copy', 'window', 'python', 'qt', 'history',
+         '剪贴板', '历史', '搜索', '快捷键', 'http://example.com/', 'C:\\Users\\',
+         'def', 'return', 'import', '{"key": 1}', 'select', 'from', 'self.', '\n    ')
+
+
+def typical_texts(count, seed=SEED):
+    rng = random.Random(seed)
+    for i in range(count):
+        roll = rng.random()
+        if roll < 0.7:
+            words = rng.randint(3, 30)
+        elif roll < 0.95:
+            words = rng.randint(30, 600)
+        else:
+            words = rng.randint(600, 8000)
+        yield f"{' '.join(rng.choices(WORDS, k=words))} #{i}"
+
+
+def resident_bytes():
+    """当前进程的常驻内存，无法获取时返回 None"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def measure(count, with_index=False):
+    gc.collect()
+    rss_before = resident_bytes()
+    tracemalloc.start()
+    history = ClipHistory()
+    index = SearchIndex(history) if with_index else None
+    raw = 0
+    for text in typical_texts(count):
+        raw += len(text.encode('utf-8'))
+        history.add(text)
+    gc.collect()
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    rss_after = resident_bytes()
+    result = {
+        'entries': len(history),
+        'raw_bytes': raw,
+        'heap_bytes': heap,
+        'rss_bytes': rss_after - rss_before if rss_before is not None else None,
+    }
+    del index, history
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ClipList memory per entry')
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--index', action='store_true', help='include the search index')
+    args = parser.parse_args(argv)
+
+    result = measure(args.count, args.index)
+    scale = 10000 / result['entries']
+    mb = 1024 * 1024
+    print(f"{result['entries']} entries, raw content {result['raw_bytes'] / mb:.1f} MB")
+    print(f"python heap   {result['heap_bytes'] / mb:8.2f} MB"
+          f"   {result['heap_bytes'] * scale / mb:8.2f} MB per 10k")
+    if result['rss_bytes'] is not None:
+        print(f"resident      {result['rss_bytes'] / mb:8.2f} MB"
+              f"   {result['rss_bytes'] * scale / mb:8.2f} MB per 10k")
+
+
+if __name__ == '__main__':
+    main()
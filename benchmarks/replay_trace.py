@@ -0,0 +1,241 @@
+"""重放记录下来的剪贴板事件（见 src/clip_trace.py）
+
+    python benchmarks/replay_trace.py trace.jsonl              # 尽快重放
+    python benchmarks/replay_trace.py trace.jsonl --speed 1    # 按记录时的节奏实时重放
+    python benchmarks/replay_trace.py trace.jsonl --json out.json
+
+与 run_benchmarks.py 一样在 offscreen Qt 平台上用 FakeBackend 创建 ClipboardManager，
+先按记录开始时的条数填入历史，再逐个重放事件：
+
+- copy:   QClipboard.setText（经 on_clipboard_change 和合并窗口）到条目出现在最前
+- image:  QClipboard.setImage 到图片条目加入历史
+- hotkey: 按下 alt+N（10 为 alt+0，更大的编号为 alt+shift+十位、个位）到发出 ctrl+v
+- paste / drag: handle_paste，拖拽无法在 offscreen 平台执行，以标记使用并设置剪贴板代替
+- remove: remove_item
+
+内容由哈希和长度生成（clip_trace.synthetic_text），去重和重新复制与记录时一致。
+每隔 --check-every 个事件以及结束时，检查列表模型的每一行是否与历史记录的顺序一致。
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from run_benchmarks import Harness, make_texts, percentiles, wait_until  # noqa: E402
+
+from PyQt5.QtGui import QColor, QImage  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+from clip_history import content_digest  # noqa: E402
+from clip_trace import read_trace, synthetic_text  # noqa: E402
+
+
+class Replay:
+    def __init__(self, app, header, speed, check_every):
+        self.app = app
+        self.speed = speed
+        self.check_every = check_every
+        self.harness = Harness(app, header.get('history'))
+        self.manager = self.harness.manager
+        self.history = self.manager.clip_history
+        self.backend = self.harness.backend
+        self.harness.fill(make_texts(int(header.get('items', 0))))
+        # 记录中的哈希 -> 重放时的文本
+        self.texts = {}
+        self.samples = {}
+        self.skipped = {}
+        self.checks = 0
+        self.mismatches = []
+        self.images = 0
+
+    def run(self, events):
+        started = time.perf_counter()
+        for position, event in enumerate(events, 1):
+            if self.speed:
+                self._wait_until(started + event.get('t', 0) / 1000 / self.speed)
+            handler = getattr(self, 'on_' + str(event.get('e')), None)
+            if handler is None:
+                self._skip(event.get('e'))
+            else:
+                handler(event)
+            if self.check_every and position % self.check_every == 0:
+                self.check(position)
+        # 等后台写盘、识别等都处理完再做最后一次检查
+        self.app.processEvents()
+        self.check('end')
+        return time.perf_counter() - started
+
+    def _wait_until(self, deadline):
+        while time.perf_counter() < deadline:
+            self.app.processEvents()
+            time.sleep(0.001)
+
+    def _sample(self, kind, seconds):
+        self.samples.setdefault(kind, []).append(seconds)
+
+    def _skip(self, kind):
+        self.skipped[kind] = self.skipped.get(kind, 0) + 1
+
+    def _entry(self, event):
+        text = self.texts.get(event.get('h'))
+        return self.history.get_by_digest(content_digest(text)) if text is not None else None
+
+    def on_copy(self, event):
+        text = self.texts.setdefault(event['h'], synthetic_text(event['h'], event.get('n', 0)))
+        digest = content_digest(text)
+
+        def at_front():
+            entry = self.history.get_by_digest(digest)
+            return entry is not None and self.history.row_of_entry(entry) == 0
+
+        started = time.perf_counter()
+        self.manager.clipboard.setText(text)
+        self._sample('copy', wait_until(self.app, at_front) - started)
+
+    def on_image(self, event):
+        # 每张图片颜色不同，不会被当成重复的图片
+        self.images += 1
+        width, height = event.get('px', (1, 1))
+        image = QImage(max(1, width), max(1, height), QImage.Format_RGB32)
+        image.fill(QColor.fromRgb(self.images * 2654435761 & 0xFFFFFF))
+        count = len(self.history)
+        started = time.perf_counter()
+        self.manager.clipboard.setImage(image)
+        self._sample('image', wait_until(self.app, lambda: len(self.history) > count) - started)
+
+    def on_hotkey(self, event):
+        number = event['n']
+        with self.history.lock:
+            entry = self.manager.order.get_by_number(number)
+        if entry is None:
+            self._skip('hotkey')
+            return
+        count = len(self.backend.pastes)
+        started = time.perf_counter()
+        for combo in hotkey_combos(number):
+            self.backend.press(combo)
+        if not self.backend.wait_for_pastes(count + 1):
+            raise TimeoutError('paste did not happen')
+        self._sample('hotkey', self.backend.pastes[-1][0] - started)
+        # 粘贴完成后的记录和自动删除在界面线程里排队执行
+        self.app.processEvents()
+
+    def on_paste(self, event):
+        entry = self._entry(event)
+        if entry is None:
+            self._skip(event['e'])
+            return
+        started = time.perf_counter()
+        if event['e'] == 'drag':
+            self.history.mark_pasted(entry.id)
+            self.manager.set_clipboard(entry)
+        else:
+            self.manager.handle_paste(entry.id)
+        self._sample(event['e'], time.perf_counter() - started)
+
+    on_drag = on_paste
+
+    def on_remove(self, event):
+        entry = self._entry(event)
+        if entry is None:
+            self._skip('remove')
+            return
+        started = time.perf_counter()
+        self.manager.remove_item(entry.id)
+        self._sample('remove', time.perf_counter() - started)
+
+    def check(self, position):
+        """列表模型与历史记录（按当前排列顺序）逐行比较"""
+        self.checks += 1
+        model = self.manager.list_model
+        order = self.manager.order
+        problems = []
+        if model.rowCount() != len(order):
+            problems.append(f'{model.rowCount()} rows, {len(order)} entries')
+        for row in range(min(model.rowCount(), len(order))):
+            shown, expected = model.entry_at_row(row), order.entry_at(row)
+            if shown is not expected:
+                problems.append(f'row {row}: {shown!r} != {expected!r}')
+                break
+        if problems:
+            self.mismatches.append({'event': position, 'problems': problems})
+
+    def results(self, seconds, events):
+        return {
+            'events': events,
+            'seconds': seconds,
+            'entries': len(self.history),
+            'latency': {kind: percentiles(values) for kind, values in self.samples.items()},
+            'skipped': self.skipped,
+            'checks': self.checks,
+            'mismatches': self.mismatches,
+        }
+
+    def close(self):
+        self.harness.close()
+
+
+def hotkey_combos(number):
+    """默认快捷键（hotkeys.default_keymap）中粘贴第 number 条要依次按下的组合"""
+    if number < 10:
+        return [f'alt+{number}']
+    if number == 10:
+        return ['alt+0']
+    return [f'alt+shift+{number // 10}', str(number % 10)]
+
+
+def report(results):
+    print(f"{results['events']} events in {results['seconds']:.1f} s, {results['entries']} entries at the end")
+    for kind, stats in sorted(results['latency'].items()):
+        print(f"{kind:<8} n={stats['count']:<6} mean {stats['mean_ms']:8.2f} ms  p50 {stats['p50_ms']:8.2f} ms  "
+              f"p95 {stats['p95_ms']:8.2f} ms  max {stats['max_ms']:8.2f} ms")
+    if results['skipped']:
+        print('skipped (item not in history): ' + ', '.join(f'{k} {v}' for k, v in results['skipped'].items()))
+    if results['mismatches']:
+        print(f"list and history DIFFER at {len(results['mismatches'])} of {results['checks']} checks:")
+        for mismatch in results['mismatches'][:10]:
+            print(f"  after event {mismatch['event']}: {'; '.join(mismatch['problems'])}")
+    else:
+        print(f"list and history consistent at all {results['checks']} checks")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a ClipList event trace')
+    parser.add_argument('trace')
+    parser.add_argument('--speed', type=float, default=0,
+                        help='1 = recorded pace, 2 = twice as fast, 0 = as fast as possible')
+    parser.add_argument('--check-every', type=int, default=100,
+                        help='compare list and history every N events (0 = only at the end)')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args(argv)
+
+    header, events = read_trace(args.trace)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    replay = Replay(app, header, args.speed, args.check_every)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for event in events:
+            count += 1
+            yield event
+
+    try:
+        seconds = replay.run(counted())
+        results = replay.results(seconds, count)
+    finally:
+        replay.close()
+    report(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return 1 if results['mismatches'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""ClipList 无界面基准测试
+
+在 offscreen Qt 平台上运行，系统剪贴板之外的系统交互（全局快捷键、模拟粘贴）
+由 FakeBackend 代替，Linux 上也能运行。数据写入临时目录，不会碰真实的历史记录。
+
+    python benchmarks/run_benchmarks.py                      # 1k / 10k / 100k
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 --json out.json
+    python benchmarks/run_benchmarks.py --compare base.json  # 与之前的结果对比
+
+测试内容：
+- capture_to_visible: QClipboard.setText 到新行插入视图的延迟（包含合并窗口）
+- hotkey_to_paste:    FakeBackend 按下 alt+1 到发出 ctrl+v 的延迟
+- memory_per_entry:   ClipHistory + SearchIndex 每个条目占用的内存
+- list_insert / list_remove: 已有 N 个条目时插入、删除一行（模型、视图、索引、存储）的耗时
+- scroll_frame:       已有 N 个条目时滚动到随机位置并重绘一帧的耗时
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'src'))
+
+from PyQt5.QtCore import QT_VERSION_STR, PYQT_VERSION_STR  # noqa: E402
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+from clip_backend import FakeBackend  # noqa: E402
+from clip_history import ClipHistory  # noqa: E402
+from search_index import SearchIndex  # noqa: E402
+
+SEED = 20240501
+WORDS = ('clip', 'list', 'paste', 'copy', 'window', 'python', 'qt', 'history',
+         '剪贴板', '历史', '搜索', '快捷键', 'http://example.com/', 'C:\\Users\\',
+         'def', 'return', 'import', '{"key": 1}', 'select', 'from')
+
+
+def make_texts(count, seed=SEED):
+    """固定种子生成互不相同的文本，每次运行结果可比"""
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        words = rng.choices(WORDS, k=rng.randint(3, 30))
+        texts.append(f"{' '.join(words)} #{i}")
+    return texts
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'mean_ms': sum(values) / len(values) * 1000,
+        'p50_ms': values[len(values) // 2] * 1000,
+        'p95_ms': values[min(len(values) - 1, int(len(values) * 0.95))] * 1000,
+        'max_ms': values[-1] * 1000,
+    }
+
+
+def wait_until(app, predicate, timeout=5.0):
+    deadline = time.perf_counter() + timeout
+    while not predicate():
+        if time.perf_counter() > deadline:
+            raise TimeoutError('benchmark step timed out')
+        app.processEvents()
+    return time.perf_counter()
+
+
+class Harness:
+    """在临时目录里创建一个使用 FakeBackend 的 ClipboardManager"""
+
+    def __init__(self, app, history_settings=None):
+        from clipboard_manager import ClipboardManager
+        self.app = app
+        self.data_dir = tempfile.mkdtemp(prefix='cliplist-bench-')
+        # 不限制条目数和大小，否则大规模测试会被默认上限截断
+        history = {'max_entries': None, 'max_bytes': None, **(history_settings or {})}
+        with open(os.path.join(self.data_dir, 'settings.json'), 'w', encoding='utf-8') as f:
+            json.dump({'history': history}, f)
+        self.backend = FakeBackend()
+        self.manager = ClipboardManager(backend=self.backend, data_dir=self.data_dir)
+        # 基准测试需要列表保持不变
+        self.manager.auto_delete.setChecked(False)
+        self.manager.show()
+        # 托盘和快捷键在第一帧之后才初始化
+        wait_until(app, lambda: self.manager.startup_complete)
+
+    def fill(self, texts):
+        self.manager.clip_history.add_many([(text, {}) for text in texts])
+        if self.manager.history_store is not None:
+            self.manager.history_store.flush()
+        self.app.processEvents()
+
+    def close(self):
+        manager = self.manager
+        if manager.history_store is not None:
+            manager.history_store.flush()
+        manager.paste_worker.stop()
+        manager.search_controller.shutdown()
+        manager.format_pipeline.shutdown()
+        manager.classifier.shutdown()
+        if manager.history_store is not None:
+            manager.history_store.close()
+        manager.tray_icon.hide()
+        manager.close()
+        manager.deleteLater()
+        self.app.processEvents()
+        shutil.rmtree(self.data_dir, ignore_errors=True)
+
+
+def bench_capture_to_visible(app, repeat):
+    harness = Harness(app)
+    model = harness.manager.list_model
+    inserted = []
+    model.rowsInserted.connect(lambda *args: inserted.append(time.perf_counter()))
+    samples = []
+    try:
+        for i, text in enumerate(make_texts(repeat, SEED + 1)):
+            count = len(inserted)
+            started = time.perf_counter()
+            harness.manager.clipboard.setText(text)
+            wait_until(app, lambda: len(inserted) > count)
+            samples.append(inserted[-1] - started)
+    finally:
+        harness.close()
+    return percentiles(samples)
+
+
+def bench_hotkey_to_paste(app, repeat):
+    harness = Harness(app)
+    backend = harness.backend
+    samples = []
+    try:
+        harness.fill(make_texts(20, SEED + 2))
+        for i in range(repeat):
+            count = len(backend.pastes)
+            started = time.perf_counter()
+            backend.press(f'alt+{i % 9 + 1}')
+            if not backend.wait_for_pastes(count + 1):
+                raise TimeoutError('paste did not happen')
+            samples.append(backend.pastes[-1][0] - started)
+    finally:
+        harness.close()
+    return percentiles(samples)
+
+
+def bench_memory(size):
+    texts = make_texts(size)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    history = ClipHistory()
+    index = SearchIndex(history)
+    history.add_many([(text, {}) for text in texts])
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    text_bytes = sum(sys.getsizeof(text) for text in texts)
+    del index, history
+    return {
+        'bytes_per_entry': (after - before) / size,
+        'text_bytes_per_entry': text_bytes / size,
+    }
+
+
+def bench_list_updates(app, size, repeat):
+    harness = Harness(app)
+    history = harness.manager.clip_history
+    insert_samples = []
+    remove_samples = []
+    try:
+        harness.fill(make_texts(size))
+        for text in make_texts(repeat, SEED + 3):
+            started = time.perf_counter()
+            entry, _ = history.add(f'bench {text}')
+            app.processEvents()
+            insert_samples.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            harness.manager.remove_item(entry.id)
+            app.processEvents()
+            remove_samples.append(time.perf_counter() - started)
+    finally:
+        harness.close()
+    return {'insert': percentiles(insert_samples), 'remove': percentiles(remove_samples)}
+
+
+def bench_scroll(app, size, repeat):
+    harness = Harness(app)
+    view = harness.manager.list_widget
+    samples = []
+    try:
+        harness.fill(make_texts(size))
+        # 分页载入只在真实滚动到底部时发生，这里直接在已载入的行之间跳转
+        rng = random.Random(SEED + 4)
+        scrollbar = view.verticalScrollBar()
+        for _ in range(repeat):
+            started = time.perf_counter()
+            scrollbar.setValue(rng.randint(0, scrollbar.maximum()))
+            view.viewport().repaint()
+            samples.append(time.perf_counter() - started)
+    finally:
+        harness.close()
+    return percentiles(samples)
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=ROOT, stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, repeat):
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    results = {
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'qt': QT_VERSION_STR,
+        'pyqt': PYQT_VERSION_STR,
+        'platform': platform.platform(),
+        'seed': SEED,
+        'benchmarks': {},
+    }
+    benchmarks = results['benchmarks']
+    benchmarks['capture_to_visible'] = bench_capture_to_visible(app, repeat)
+    benchmarks['hotkey_to_paste'] = bench_hotkey_to_paste(app, repeat)
+    for size in sizes:
+        benchmarks[f'memory_per_entry/{size}'] = bench_memory(size)
+        updates = bench_list_updates(app, size, repeat)
+        benchmarks[f'list_insert/{size}'] = updates['insert']
+        benchmarks[f'list_remove/{size}'] = updates['remove']
+        benchmarks[f'scroll_frame/{size}'] = bench_scroll(app, size, repeat)
+    return results
+
+
+def flatten(results):
+    """{'name.metric': value}，用于打印和对比"""
+    flat = {}
+    for name, metrics in results['benchmarks'].items():
+        for metric, value in metrics.items():
+            if metric != 'count':
+                flat[f'{name}.{metric}'] = value
+    return flat
+
+
+def report(results, baseline=None):
+    print(f"revision {results['revision']}  python {results['python']}  "
+          f"Qt {results['qt']}  {results['platform']}")
+    old = flatten(baseline) if baseline else {}
+    if baseline:
+        print(f"compared with revision {baseline.get('revision')}")
+    for key, value in flatten(results).items():
+        line = f'{key:<42} {value:>14.3f}'
+        if key in old and old[key]:
+            line += f'   {(value - old[key]) / old[key] * 100:+7.1f}%'
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='ClipList headless benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=50, help='samples per latency benchmark')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='previous --json output to compare against')
+    args = parser.parse_args(argv)
+
+    results = run(args.sizes, args.repeat)
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,6 @@
 import PyInstaller.__main__
 import os
+import sys
 
 # 获取当前脚本所在目录
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -23,9 +24,15 @@ pyinstaller_args = [
     '--windowed',  # 无控制台窗口
     '--noconfirm',  # 覆盖已存在的构建目录
     '--clean',  # 清理临时文件
-    '--onefile',  # 打包成单个exe文件
 ]
 
+# --onefile 每次启动都要先解压到临时目录，启动明显变慢；
+# python build.py --onedir 打包成目录，启动更快
+if '--onedir' in sys.argv[1:]:
+    pyinstaller_args.append('--onedir')
+else:
+    pyinstaller_args.append('--onefile')  # 打包成单个exe文件
+
 # 添加图标文件
 for icon_file, icon_dir in icon_files:
     pyinstaller_args.extend(['--add-data', f'{icon_file};{icon_dir}'])
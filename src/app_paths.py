@@ -0,0 +1,12 @@
+import os
+import sys
+
+
+def default_data_dir():
+    """程序数据目录：Windows 下为 %APPDATA%\\ClipList，其它系统为 ~/.cliplist"""
+    if sys.platform == 'win32' and os.environ.get('APPDATA'):
+        path = os.path.join(os.environ['APPDATA'], 'ClipList')
+    else:
+        path = os.path.join(os.path.expanduser('~'), '.cliplist')
+    os.makedirs(path, exist_ok=True)
+    return path
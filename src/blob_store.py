@@ -0,0 +1,93 @@
+import codecs
+import logging
+import mmap
+import os
+import shutil
+import tempfile
+
+log = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """按内容哈希寻址的大文件存储
+
+    超大的剪贴板内容只以 UTF-8 字节写入磁盘一次，文件名即内容哈希，
+    相同内容天然只保存一份。读取时用 mmap 映射，只有真正粘贴或拖拽时
+    才解码成完整的字符串。
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, digest):
+        name = digest.hex()
+        return os.path.join(self.root, name[:2], name)
+
+    def contains(self, digest):
+        return os.path.exists(self.path_for(digest))
+
+    def put(self, digest, data):
+        """写入内容；已存在时直接返回"""
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            return path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再改名，中途退出不会留下不完整的 blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def _map(self, digest):
+        with open(self.path_for(digest), 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def read_bytes(self, digest):
+        with self._map(digest) as mm:
+            return mm[:]
+
+    def read_text(self, digest):
+        return self.read_bytes(digest).decode('utf-8')
+
+    def read_prefix(self, digest, chars):
+        """读取开头的 chars 个字符（只映射所需的字节）"""
+        with self._map(digest) as mm:
+            # UTF-8 每个字符最多 4 字节，截断处的半个字符直接丢弃
+            return mm[:chars * 4].decode('utf-8', 'ignore')[:chars]
+
+    def find(self, digest, needle, chunk_size=1 << 20):
+        """在 blob 中查找已 casefold 的子串，分块解码，不会读出整个文件"""
+        decoder = codecs.getincrementaldecoder('utf-8')('ignore')
+        tail = ''
+        try:
+            with self._map(digest) as mm:
+                for start in range(0, len(mm), chunk_size):
+                    # 保留上一块末尾的字符，防止子串跨块
+                    text = tail + decoder.decode(mm[start:start + chunk_size]).casefold()
+                    if needle in text:
+                        return True
+                    tail = text[-(len(needle) - 1):] if len(needle) > 1 else ''
+        except (OSError, ValueError):
+            return False
+        return False
+
+    def delete(self, digest):
+        try:
+            os.remove(self.path_for(digest))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            log.warning("Error deleting blob: %s", e)
+
+    def clear(self):
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
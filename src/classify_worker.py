@@ -0,0 +1,99 @@
+import logging
+import time
+
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
+
+from clip_classify import classify_entries
+from clip_history import HistoryObserver
+from metrics import metrics
+
+log = logging.getLogger(__name__)
+
+
+class ClassifyWorker(QObject):
+    """在后台线程里识别一批条目的内容类型"""
+
+    # [(条目 id, 类型集合)]
+    classified = pyqtSignal(list)
+
+    @pyqtSlot(list)
+    def classify(self, entries):
+        started = time.perf_counter()
+        # 只读取条目的开头，条目在界面线程里被删除也不影响
+        results = classify_entries(entries)
+        metrics.histogram('classify_batch').observe(time.perf_counter() - started)
+        self.classified.emit(results)
+
+
+class ClassifyPipeline(QObject, HistoryObserver):
+    """新条目和从磁盘载入的未识别条目交给后台线程识别内容类型
+
+    插入通知里只收集条目，攒到这一轮事件循环结束再按 BATCH 条一批送出，
+    界面线程不做任何匹配。识别结果通过 ClipHistory.set_tags 写回，
+    由 history_changed 通知列表、搜索索引和存储。
+    每个带类型的条目（包括载入时已经识别过的）都会发出 tagged 信号，
+    所以要先连接 tagged 再调用 start()。
+    """
+
+    # (条目 id, 类型集合)
+    tagged = pyqtSignal(int, frozenset)
+    _classify = pyqtSignal(list)
+
+    BATCH = 100
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self._pending = []
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(0)
+        self.flush_timer.timeout.connect(self.flush)
+
+        self.thread = QThread(self)
+        self.worker = ClassifyWorker()
+        self.worker.moveToThread(self.thread)
+        self._classify.connect(self.worker.classify)
+        self.worker.classified.connect(self.on_classified)
+        self.thread.start()
+
+    def start(self):
+        """开始观察历史记录，并提交已有的条目"""
+        with self.history.lock:
+            self.history.add_observer(self)
+            self.submit(list(self.history))
+
+    def submit(self, entries):
+        for entry in entries:
+            if entry.kind == 'image':
+                continue
+            if entry.tags is None:
+                self._pending.append(entry)
+            elif entry.tags:
+                self.tagged.emit(entry.id, entry.tags)
+        if self._pending:
+            self.flush_timer.start()
+
+    def history_inserted(self, row, count):
+        self.submit([self.history.entry_at(row + offset) for offset in range(count)])
+
+    def history_reset(self):
+        self._pending = []
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        for start in range(0, len(pending), self.BATCH):
+            self._classify.emit(pending[start:start + self.BATCH])
+
+    @pyqtSlot(list)
+    def on_classified(self, results):
+        metrics.counter('classified').inc(len(results))
+        for entry_id, tags in results:
+            if self.history.set_tags(entry_id, tags) and tags:
+                self.tagged.emit(entry_id, tags)
+
+    def shutdown(self):
+        self.flush_timer.stop()
+        self.thread.quit()
+        self.thread.wait()
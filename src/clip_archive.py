@@ -0,0 +1,255 @@
+"""历史记录的导出与导入（不依赖 Qt）
+
+归档是 JSON Lines：第一行是头部，之后每行一条记录，从新到旧；文件名以 .gz
+结尾时用 gzip 压缩。读写都是逐条进行的生成器，内存占用与历史记录的条数无关。
+
+    {"format": "cliplist-archive", "version": 1, "id": "...", "created": 1700000000.0}
+    {"digest": "...", "created": 1700000000.0, "kind": "text", "pinned": false, "text": "..."}
+    {"digest": "...", "created": 1700000000.0, "kind": "image", "pinned": false, "preview": "[图片 ...]",
+     "formats": {"PNG": "<base64>"}}
+
+导入直接写入 history.db（ClipList 不能在运行），按内容哈希跳过已有的条目。
+每提交一批就在同一个事务里记下读到的位置，中断后用同一个归档再导入一次即从断点继续。
+"""
+import base64
+import gzip
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+
+from clip_history import BLOB_THRESHOLD, PREVIEW_CHARS, bytes_digest
+from clip_store import create_schema, dump_formats, load_formats
+
+log = logging.getLogger(__name__)
+
+FORMAT = 'cliplist-archive'
+VERSION = 1
+# gzip 压缩级别：1 最快，9 最小；1 级约为 6 级速度的 4 倍，体积大四成
+COMPRESS_LEVEL = 1
+IMPORT_BATCH = 1000
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def _open(path, mode, compress_level=COMPRESS_LEVEL):
+    if path.endswith('.gz'):
+        if 'w' in mode:
+            return gzip.open(path, mode, compresslevel=compress_level)
+        return gzip.open(path, mode)
+    return open(path, mode)
+
+
+def export_records(db_path, blob_store):
+    """按从新到旧逐条生成归档记录"""
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute('SELECT digest, created, text, blob, length, preview, kind, formats, pinned, score '
+                            'FROM clips ORDER BY seq DESC')
+        for digest, created, text, blob, length, preview, kind, formats, pinned, score in rows:
+            record = {'digest': digest.hex(), 'created': created, 'kind': kind, 'pinned': bool(pinned)}
+            if score is not None:
+                record['score'] = score
+            try:
+                if kind == 'image':
+                    record['preview'] = preview
+                else:
+                    record['text'] = blob_store.read_text(digest) if blob else text
+                stored = {}
+                for fmt, format_digest in (load_formats(formats) or {}).items():
+                    stored[fmt] = base64.b64encode(blob_store.read_bytes(format_digest)).decode('ascii')
+            except OSError as e:
+                # BlobStore 中缺失的内容无法导出，跳过这一条
+                log.warning("Skipping %s: %s", digest.hex(), e)
+                continue
+            if stored:
+                record['formats'] = stored
+            yield record
+    finally:
+        conn.close()
+
+
+def write_archive(path, records, compress_level=COMPRESS_LEVEL):
+    """把记录逐条写入归档，返回写入的条数；先写临时文件，完成后再改名"""
+    tmp_path = path + '.part' + ('.gz' if path.endswith('.gz') else '')
+    count = 0
+    try:
+        with _open(tmp_path, 'wb', compress_level) as f:
+            header = {'format': FORMAT, 'version': VERSION, 'id': uuid.uuid4().hex, 'created': time.time()}
+            f.write(json.dumps(header).encode('utf-8') + b'\n')
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n')
+                count += 1
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    return count
+
+
+class ArchiveReader:
+    """读取归档：打开时校验头部，records() 逐条生成 (位置, 记录)，位置从 1 开始"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = _open(path, 'rb')
+        try:
+            header = json.loads(self._file.readline())
+        except (OSError, ValueError) as e:
+            self.close()
+            raise ArchiveError(f'not a ClipList archive: {e}') from None
+        if not isinstance(header, dict) or header.get('format') != FORMAT:
+            self.close()
+            raise ArchiveError('not a ClipList archive')
+        if header.get('version', 0) > VERSION:
+            self.close()
+            raise ArchiveError(f"unsupported archive version {header.get('version')}")
+        self.header = header
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def records(self, skip=0):
+        """跳过前 skip 条（不解析）后逐条生成"""
+        try:
+            for position, line in enumerate(self._file, 1):
+                if position <= skip:
+                    continue
+                try:
+                    yield position, json.loads(line)
+                except ValueError:
+                    if not line.endswith(b'\n'):
+                        # 复制到一半的文件末尾的半行
+                        return
+                    raise ArchiveError(f'bad record at line {position + 1}') from None
+        except (OSError, EOFError) as e:
+            raise ArchiveError(f'damaged archive: {e}') from None
+
+
+class ArchiveImporter:
+    """把归档导入到 history.db
+
+    导入的条目排在已有历史记录之后（更旧的位置），保持归档中的先后顺序。
+    正文超过 BLOB_THRESHOLD 的写入 BlobStore，与复制时的存法相同。
+    """
+
+    def __init__(self, db_path, blob_store, batch=IMPORT_BATCH):
+        self.blob_store = blob_store
+        self.batch = batch
+        # 事务自己控制：每批一个事务，进度和数据一起提交
+        self.conn = sqlite3.connect(db_path, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        create_schema(self.conn)
+
+    def close(self):
+        self.conn.close()
+
+    def run(self, path, progress=None):
+        """导入归档，返回 (新增条数, 已存在跳过的条数)
+
+        progress(position) 在每批提交后调用。已完整导入过的归档直接返回 (0, 0)。
+        """
+        with ArchiveReader(path) as reader:
+            return self._run(reader, progress)
+
+    def _run(self, reader, progress):
+        archive = str(reader.header.get('id'))
+        conn = self.conn
+        row = conn.execute('SELECT position, done FROM imports WHERE archive = ?', (archive,)).fetchone()
+        resume_at, done = row if row is not None else (0, 0)
+        if done:
+            return 0, 0
+        if resume_at:
+            log.info("Resuming import of %s after record %d", reader.path, resume_at)
+        # 新条目的 seq 从已有的最小值往下排
+        lowest = conn.execute('SELECT MIN(seq) FROM clips').fetchone()[0]
+        seq = (lowest if lowest is not None else 1) - 1
+        added = skipped = 0
+        position = resume_at
+        pending = 0
+        conn.execute('BEGIN')
+        try:
+            for position, record in reader.records(skip=resume_at):
+                try:
+                    inserted = self._insert(record, seq)
+                except (KeyError, TypeError, ValueError, AttributeError) as e:
+                    raise ArchiveError(f'bad record at line {position + 1}: {e!r}') from None
+                if inserted:
+                    added += 1
+                    seq -= 1
+                else:
+                    skipped += 1
+                pending += 1
+                if pending >= self.batch:
+                    self._checkpoint(archive, position, False)
+                    conn.execute('BEGIN')
+                    pending = 0
+                    if progress is not None:
+                        progress(position)
+            self._checkpoint(archive, position, True)
+        except BaseException:
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        if progress is not None:
+            progress(position)
+        return added, skipped
+
+    def _checkpoint(self, archive, position, done):
+        self.conn.execute('INSERT INTO imports(archive, position, done) VALUES (?, ?, ?) '
+                          'ON CONFLICT(archive) DO UPDATE SET position = excluded.position, done = excluded.done',
+                          (archive, position, int(done)))
+        self.conn.execute('COMMIT')
+
+    def _insert(self, record, seq):
+        """写入一条记录，内容已存在时返回 False"""
+        kind = record.get('kind', 'text')
+        formats = {}
+        format_data = {}
+        for fmt, encoded in (record.get('formats') or {}).items():
+            data = base64.b64decode(encoded)
+            formats[fmt] = bytes_digest(data)
+            format_data[formats[fmt]] = data
+        blob = None
+        if kind == 'image':
+            digest = bytes.fromhex(record['digest'])
+            row = (digest, seq, record['created'], '', 0, 0, record.get('preview'), kind)
+            size = sum(len(data) for data in format_data.values())
+        else:
+            text = record['text']
+            # 按内容重新计算哈希，不依赖归档里的值
+            blob = text.encode('utf-8')
+            digest = bytes_digest(blob)
+            size = len(blob)
+            if len(text) > BLOB_THRESHOLD:
+                row = (digest, seq, record['created'], '', 1, len(text), text[:PREVIEW_CHARS], kind)
+            else:
+                row = (digest, seq, record['created'], text, 0, None, None, kind)
+                blob = None
+        score = record.get('score')
+        cursor = self.conn.execute(
+            'INSERT INTO clips(digest, seq, created, text, blob, length, preview, kind, formats, pinned, score, size) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(digest) DO NOTHING',
+            row + (dump_formats(formats), int(bool(record.get('pinned'))), float(score) if score is not None else None,
+                   size))
+        if not cursor.rowcount:
+            return False
+        # 行已写入当前事务，写 BlobStore 出错时整批回滚
+        if blob is not None:
+            self.blob_store.put(digest, blob)
+        for format_digest, data in format_data.items():
+            self.blob_store.put(format_digest, data)
+        return True
@@ -0,0 +1,155 @@
+import logging
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+
+class ClipboardBackend:
+    """系统剪贴板读写、全局快捷键和模拟粘贴的接口
+
+    ClipboardManager 只通过它访问操作系统，便于在没有 win32 / keyboard
+    的环境（如 Linux 下的基准测试）中换成内存实现。
+    """
+
+    def init_clipboard(self):
+        """启动时访问一次剪贴板"""
+        pass
+
+    def read_text(self):
+        """读取剪贴板文本，没有文本时返回 None"""
+        raise NotImplementedError
+
+    def write_text(self, text):
+        raise NotImplementedError
+
+    def hook_keys(self, callback):
+        """注册按键事件回调，callback(event) 中 event 有 name 和 event_type（'down' / 'up'）"""
+        raise NotImplementedError
+
+    def send_paste(self):
+        """向前台程序发送 ctrl+v"""
+        raise NotImplementedError
+
+    def unhook_all(self):
+        pass
+
+
+class Win32Backend(ClipboardBackend):
+    """Windows 实现：pywin32 读写剪贴板，keyboard 提供键盘钩子"""
+
+    def __init__(self):
+        # 只在真正使用时导入，其它平台上导入本模块不会失败
+        import keyboard
+        import win32clipboard
+        import win32con
+        self.keyboard = keyboard
+        self.win32clipboard = win32clipboard
+        self.win32con = win32con
+
+    def init_clipboard(self):
+        try:
+            self.win32clipboard.OpenClipboard()
+            self.win32clipboard.CloseClipboard()
+        except:
+            pass
+
+    def read_text(self):
+        clipboard = self.win32clipboard
+        try:
+            clipboard.OpenClipboard()
+            if clipboard.IsClipboardFormatAvailable(self.win32con.CF_UNICODETEXT):
+                return clipboard.GetClipboardData(self.win32con.CF_UNICODETEXT)
+            return None
+        except Exception as e:
+            log.warning("读取剪贴板时出错: %s", e)
+            return None
+        finally:
+            try:
+                clipboard.CloseClipboard()
+            except:
+                pass
+
+    def write_text(self, text):
+        clipboard = self.win32clipboard
+        try:
+            clipboard.OpenClipboard()
+            clipboard.EmptyClipboard()
+            clipboard.SetClipboardText(text, self.win32con.CF_UNICODETEXT)
+        finally:
+            # 确保剪贴板被关闭
+            try:
+                clipboard.CloseClipboard()
+            except:
+                pass
+
+    def hook_keys(self, callback):
+        self.keyboard.hook(callback)
+
+    def send_paste(self):
+        self.keyboard.send('ctrl+v')
+
+    def unhook_all(self):
+        self.keyboard.unhook_all()
+
+
+class FakeKeyEvent:
+    def __init__(self, name, event_type):
+        self.name = name
+        self.event_type = event_type
+
+
+class FakeBackend(ClipboardBackend):
+    """内存中的实现，用于基准测试和无 win32 的环境
+
+    press('alt+1') 依次模拟按下、松开，快捷键由 hook_keys 注册的回调（HotkeyDispatcher）触发；
+    send_paste 只记录时间和内容。
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock or time.perf_counter
+        self.text = None
+        self.hooks = []
+        self.pastes = []
+        self.pasted = threading.Condition()
+
+    def read_text(self):
+        return self.text
+
+    def write_text(self, text):
+        self.text = text
+
+    def hook_keys(self, callback):
+        self.hooks.append(callback)
+
+    def _emit(self, name, event_type):
+        for hook in self.hooks:
+            hook(FakeKeyEvent(name, event_type))
+
+    def press(self, combo):
+        keys = combo.split('+')
+        for key in keys:
+            self._emit(key, 'down')
+        for key in reversed(keys):
+            self._emit(key, 'up')
+
+    def send_paste(self):
+        with self.pasted:
+            self.pastes.append((self.clock(), self.text))
+            self.pasted.notify_all()
+
+    def wait_for_pastes(self, count, timeout=5.0):
+        with self.pasted:
+            return self.pasted.wait_for(lambda: len(self.pastes) >= count, timeout)
+
+    def unhook_all(self):
+        self.hooks.clear()
+
+
+def default_backend():
+    """Windows 上使用真实实现，其它平台退回内存实现"""
+    if sys.platform == 'win32':
+        return Win32Backend()
+    log.info("当前平台不支持全局快捷键与 win32 剪贴板，使用内存后端")
+    return FakeBackend()
@@ -0,0 +1,132 @@
+"""剪贴板内容的类型识别（不依赖 Qt）
+
+所有规则合并成一个预编译的正则，命名分组对应类型，对内容的开头
+SCAN_CHARS 个字符只扫描一遍。识别结果是类型名的 frozenset，例如
+frozenset({'url', 'email'})；什么都没识别出时为空集合。
+"""
+import json
+import re
+
+# 只识别开头的这么多字符，超长的内容不会拖慢识别
+SCAN_CHARS = 4096
+# 至少有这么多行像代码时才算代码
+CODE_LINES = 2
+
+TAGS = ('url', 'path', 'json', 'code', 'email', 'secret')
+
+# 界面上显示的名称
+TAG_LABELS = {
+    'url': '网址',
+    'path': '文件路径',
+    'json': 'JSON',
+    'code': '代码',
+    'email': '邮箱',
+    'secret': '疑似密钥',
+}
+
+# 所有规则合成一个正则。以单词开头的规则共用一个 \b，其余规则从 @ \ / ; { } 等
+# 少见的字符开始匹配，大部分位置只需一次判断就能跳过。同一类型分在几处时，
+# 分组名以 "类型_" 开头
+_SECRET_TOKENS = r"""
+    AKIA[0-9A-Z]{16}\b
+    | gh[pousr]_[A-Za-z0-9]{36,}
+    | github_pat_[A-Za-z0-9_]{40,}
+    | xox[abprs]-[A-Za-z0-9-]{10,}
+    | [sr]k_live_[A-Za-z0-9]{16,}
+    | AIza[0-9A-Za-z_-]{35}
+    | eyJ[A-Za-z0-9_-]{8,}\.eyJ[A-Za-z0-9_-]{8,}\.[A-Za-z0-9_-]{8,}
+    | (?i:(?:password|passwd|pwd|secret|api[_-]?key|access[_-]?token|auth[_-]?token|client[_-]?secret)
+         ["']?\s*[:=]\s*["']?[^\s"']{8,})
+"""
+_PRIVATE_KEY = r'-----BEGIN\ [A-Z ]*PRIVATE\ KEY-----'
+
+_RULES = r"""
+\b(?:
+    (?P<secret>""" + _SECRET_TOKENS + r""")
+    | (?P<url>(?:https?|ftp)://[^\s<>"']+|www\.[A-Za-z0-9-]+\.[A-Za-z0-9.-]+)
+    | (?P<path>[A-Za-z]:\\(?:[^\s\\/:*?"<>|]+\\?)*)
+)
+| (?P<secret_key>""" + _PRIVATE_KEY + r""")
+| (?<=[A-Za-z0-9._%+-])(?P<email>@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}\b)
+| (?P<path_unc>\\\\[A-Za-z0-9._$-]+\\[^\s"<>|]+)
+| (?<![\w:/.~])(?P<path_posix>(?:~|\.\.?)?/[\w.@-]+(?:/[\w.@-]+)+/?)
+| (?P<code>
+    ^[ \t]*(?:def\ \w+\s*\(|class\ \w+|import\ [\w.]+|from\ [\w.]+\ import\ |\#include\s*[<"]
+             |function\b|(?:const|let|var)\ \w+\s*=|return\b|(?:public|private|protected|static)\ \w+
+             |package\ [\w.]+|fn\ \w+|func\ \w+|(?:if|for|while)\s*\(|SELECT\ .+\ FROM\b)
+    | [;{}][ \t]*$
+)
+"""
+
+_PATTERN = re.compile(_RULES, re.M | re.X)
+_TAG_OF_GROUP = {name: name.split('_')[0] for name in _PATTERN.groupindex}
+# 只含 secret 规则，复制时同步检查用
+_SECRET = re.compile(r'\b(?:' + _SECRET_TOKENS + ')|' + _PRIVATE_KEY, re.X)
+# 被截断的 JSON 无法完整解析，只看开头的结构
+_JSON_START = re.compile(r'\s*(?:\{\s*"|\[\s*[\[{"\d-]|\[\s*\])')
+
+
+def _looks_like_json(text, truncated):
+    stripped = text.strip()
+    if not stripped or stripped[0] not in '{[':
+        return False
+    if truncated:
+        return _JSON_START.match(stripped) is not None
+    try:
+        return isinstance(json.loads(stripped), (dict, list))
+    except ValueError:
+        return False
+
+
+def classify(text, length=None):
+    """识别 text 的类型，只扫描开头 SCAN_CHARS 个字符
+
+    text 可以已经只是内容的开头，此时 length 给出完整内容的长度。
+    """
+    truncated = (length if length is not None else len(text)) > SCAN_CHARS
+    tags = set()
+    code = 0
+    for match in _PATTERN.finditer(text, 0, SCAN_CHARS):
+        tag = _TAG_OF_GROUP[match.lastgroup]
+        if tag == 'code':
+            code += 1
+            if code < CODE_LINES:
+                continue
+        tags.add(tag)
+        if len(tags) == len(TAGS) - 1:
+            break
+    if _looks_like_json(text[:SCAN_CHARS], truncated):
+        # 多行的 JSON 每行以括号结尾，不再算作代码
+        tags.discard('code')
+        tags.add('json')
+    return frozenset(tags)
+
+
+def looks_secret(text):
+    """只检查 secret 规则，供复制时决定是否跳过记录"""
+    return _SECRET.search(text, 0, SCAN_CHARS) is not None
+
+
+def classify_entries(entries):
+    """批量识别条目，返回 [(条目 id, 类型集合)]；图片和读不出内容的条目跳过"""
+    results = []
+    for entry in entries:
+        if entry.kind == 'image':
+            continue
+        try:
+            head = entry.head(SCAN_CHARS)
+        except OSError:
+            continue
+        results.append((entry.id, classify(head, entry.length)))
+    return results
+
+
+def dump_tags(tags):
+    return ','.join(sorted(tags)) if tags is not None else None
+
+
+def load_tags(value):
+    # NULL 表示还没识别过，空字符串表示识别过但没有类型
+    if value is None:
+        return None
+    return frozenset(tag for tag in value.split(',') if tag)
@@ -0,0 +1,62 @@
+from PyQt5.QtCore import QObject, QTimer, QElapsedTimer, pyqtSignal
+
+
+class ClipboardCoalescer(QObject):
+    """合并短时间内连续触发的剪贴板 dataChanged
+
+    很多程序一次复制会多次设置剪贴板，脚本甚至每秒改动上百次。
+    每次变化只重启计时器，不读取剪贴板；安静 window_ms 后（或持续变化超过
+    max_wait_ms 时）才读取一次最终状态，并把这一批通过 flushed 信号一次交出。
+    keep_intermediate 为 True 时，每次变化都会抓取并保留中间状态。
+    """
+
+    # 一批抓取结果（ClipCapture 列表，按时间顺序）
+    flushed = pyqtSignal(list)
+
+    def __init__(self, capture, window_ms=80, max_wait_ms=500, keep_intermediate=False, parent=None):
+        super().__init__(parent)
+        # 读取剪贴板的函数，返回 ClipCapture
+        self.capture = capture
+        self.window_ms = window_ms
+        self.max_wait_ms = max_wait_ms
+        self.keep_intermediate = keep_intermediate
+        self.pending = []
+        self.events = 0
+
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+        self.elapsed = QElapsedTimer()
+
+    def notify(self):
+        """剪贴板发生了变化"""
+        if self.events == 0:
+            self.elapsed.start()
+        self.events += 1
+        if self.keep_intermediate:
+            self.pending.append(self.capture())
+        if self.elapsed.elapsed() >= self.max_wait_ms:
+            # 持续不断的变化也至少每 max_wait_ms 处理一次
+            self.flush()
+        else:
+            self.timer.start(self.window_ms)
+
+    def flush(self):
+        """立即处理尚未处理的变化"""
+        self.timer.stop()
+        if self.events == 0:
+            return
+        captures = self.pending
+        self.pending = []
+        self.events = 0
+        if not self.keep_intermediate:
+            # 只读取一次最终状态；记录中间状态时最后一项已经是最终状态
+            captures = [self.capture()]
+        captures = [c for c in captures if is_meaningful(c)]
+        if captures:
+            self.flushed.emit(captures)
+
+
+def is_meaningful(capture):
+    """清空剪贴板等中间状态没有内容，不记录"""
+    return bool(capture.text.strip()) or capture.image is not None
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+
+from PyQt5.QtCore import Qt, QRect, QSize
+from PyQt5.QtGui import QFont, QFontMetrics, QColor, QPainter
+from PyQt5.QtWidgets import QStyledItemDelegate, QStyle
+
+
+class ClipItemDelegate(QStyledItemDelegate):
+    """列表行的绘制
+
+    所有行共用一份字体和字体度量，行高固定（视图开启 uniformItemSizes，
+    不再逐行询问尺寸）。显示文本先压成单行再按可用宽度省略，结果缓存起来，
+    滚动时同一行不会重复计算；超长条目也只排版预览的那一小段。
+    """
+
+    ROW_HEIGHT = 32
+    MARGIN_X = 5
+    MARGIN_Y = 2
+    PADDING = 8
+    RADIUS = 5
+    # 省略结果缓存的条数，远大于一屏能显示的行数
+    CACHE_SIZE = 2048
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.font = QFont("Arial", 9)
+        self.metrics = QFontMetrics(self.font)
+        self.foreground = QColor("#7fb3d5")
+        self.background = QColor("#34495e")
+        self.hover = QColor("#3498db")
+        self.selected = QColor("#2980b9")
+        self._elided = OrderedDict()
+
+    def sizeHint(self, option, index):
+        # 列表模式下行宽总是铺满视图，只需要固定的行高
+        return QSize(0, self.ROW_HEIGHT)
+
+    def elide(self, text, width):
+        """单行、按宽度省略后的文本"""
+        key = (text, width)
+        elided = self._elided.get(key)
+        if elided is not None:
+            self._elided.move_to_end(key)
+            return elided
+        line = ' '.join(text.split())
+        elided = self.metrics.elidedText(line, Qt.ElideRight, width)
+        self._elided[key] = elided
+        if len(self._elided) > self.CACHE_SIZE:
+            self._elided.popitem(last=False)
+        return elided
+
+    def paint(self, painter, option, index):
+        painter.save()
+        rect = option.rect.adjusted(self.MARGIN_X, self.MARGIN_Y, -self.MARGIN_X, -self.MARGIN_Y)
+        if option.state & QStyle.State_Selected:
+            color = self.selected
+        elif option.state & QStyle.State_MouseOver:
+            color = self.hover
+        else:
+            color = self.background
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(color)
+        painter.drawRoundedRect(rect, self.RADIUS, self.RADIUS)
+
+        text_rect = rect.adjusted(self.PADDING, 0, -self.PADDING, 0)
+        image = index.data(Qt.DecorationRole)
+        if image is not None:
+            top = text_rect.top() + (text_rect.height() - image.height()) // 2
+            target = QRect(text_rect.left(), top, image.width(), image.height())
+            painter.drawImage(target, image)
+            text_rect.setLeft(target.right() + self.PADDING)
+
+        text = index.data(Qt.DisplayRole) or ''
+        painter.setFont(self.font)
+        painter.setPen(self.foreground)
+        painter.drawText(text_rect, Qt.AlignLeft | Qt.AlignVCenter | Qt.TextSingleLine,
+                         self.elide(text, text_rect.width()))
+        painter.restore()
@@ -0,0 +1,149 @@
+from collections import OrderedDict
+
+
+class HistoryLimits:
+    """历史记录的上限，为 None 的项不限制
+
+    max_entries: 条目数；max_bytes: 内容总字节数（文本按 UTF-8 计）；
+    max_age: 条目最长保留时间（秒）。
+    """
+
+    def __init__(self, max_entries=None, max_bytes=None, max_age=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+    @classmethod
+    def from_dict(cls, values):
+        """从设置文件读取，max_age_days 以天为单位"""
+        max_age_days = values.get('max_age_days')
+        return cls(values.get('max_entries'), values.get('max_bytes'),
+                   max_age_days * 86400 if max_age_days is not None else None)
+
+    @property
+    def bounded(self):
+        return (self.max_entries is not None or self.max_bytes is not None
+                or self.max_age is not None)
+
+    def over(self, count, total_bytes):
+        """数量或字节数是否超出上限（时间另行检查）"""
+        if self.max_entries is not None and count > self.max_entries:
+            return True
+        return self.max_bytes is not None and total_bytes > self.max_bytes
+
+
+class EvictionPolicy:
+    """决定超出上限时先淘汰哪一条
+
+    ClipHistory 在条目加入、删除、移到最前（重新复制）和被粘贴时调用对应方法，
+    victim() 返回下一条应淘汰的条目。所有操作均摊 O(1)。
+    """
+
+    def added(self, entry, older=False):
+        """加入新条目；older 为 True 表示从存储中分页载入的旧条目"""
+        raise NotImplementedError
+
+    def removed(self, entry):
+        raise NotImplementedError
+
+    def touched(self, entry):
+        """条目被重新复制，移到了列表最前"""
+        pass
+
+    def pasted(self, entry):
+        """条目被粘贴或拖拽使用"""
+        pass
+
+    def clear(self):
+        raise NotImplementedError
+
+    def victim(self):
+        raise NotImplementedError
+
+
+class OldestFirst(EvictionPolicy):
+    """淘汰列表最底部（最久没有复制）的条目"""
+
+    def __init__(self):
+        self._order = OrderedDict()
+
+    def added(self, entry, older=False):
+        self._order[entry.id] = entry
+        if older:
+            self._order.move_to_end(entry.id, last=False)
+
+    def removed(self, entry):
+        self._order.pop(entry.id, None)
+
+    def touched(self, entry):
+        self._order.move_to_end(entry.id)
+
+    def clear(self):
+        self._order.clear()
+
+    def victim(self):
+        for entry in self._order.values():
+            return entry
+        return None
+
+
+class LeastRecentlyPasted(OldestFirst):
+    """淘汰最久没有被粘贴（或复制）过的条目"""
+
+    def pasted(self, entry):
+        self._order.move_to_end(entry.id)
+
+
+class LargestFirst(EvictionPolicy):
+    """优先淘汰最大的条目
+
+    按大小的二进制位数分桶，桶内按加入顺序排列；淘汰时从最大的非空桶取最旧的一条。
+    同一个桶内大小相差不超过一倍，桶数固定，因此不需要堆。
+    """
+
+    BUCKETS = 64
+
+    def __init__(self):
+        self._buckets = [OrderedDict() for _ in range(self.BUCKETS)]
+        self._top = -1
+
+    def _bucket(self, entry):
+        return min(entry.size.bit_length(), self.BUCKETS - 1)
+
+    def added(self, entry, older=False):
+        index = self._bucket(entry)
+        bucket = self._buckets[index]
+        bucket[entry.id] = entry
+        if older:
+            bucket.move_to_end(entry.id, last=False)
+        self._top = max(self._top, index)
+
+    def removed(self, entry):
+        self._buckets[self._bucket(entry)].pop(entry.id, None)
+
+    def clear(self):
+        for bucket in self._buckets:
+            bucket.clear()
+        self._top = -1
+
+    def victim(self):
+        while self._top >= 0:
+            for entry in self._buckets[self._top].values():
+                return entry
+            self._top -= 1
+        return None
+
+
+POLICIES = {
+    'oldest': OldestFirst,
+    'lru': LeastRecentlyPasted,
+    'largest': LargestFirst,
+}
+
+
+def make_policy(name):
+    """按名称创建淘汰策略：oldest / lru / largest"""
+    try:
+        return POLICIES[name]()
+    except KeyError:
+        raise ValueError(f"unknown eviction policy: {name}") from None
@@ -0,0 +1,290 @@
+import logging
+import sys
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QThread, QBuffer, QByteArray, QIODevice, QMimeData, Qt, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QImage
+
+from clip_history import HistoryObserver, bytes_digest
+from metrics import metrics
+
+log = logging.getLogger(__name__)
+
+HTML = 'text/html'
+RTF = 'text/rtf'
+PNG = 'image/png'
+# Windows 剪贴板上 RTF 在 Qt 中的格式名
+RTF_NATIVE = 'application/x-qt-windows-mime;value="Rich Text Format"'
+
+THUMBNAIL_SIZE = (48, 28)
+
+
+class ClipCapture:
+    """一次剪贴板变化时抓取到的内容
+
+    只保留各格式的原始数据引用（QByteArray / QImage 都是隐式共享的），
+    编码、哈希、写盘等耗时操作交给后台线程。
+    """
+
+    def __init__(self, text, raw, image):
+        self.text = text
+        self.raw = raw
+        self.image = image
+
+
+def capture_clipboard(clipboard):
+    """读取剪贴板：先看有哪些格式，只取需要的那几种"""
+    mime = clipboard.mimeData()
+    if mime is None:
+        return ClipCapture('', {}, None)
+    formats = mime.formats()
+    text = mime.text() if mime.hasText() else ''
+    raw = {}
+    if mime.hasHtml():
+        raw[HTML] = mime.data('text/html')
+    for fmt in formats:
+        if fmt == RTF or 'Rich Text Format' in fmt:
+            raw[RTF] = mime.data(fmt)
+            break
+    image = None
+    # 有文本时图片通常只是同一内容的另一种表示（如表格截图），只记录文本
+    if mime.hasImage() and not text.strip():
+        image = clipboard.image()
+        if image.isNull():
+            image = None
+    return ClipCapture(text, raw, image)
+
+
+# QMimeData::imageData() 使用的格式名
+QT_IMAGE = 'application/x-qt-image'
+
+
+class LazyMimeData(QMimeData):
+    """粘贴、拖拽用的 QMimeData，内容在目标程序真正索取某个格式时才生成
+
+    formats() 只根据条目记录的格式列出名字，不读取内容；retrieveData 第一次
+    被调用时才从条目（或 BlobStore）读出对应格式并缓存。拖拽被取消、放到
+    不接受的位置，或目标只要纯文本时，大条目和富文本都不会被读出。
+    条目随后会被删除（BlobStore 中的文件随之删除）时，先调用 materialize()。
+    """
+
+    def __init__(self, history, entry):
+        super().__init__()
+        self.history = history
+        self.entry = entry
+        if entry.kind == 'image':
+            self._formats = [QT_IMAGE, PNG] if PNG in entry.formats else []
+        else:
+            self._formats = ['text/plain']
+            if HTML in entry.formats:
+                self._formats.append(HTML)
+            if RTF in entry.formats:
+                self._formats.append(RTF_NATIVE if sys.platform == 'win32' else RTF)
+        self._cache = {}
+
+    def formats(self):
+        return list(self._formats)
+
+    def hasFormat(self, fmt):
+        return fmt in self._formats
+
+    def retrieveData(self, fmt, preferred_type):
+        if fmt not in self._formats:
+            return None
+        if fmt not in self._cache:
+            metrics.counter('mime_reads').inc()
+            try:
+                self._cache[fmt] = self._render(fmt)
+            except OSError as e:
+                log.warning("Error reading %s of item id=%d: %s", fmt, self.entry.id, e)
+                return None
+        return self._cache[fmt]
+
+    def _render(self, fmt):
+        entry = self.entry
+        if fmt == 'text/plain':
+            return entry.text
+        if fmt == QT_IMAGE:
+            data = self.history.format_data(entry, PNG)
+            return QImage.fromData(data, 'PNG') if data is not None else None
+        # 条目里的 RTF 以 RTF 为名记录，Windows 上对外使用 RTF_NATIVE
+        data = self.history.format_data(entry, RTF if fmt == RTF_NATIVE else fmt)
+        if data is None:
+            return None
+        if fmt == HTML:
+            return data.decode('utf-8', 'ignore')
+        return QByteArray(data)
+
+    def materialize(self):
+        """读出全部格式，之后不再依赖条目在磁盘上的内容"""
+        for fmt in self._formats:
+            self.retrieveData(fmt, None)
+
+
+class ClipboardHolder(HistoryObserver):
+    """记住放到剪贴板上的 LazyMimeData，对应条目被删除之前把内容全部读出
+
+    剪贴板上的内容可能在条目删除（使用后删除、淘汰、清空历史）之后才被粘贴，
+    那时 BlobStore 中的文件已经不在了。
+    """
+
+    def __init__(self, history):
+        self.history = history
+        self.mime = None
+        history.add_observer(self)
+
+    def hold(self, mime):
+        self.mime = mime
+
+    def release(self):
+        """剪贴板已被其它程序占用，Qt 会删除原来的 QMimeData"""
+        self.mime = None
+
+    def history_about_to_remove(self, row):
+        if self.mime is not None and self.history.entry_at(row) is self.mime.entry:
+            self.mime.materialize()
+
+    def history_about_to_reset(self):
+        if self.mime is not None:
+            self.mime.materialize()
+
+
+def _thumbnail(image):
+    return image.scaled(THUMBNAIL_SIZE[0], THUMBNAIL_SIZE[1], Qt.KeepAspectRatio, Qt.SmoothTransformation)
+
+
+class FormatWorker(QObject):
+    """后台线程：把富文本、图片写入 BlobStore，并生成缩略图"""
+
+    formats_stored = pyqtSignal(int, dict)
+    image_stored = pyqtSignal(bytes, str, dict, int)
+    thumbnail_ready = pyqtSignal(bytes, QImage)
+
+    def __init__(self, blob_store):
+        super().__init__()
+        self.blob_store = blob_store
+
+    def _put(self, data):
+        digest = bytes_digest(data)
+        self.blob_store.put(digest, data)
+        return digest
+
+    @pyqtSlot(int, dict)
+    def store_formats(self, entry_id, raw):
+        try:
+            formats = {fmt: self._put(bytes(data)) for fmt, data in raw.items()}
+            self.formats_stored.emit(entry_id, formats)
+        except OSError as e:
+            log.warning("Error storing formats: %s", e)
+
+    @pyqtSlot(QImage)
+    def store_image(self, image):
+        try:
+            image = image.convertToFormat(QImage.Format_ARGB32)
+            pixels = image.constBits().asstring(image.sizeInBytes())
+            # 以像素内容去重，同一张图片重复复制不会产生新条目
+            digest = bytes_digest(pixels + f"{image.width()}x{image.height()}".encode())
+            buffer = QBuffer()
+            buffer.open(QIODevice.WriteOnly)
+            image.save(buffer, 'PNG')
+            png = bytes(buffer.data())
+            png_digest = self._put(png)
+            preview = f"[图片 {image.width()}×{image.height()}]"
+            self.image_stored.emit(digest, preview, {PNG: png_digest}, len(png))
+            self.thumbnail_ready.emit(digest, _thumbnail(image))
+        except OSError as e:
+            log.warning("Error storing image: %s", e)
+
+    @pyqtSlot(bytes, bytes)
+    def make_thumbnail(self, digest, png_digest):
+        try:
+            image = QImage.fromData(self.blob_store.read_bytes(png_digest), 'PNG')
+        except (OSError, ValueError):
+            image = QImage()
+        self.thumbnail_ready.emit(digest, _thumbnail(image) if not image.isNull() else image)
+
+
+class ThumbnailCache(QObject):
+    """按字节数限制大小的缩略图 LRU 缓存，未命中时交给后台线程生成"""
+
+    # 缩略图可用，参数为图片条目的 digest
+    thumbnail_ready = pyqtSignal(bytes)
+    request = pyqtSignal(bytes, bytes)
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, parent=None):
+        super().__init__(parent)
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._images = OrderedDict()
+        self._pending = set()
+
+    def get(self, entry):
+        """返回缩略图；未生成时返回 None 并在后台生成"""
+        image = self._images.get(entry.digest)
+        if image is not None:
+            self._images.move_to_end(entry.digest)
+            return image
+        png_digest = entry.formats.get(PNG)
+        if png_digest is not None and entry.digest not in self._pending:
+            self._pending.add(entry.digest)
+            self.request.emit(entry.digest, png_digest)
+        return None
+
+    @pyqtSlot(bytes, QImage)
+    def put(self, digest, image):
+        self._pending.discard(digest)
+        if image.isNull():
+            return
+        old = self._images.pop(digest, None)
+        if old is not None:
+            self.total_bytes -= old.sizeInBytes()
+        self._images[digest] = image
+        self.total_bytes += image.sizeInBytes()
+        while self.total_bytes > self.max_bytes and len(self._images) > 1:
+            _, evicted = self._images.popitem(last=False)
+            self.total_bytes -= evicted.sizeInBytes()
+        self.thumbnail_ready.emit(digest)
+
+
+class FormatPipeline(QObject):
+    """组织格式写盘与缩略图生成的后台线程"""
+
+    _store_formats = pyqtSignal(int, dict)
+    _store_image = pyqtSignal(QImage)
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.history = history
+        self.thumbnails = ThumbnailCache(parent=self)
+
+        self.thread = QThread(self)
+        self.worker = FormatWorker(history.blob_store)
+        self.worker.moveToThread(self.thread)
+        self._store_formats.connect(self.worker.store_formats)
+        self._store_image.connect(self.worker.store_image)
+        self.thumbnails.request.connect(self.worker.make_thumbnail)
+        self.worker.thumbnail_ready.connect(self.thumbnails.put)
+        self.worker.formats_stored.connect(self.on_formats_stored)
+        self.worker.image_stored.connect(self.on_image_stored)
+        self.thread.start()
+
+    def submit(self, entry, capture):
+        """新条目的富文本格式在后台写盘"""
+        if capture.raw:
+            self._store_formats.emit(entry.id, capture.raw)
+
+    def submit_image(self, image):
+        self._store_image.emit(image)
+
+    @pyqtSlot(int, dict)
+    def on_formats_stored(self, entry_id, formats):
+        self.history.set_formats(entry_id, formats)
+
+    @pyqtSlot(bytes, str, dict, int)
+    def on_image_stored(self, digest, preview, formats, size):
+        # 重复的图片编码出的 PNG 相同，不会在 BlobStore 中多占空间
+        self.history.add_image(digest, preview, formats, size=size)
+
+    def shutdown(self):
+        self.thread.quit()
+        self.thread.wait()
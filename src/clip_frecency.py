@@ -0,0 +1,268 @@
+import heapq
+
+from clip_history import NO_SCORE, HistoryObserver
+
+
+def _key(entry):
+    # 分数相同时较新的条目在前
+    return entry.score, entry.id
+
+
+class FrecencyView(HistoryObserver):
+    """按使用频率排列的历史记录视图
+
+    前面的“常用区”是使用频率最高的至多 slots 个条目，按分数从高到低排列；
+    其余条目保持原来的新旧顺序排在后面。界面编号和 alt+数字 都按这个顺序，
+    所以 alt+1..9 总是对应最常用的条目，常用区之外的编号依次顺延。
+
+    分数只会因使用而增加（见 clip_history.frecency），衰减不改变相对顺序，
+    所以常用区只在粘贴、重新复制、删除常用条目时变化。常用区之外有分数的条目
+    放在惰性删除的最大堆里，每次变化为 O(slots + log n)，不需要对整个历史排序。
+
+    对外提供与 ClipHistory 相同的只读接口，并把历史记录的变化换算成本视图的
+    行号通知观察者；常用区的变化以行移动通知。列表模型可以直接以它为数据源。
+    """
+
+    def __init__(self, history, slots=9):
+        self.history = history
+        self.slots = slots
+        self.lock = history.lock
+        self._observers = []
+        # 常用区，分数从高到低
+        self._top = []
+        self._top_ids = set()
+        # 常用区之外有分数的条目 (-score, -id, id)，过时的项在取出时跳过
+        self._heap = []
+        # 常用区条目在 ClipHistory 中的行号（升序），历史记录变化后重新计算
+        self._rows = None
+        self._pending = None
+        history.add_observer(self)
+        self._rebuild()
+
+    def add_observer(self, observer):
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        if observer in self._observers:
+            self._observers.remove(observer)
+
+    def _notify(self, name, *args):
+        for observer in self._observers:
+            getattr(observer, name)(*args)
+
+    # ClipHistory 的只读接口，行号为本视图的行号
+
+    def __len__(self):
+        return len(self.history)
+
+    def get(self, entry_id):
+        return self.history.get(entry_id)
+
+    def get_by_digest(self, digest):
+        return self.history.get_by_digest(digest)
+
+    def is_full(self):
+        return self.history.is_full()
+
+    def top(self):
+        """常用区的条目，分数从高到低"""
+        return list(self._top)
+
+    def entry_at(self, row):
+        top = self._top
+        if not 0 <= row < len(self.history):
+            return None
+        if row < len(top):
+            return top[row]
+        # 常用区之后的第 m 行是跳过常用条目后的第 m 个历史行
+        hrow = row - len(top)
+        for top_row in self._top_rows():
+            if top_row > hrow:
+                break
+            hrow += 1
+        return self.history.entry_at(hrow)
+
+    def get_by_number(self, number):
+        return self.entry_at(number - 1)
+
+    def row_of(self, entry_id):
+        entry = self.history.get(entry_id)
+        if entry is None:
+            return -1
+        return self.row_of_entry(entry)
+
+    def row_of_entry(self, entry, hrow=None):
+        if entry.id in self._top_ids:
+            return self._top.index(entry)
+        if hrow is None:
+            hrow = self.history.row_of_entry(entry)
+        return len(self._top) + hrow - sum(1 for top_row in self._top_rows() if top_row < hrow)
+
+    def _top_rows(self):
+        rows = self._rows
+        if rows is None:
+            rows = self._rows = sorted(self.history.row_of_entry(entry) for entry in self._top)
+        return rows
+
+    def _changed(self):
+        self._rows = None
+
+    # 常用区的维护
+
+    def _rebuild(self):
+        self._changed()
+        self._heap = [(-entry.score, -entry.id, entry.id) for entry in self.history if entry.score != NO_SCORE]
+        heapq.heapify(self._heap)
+        self._top = []
+        self._top_ids = set()
+        while len(self._top) < self.slots:
+            entry = self._pop_candidate()
+            if entry is None:
+                break
+            self._top.append(entry)
+            self._top_ids.add(entry.id)
+
+    def _pop_candidate(self):
+        """取出常用区之外分数最高的条目"""
+        heap = self._heap
+        while heap:
+            neg_score, _, entry_id = heapq.heappop(heap)
+            entry = self.history.get(entry_id)
+            if entry is not None and entry.score == -neg_score and entry_id not in self._top_ids:
+                return entry
+        return None
+
+    def _push_candidate(self, entry):
+        heapq.heappush(self._heap, (-entry.score, -entry.id, entry.id))
+        if len(self._heap) > 2 * len(self.history) + 64:
+            # 过时的项太多时重建，均摊 O(1)
+            self._heap = [item for item in self._heap
+                          if (entry := self.history.get(item[2])) is not None
+                          and entry.score == -item[0] and item[2] not in self._top_ids]
+            heapq.heapify(self._heap)
+
+    def _position(self, entry):
+        """entry 在常用区中应处的位置"""
+        key = _key(entry)
+        for index, other in enumerate(self._top):
+            if other is not entry and _key(other) < key:
+                return index
+        return len(self._top)
+
+    def _move(self, src, dest, apply):
+        """按 Qt 的约定通知移动（dest 为移动前的行号），位置不变时不通知"""
+        if dest == src or dest == src + 1:
+            apply()
+            self._changed()
+            return
+        self._notify('history_about_to_move', src, dest)
+        apply()
+        self._changed()
+        self._notify('history_moved', src, dest)
+
+    def _promote(self, entry, index):
+        def apply():
+            self._top.insert(index, entry)
+            self._top_ids.add(entry.id)
+        self._move(self.row_of_entry(entry), index, apply)
+
+    def _demote(self, entry):
+        """把常用区最后一个条目放回新旧顺序中它的位置"""
+        top = self._top
+        src = len(top) - 1
+        hrow = self.history.row_of_entry(entry)
+        rest = sum(1 for other in top[:-1] if self.history.row_of_entry(other) < hrow)
+        dest = src + hrow - rest
+
+        def apply():
+            top.pop()
+            self._top_ids.discard(entry.id)
+        self._move(src, dest + 1 if dest > src else dest, apply)
+        self._push_candidate(entry)
+
+    def _consider(self, entry):
+        """entry 的分数增加了，必要时调整常用区"""
+        top = self._top
+        if entry.id in self._top_ids:
+            src = top.index(entry)
+            dest = self._position(entry)
+            if dest < src:
+                def apply():
+                    top.pop(src)
+                    top.insert(dest, entry)
+                self._move(src, dest, apply)
+            return
+        if entry.score == NO_SCORE:
+            return
+        if len(top) < self.slots or _key(entry) > _key(top[-1]):
+            self._promote(entry, self._position(entry))
+            if len(top) > self.slots:
+                self._demote(top[-1])
+        else:
+            self._push_candidate(entry)
+
+    # HistoryObserver：把 ClipHistory 的行号换算成本视图的行号再转发
+
+    def history_about_to_insert(self, row, count):
+        # 新插入的条目先按新旧顺序排在常用区之外
+        self._pending = len(self._top) + row - sum(1 for top_row in self._top_rows() if top_row < row)
+        self._notify('history_about_to_insert', self._pending, count)
+
+    def history_inserted(self, row, count):
+        self._changed()
+        self._notify('history_inserted', self._pending, count)
+        # 从存储载入的条目可能带着分数
+        for offset in range(count):
+            entry = self.history.entry_at(row + offset)
+            if entry.score != NO_SCORE:
+                self._consider(entry)
+
+    def history_about_to_remove(self, row):
+        entry = self.history.entry_at(row)
+        self._pending = (self.row_of_entry(entry, row), entry)
+        self._notify('history_about_to_remove', self._pending[0])
+
+    def history_removed(self, row):
+        vrow, entry = self._pending
+        refill = entry.id in self._top_ids
+        if refill:
+            self._top.remove(entry)
+            self._top_ids.discard(entry.id)
+        self._changed()
+        self._notify('history_removed', vrow)
+        if refill:
+            candidate = self._pop_candidate()
+            if candidate is not None:
+                self._promote(candidate, len(self._top))
+
+    def history_about_to_move(self, row, dest):
+        # ClipHistory 只会把条目移到最前；常用区的条目在本视图中位置不变
+        entry = self.history.entry_at(row)
+        self._pending = None
+        if entry.id in self._top_ids:
+            return
+        src = self.row_of_entry(entry, row)
+        vdest = len(self._top) + dest - sum(1 for top_row in self._top_rows() if top_row < dest)
+        if vdest != src:
+            self._pending = (src, vdest)
+            self._notify('history_about_to_move', src, vdest)
+
+    def history_moved(self, row, dest):
+        self._changed()
+        if self._pending is not None:
+            self._notify('history_moved', *self._pending)
+
+    def history_changed(self, row):
+        self._notify('history_changed', self.row_of_entry(self.history.entry_at(row), row))
+
+    def history_used(self, row):
+        entry = self.history.entry_at(row)
+        self._consider(entry)
+        self._notify('history_used', self.row_of_entry(entry))
+
+    def history_about_to_reset(self):
+        self._notify('history_about_to_reset')
+
+    def history_reset(self):
+        self._rebuild()
+        self._notify('history_reset')
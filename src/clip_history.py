@@ -0,0 +1,753 @@
+import functools
+import hashlib
+import math
+import sys
+import threading
+import time
+import zlib
+from collections import deque
+from types import MappingProxyType
+
+from clip_eviction import HistoryLimits, OldestFirst
+from metrics import metrics
+
+
+PREVIEW_CHARS = 200
+# 超过这个长度（字符数）的内容存入 BlobStore，内存里只保留预览
+BLOB_THRESHOLD = 64 * 1024
+# 超过这个大小（UTF-8 字节数）的正文在内存中压缩保存
+COMPRESS_THRESHOLD = 1024
+# 压缩发生在复制时的界面线程里，用最快的级别
+COMPRESS_LEVEL = 1
+
+# 没有其它格式的条目共用这个只读的空映射
+_NO_FORMATS = MappingProxyType({})
+
+# 使用频率的半衰期（秒）：一次粘贴的分量每过这么久减半
+FRECENCY_HALF_LIFE = 7 * 86400
+# 重新复制已有内容时计入的分量（一次粘贴为 1）
+RECOPY_WEIGHT = 0.5
+# 从未使用过的条目
+NO_SCORE = float('-inf')
+
+
+def content_digest(text):
+    """计算文本内容的哈希，用于去重"""
+    return bytes_digest(text.encode('utf-8'))
+
+
+def bytes_digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def frecency(score, weight, now, half_life=FRECENCY_HALF_LIFE):
+    """在 score 上累加一次使用，返回新的分数
+
+    分数是 log2(Σ weight * 2^(t / half_life))：每次使用的分量随时间按半衰期衰减，
+    但所有条目衰减的比例相同，所以只有发生使用时排序才会变化，
+    不需要定时重算；取对数避免溢出。
+    """
+    return merge_scores(score, math.log2(weight) + now / half_life)
+
+
+def merge_scores(a, b):
+    """两个分数所代表的使用合在一起后的分数"""
+    if a == NO_SCORE:
+        return b
+    if b == NO_SCORE:
+        return a
+    high, low = (a, b) if a > b else (b, a)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def _compress(data):
+    """压缩较大的正文；太小或压缩效果不明显时返回 None，直接保存 str"""
+    if len(data) <= COMPRESS_THRESHOLD:
+        return None
+    packed = zlib.compress(data, COMPRESS_LEVEL)
+    return packed if len(packed) < len(data) * 0.8 else None
+
+
+def _locked(method):
+    """修改历史记录的方法在持有 history.lock 时执行"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self.lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class ClipEntry:
+    """单条剪贴板记录
+
+    用 __slots__ 保存 id、哈希、时间、长度等少量字段，不带实例字典。
+    正文按大小分三种存法：短文本直接持有 str；超过 COMPRESS_THRESHOLD 字节的
+    以 zlib 压缩后的 UTF-8 字节保存，只在粘贴、拖拽时解压；超大条目（blob 不为 None）
+    只持有预览，访问 text 时才从 BlobStore 读出。后两种会单独保存预览。
+    前两种正文还可以被移到磁盘（spill，见 clip_tiers），之后读正文时从映射的文件读回。
+    formats 记录富文本、图片等其它格式：格式名 -> BlobStore 中的哈希，
+    尚未写入磁盘的格式值为 None。图片条目（kind 为 'image'）没有文本。
+    size 是内容的字节数，用于历史记录的容量限制。pinned 的条目不会被淘汰。
+    score 是粘贴、重新复制累计的使用频率（见 frecency），从未使用过时为 NO_SCORE。
+    tags 是后台识别出的内容类型（见 clip_classify），还没识别时为 None。
+    """
+
+    __slots__ = ('id', 'digest', 'created', 'length', 'size', 'kind', 'formats', 'blob',
+                 'pinned', 'score', 'tags', 'slot', '_body', '_preview')
+
+    def __init__(self, entry_id, digest, text, created=None, blob=None, length=None, preview=None,
+                 formats=None, kind='text', size=None, compressed=None):
+        self.id = entry_id
+        self.digest = digest
+        # str 为原文，bytes 为压缩后的 UTF-8，None 表示在 BlobStore 中，
+        # 其它对象表示已移到磁盘（有 load() 方法，见 clip_tiers.SpilledBody）
+        self._body = compressed if compressed is not None else text
+        self.blob = blob
+        self.length = length if length is not None else len(text)
+        self.size = size if size is not None else self.length
+        self._preview = preview
+        self.formats = formats or _NO_FORMATS
+        self.kind = kind
+        self.created = created if created is not None else time.time()
+        self.pinned = False
+        self.score = NO_SCORE
+        self.tags = None
+        # 在有序索引中的槽位，由 ClipHistory 维护
+        self.slot = -1
+
+    @property
+    def text(self):
+        """完整文本，压缩的条目每次访问都会解压，大条目和移到磁盘的条目每次访问都会从磁盘读取"""
+        if self.blob is not None:
+            return self.blob.read_text(self.digest)
+        body = self._body
+        if type(body) is not str and type(body) is not bytes:
+            body = body.load()
+        if type(body) is bytes:
+            return zlib.decompress(body).decode('utf-8')
+        return body
+
+    @property
+    def preview(self):
+        if self._preview is not None:
+            return self._preview
+        return self._body[:PREVIEW_CHARS]
+
+    @property
+    def is_blob(self):
+        return self.blob is not None
+
+    @property
+    def is_compressed(self):
+        return type(self._body) is bytes
+
+    @property
+    def is_spilled(self):
+        body = self._body
+        return body is not None and type(body) is not str and type(body) is not bytes
+
+    @property
+    def resident_size(self):
+        """正文在内存中占用的字节数；大条目和移到磁盘的条目为 0"""
+        body = self._body
+        if type(body) is str or type(body) is bytes:
+            return sys.getsizeof(body)
+        return 0
+
+    def spill(self, segment):
+        """把正文写入 segment（见 clip_tiers.SpillSegment），内存里只留预览；返回磁盘上的正文"""
+        body = self._body
+        if self._preview is None:
+            self._preview = body[:PREVIEW_CHARS]
+        self._body = spilled = segment.put(body)
+        return spilled
+
+    def page_in(self):
+        """把移到磁盘的正文读回内存，返回原来磁盘上的正文"""
+        spilled = self._body
+        self._body = spilled.load()
+        return spilled
+
+    def head(self, chars):
+        """开头的 chars 个字符，不会读出或解压整个条目"""
+        if self.blob is not None:
+            return self.blob.read_prefix(self.digest, chars)
+        body = self._body
+        if type(body) is not str and type(body) is not bytes:
+            # UTF-8 每个字符最多 4 字节；压缩的正文只能整段读出
+            body = body.load(chars * 4)
+        if type(body) is bytes:
+            # 截断处的半个字符直接丢弃
+            return zlib.decompressobj().decompress(body, chars * 4).decode('utf-8', 'ignore')[:chars]
+        return body[:chars]
+
+    def contains(self, needle):
+        """needle 需已 casefold；大条目直接在磁盘上分块查找"""
+        if self.blob is not None:
+            return self.blob.find(self.digest, needle)
+        if self.kind == 'image':
+            return needle in self.preview.casefold()
+        return needle in self.text.casefold()
+
+    def __repr__(self):
+        return f"ClipEntry(id={self.id}, len={self.length})"
+
+
+class HistoryObserver:
+    """历史记录变化的观察者，界面模型等通过它增量更新"""
+
+    def history_about_to_insert(self, row, count):
+        """即将在 row 处插入 count 行"""
+        pass
+
+    def history_inserted(self, row, count):
+        pass
+
+    def history_about_to_remove(self, row):
+        pass
+
+    def history_removed(self, row):
+        pass
+
+    def history_about_to_move(self, row, dest):
+        pass
+
+    def history_moved(self, row, dest):
+        pass
+
+    def history_about_to_reset(self):
+        pass
+
+    def history_changed(self, row):
+        """条目的附加数据（格式等）变化，顺序不变"""
+        pass
+
+    def history_used(self, row):
+        """条目被粘贴、拖拽或重新复制，entry.score 已更新"""
+        pass
+
+    def history_reset(self):
+        pass
+
+
+class _LiveCounter:
+    """树状数组，统计每个槽位是否存活，用于行号与槽位之间的换算"""
+
+    def __init__(self, values=()):
+        # 线性建树
+        self.tree = [0]
+        self.tree.extend(values)
+        self.size = len(self.tree) - 1
+        for i in range(1, self.size + 1):
+            j = i + (i & -i)
+            if j <= self.size:
+                self.tree[j] += self.tree[i]
+
+    def append(self, value):
+        # 新槽位的节点值 = 覆盖区间 (i - lowbit(i), i] 的和
+        self.size += 1
+        i = self.size
+        low = i & -i
+        self.tree.append(value + self.prefix(i - 1) - self.prefix(i - low))
+
+    def add(self, slot, delta):
+        i = slot + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, count):
+        """前 count 个槽位中存活的数量"""
+        total = 0
+        i = count
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def select(self, rank):
+        """返回第 rank 个（从1开始）存活槽位的下标"""
+        pos = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] < rank:
+                pos = nxt
+                rank -= self.tree[nxt]
+            step >>= 1
+        return pos
+
+
+class ClipHistory:
+    """剪贴板历史记录
+
+    不依赖 PyQt / win32。内容按哈希去重，槽位按插入顺序追加（最新的在末尾），
+    从持久化存储分页载入的旧条目放到头部预留的空位里，
+    删除只留下空洞并在空洞过多时整理。去重和按 id 查找只做一次字典访问，
+    插入、移到最前、删除以及按编号/行号查找只需维护树状数组，为 O(log n)，
+    不再逐条比较字符串。
+    行号 0 对应最新的一条，与界面上的 [1] 编号一致。
+
+    可以用 HistoryLimits 限制条目数、总字节数和保留时间，超出时按淘汰策略
+    （EvictionPolicy）逐条删除，和手动删除一样增量通知观察者。
+
+    修改只发生在界面线程；其它线程（搜索、快捷键）读取时需持有 lock。
+    """
+
+    def __init__(self, blob_store=None, limits=None, policy=None):
+        # 可选的 BlobStore，超长文本只写入一次磁盘
+        self.blob_store = blob_store
+        self._by_digest = {}
+        self._by_id = {}
+        self._slots = []
+        # _slots[:_base] 是为旧条目预留的空位
+        self._base = 0
+        self._live = _LiveCounter()
+        self._next_id = 1
+        self._observers = []
+        self.lock = threading.RLock()
+        self.limits = HistoryLimits()
+        self.total_bytes = 0
+        # 只有设置了上限才跟踪淘汰顺序
+        self._policy = None
+        # 设置了 max_age 时按创建时间排列的 (created, id)，删除的条目惰性跳过
+        self._ages = None
+        # 正在因上限或过期淘汰条目，观察者可据此区分手动删除
+        self.evicting = False
+        self.half_life = FRECENCY_HALF_LIFE
+        if limits is not None:
+            self.set_limits(limits, policy)
+
+    def add_observer(self, observer):
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        if observer in self._observers:
+            self._observers.remove(observer)
+
+    def _notify(self, name, *args):
+        for observer in self._observers:
+            getattr(observer, name)(*args)
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __iter__(self):
+        """从新到旧遍历"""
+        for entry in reversed(self._slots):
+            if entry is not None:
+                yield entry
+
+    def __contains__(self, text):
+        return content_digest(text) in self._by_digest
+
+    def _new_entry(self, text, created, formats=None):
+        """创建条目；超长文本写入 BlobStore，条目里只留预览"""
+        data = text.encode('utf-8')
+        digest = bytes_digest(data)
+        if digest in self._by_digest:
+            return self._by_digest[digest], False
+        if self.blob_store is not None and len(text) > BLOB_THRESHOLD:
+            self.blob_store.put(digest, data)
+            entry = ClipEntry(self._next_id, digest, None, created, blob=self.blob_store,
+                              length=len(text), preview=text[:PREVIEW_CHARS], formats=formats,
+                              size=len(data))
+        else:
+            packed = _compress(data)
+            if packed is not None:
+                entry = ClipEntry(self._next_id, digest, None, created, length=len(text),
+                                  preview=text[:PREVIEW_CHARS], formats=formats, size=len(data),
+                                  compressed=packed)
+            else:
+                entry = ClipEntry(self._next_id, digest, text, created, formats=formats, size=len(data))
+        self._next_id += 1
+        return entry, True
+
+    def _new_image(self, digest, preview, formats, created, size=0):
+        if digest in self._by_digest:
+            return self._by_digest[digest], False
+        entry = ClipEntry(self._next_id, digest, '', created, length=0, preview=preview,
+                          formats=formats, kind='image', size=size)
+        self._next_id += 1
+        return entry, True
+
+    @_locked
+    def add(self, text, created=None, formats=None):
+        """添加文本，返回 (entry, 是否为新条目)；已存在时不改变顺序"""
+        entry, added = self._new_entry(text, created, formats)
+        if added:
+            self._insert_front(entry)
+            self._enforce_limits()
+        return entry, added
+
+    @_locked
+    def add_image(self, digest, preview, formats, created=None, size=0):
+        """添加图片条目，digest 为图片像素的哈希，图片本身在 formats 中，size 为编码后的大小"""
+        entry, added = self._new_image(digest, preview, formats, created, size)
+        if added:
+            self._insert_front(entry)
+            self._enforce_limits()
+        return entry, added
+
+    @_locked
+    def add_many(self, items):
+        """按时间顺序批量添加 (text, formats)，最后一项排在最前
+
+        批内和已有条目都会去重，新条目只发出一次插入通知。
+        返回与 items 对应的 (entry, 是否为新条目) 列表。
+        """
+        results = []
+        fresh = []
+        pending = {}
+        for text, formats in items:
+            entry, added = self._new_entry(text, None, formats)
+            if added and entry.digest in pending:
+                # 批内重复，沿用前面已创建的条目
+                entry, added = pending[entry.digest], False
+            elif added:
+                pending[entry.digest] = entry
+                fresh.append(entry)
+            results.append((entry, added))
+        if fresh:
+            self._notify('history_about_to_insert', 0, len(fresh))
+            for entry in fresh:
+                self._by_digest[entry.digest] = entry
+                self._by_id[entry.id] = entry
+                self._append_slot(entry)
+                self._track(entry)
+            self._notify('history_inserted', 0, len(fresh))
+            self._enforce_limits()
+        return results
+
+    def _insert_front(self, entry):
+        self._notify('history_about_to_insert', 0, 1)
+        self._by_digest[entry.digest] = entry
+        self._by_id[entry.id] = entry
+        self._append_slot(entry)
+        self._track(entry)
+        self._notify('history_inserted', 0, 1)
+
+    @_locked
+    def set_formats(self, entry_id, formats):
+        """补充条目的其它格式（后台写入 BlobStore 完成后调用）"""
+        entry = self._by_id.get(entry_id)
+        if entry is None:
+            return False
+        entry.formats = {**entry.formats, **formats}
+        self._notify('history_changed', self.row_of_entry(entry))
+        return True
+
+    def format_data(self, entry, fmt):
+        """读取条目某个格式的原始字节，不存在时返回 None"""
+        digest = entry.formats.get(fmt)
+        if digest is None or self.blob_store is None:
+            return None
+        try:
+            return self.blob_store.read_bytes(digest)
+        except OSError:
+            return None
+
+    @_locked
+    def append_older(self, text, created=None, formats=None, pinned=False, score=NO_SCORE, tags=None):
+        """在末尾（最旧的位置）追加条目，用于分页载入；已存在时返回 None"""
+        entry, added = self._new_entry(text, created, formats)
+        if not added:
+            return None
+        return self._insert_older(entry, pinned, score, tags)
+
+    @_locked
+    def append_older_blob(self, digest, length, preview, created=None, formats=None, pinned=False,
+                          score=NO_SCORE, tags=None):
+        """追加一条已存在于 BlobStore 中的大条目，用于分页载入"""
+        if digest in self._by_digest or self.blob_store is None:
+            return None
+        entry = ClipEntry(self._next_id, digest, None, created, blob=self.blob_store,
+                          length=length, preview=preview, formats=formats)
+        self._next_id += 1
+        return self._insert_older(entry, pinned, score, tags)
+
+    @_locked
+    def append_older_image(self, digest, preview, formats, created=None, pinned=False, score=NO_SCORE,
+                           tags=None):
+        entry, added = self._new_image(digest, preview, formats, created)
+        if not added:
+            return None
+        return self._insert_older(entry, pinned, score, tags)
+
+    def _insert_older(self, entry, pinned, score, tags):
+        entry.pinned = pinned
+        entry.score = score
+        entry.tags = tags
+        digest = entry.digest
+        row = len(self._by_id)
+        self._notify('history_about_to_insert', row, 1)
+        if self._base == 0:
+            self._rebuild(max(64, len(self._slots)))
+        self._base -= 1
+        entry.slot = self._base
+        self._slots[self._base] = entry
+        self._live.add(self._base, 1)
+        self._by_digest[digest] = entry
+        self._by_id[entry.id] = entry
+        self._track(entry, older=True)
+        self._notify('history_inserted', row, 1)
+        self._enforce_limits()
+        return entry
+
+    @_locked
+    def move_to_front(self, entry_id):
+        """把条目移到最前，返回原来的行号"""
+        entry = self._by_id[entry_id]
+        row = self.row_of(entry_id)
+        if row == 0:
+            return 0
+        self._notify('history_about_to_move', row, 0)
+        self._release_slot(entry)
+        self._append_slot(entry)
+        self._maybe_compact()
+        if self._policy is not None and not entry.pinned:
+            self._policy.touched(entry)
+        self._notify('history_moved', row, 0)
+        return row
+
+    @_locked
+    def mark_pasted(self, entry_id, now=None):
+        """记录条目被粘贴或拖拽使用，供淘汰策略和使用频率排序参考"""
+        entry = self._by_id.get(entry_id)
+        if entry is None:
+            return
+        if self._policy is not None and not entry.pinned:
+            self._policy.pasted(entry)
+        self._use(entry, 1.0, now)
+
+    @_locked
+    def bump(self, entry_id, now=None):
+        """重新复制了已有的内容：移到最前，并计入一次较轻的使用"""
+        entry = self._by_id.get(entry_id)
+        if entry is None:
+            return
+        self.move_to_front(entry_id)
+        self._use(entry, RECOPY_WEIGHT, now)
+
+    def _use(self, entry, weight, now):
+        entry.score = frecency(entry.score, weight, now if now is not None else time.time(), self.half_life)
+        self._notify('history_used', self.row_of_entry(entry))
+
+    @_locked
+    def absorb(self, old_id, entry_id):
+        """entry 是 old 的新版本（近似重复）：删除 old，它的使用频率并入 entry
+
+        old 已固定或不存在时不做任何事，返回 False。
+        """
+        old = self._by_id.get(old_id)
+        entry = self._by_id.get(entry_id)
+        if old is None or entry is None or old is entry or old.pinned:
+            return False
+        self.remove(old_id)
+        if old.score != NO_SCORE:
+            entry.score = merge_scores(entry.score, old.score)
+            self._notify('history_used', self.row_of_entry(entry))
+        return True
+
+    @_locked
+    def set_tags(self, entry_id, tags):
+        """记录后台识别出的内容类型"""
+        entry = self._by_id.get(entry_id)
+        if entry is None or entry.tags == tags:
+            return False
+        entry.tags = tags
+        self._notify('history_changed', self.row_of_entry(entry))
+        return True
+
+    @_locked
+    def set_pinned(self, entry_id, pinned):
+        """固定或取消固定条目；固定的条目不会因上限或过期被删除"""
+        entry = self._by_id.get(entry_id)
+        if entry is None:
+            return False
+        if entry.pinned == pinned:
+            return True
+        entry.pinned = pinned
+        if self._policy is not None:
+            if pinned:
+                self._policy.removed(entry)
+            else:
+                self._policy.added(entry)
+        if not pinned and self._ages is not None:
+            # 取消固定后重新参与过期检查（排在队尾，下次到期检查时处理）
+            self._ages.append((entry.created, entry.id))
+        self._notify('history_changed', self.row_of_entry(entry))
+        if not pinned:
+            self._enforce_limits()
+        return True
+
+    @_locked
+    def remove(self, entry_id):
+        """按 id 删除，返回被删除条目原来的行号；不存在时返回 -1"""
+        entry = self._by_id.get(entry_id)
+        if entry is None:
+            return -1
+        row = self.row_of_entry(entry)
+        self._notify('history_about_to_remove', row)
+        del self._by_id[entry_id]
+        del self._by_digest[entry.digest]
+        self._release_slot(entry)
+        self._untrack(entry)
+        self._maybe_compact()
+        self._notify('history_removed', row)
+        if entry.blob is not None:
+            entry.blob.delete(entry.digest)
+        if self.blob_store is not None:
+            for digest in entry.formats.values():
+                if digest is not None:
+                    self.blob_store.delete(digest)
+        return row
+
+    @_locked
+    def clear(self):
+        self._notify('history_about_to_reset')
+        self._by_digest.clear()
+        self._by_id.clear()
+        self._slots = []
+        self._base = 0
+        self._live = _LiveCounter()
+        self.total_bytes = 0
+        if self._policy is not None:
+            self._policy.clear()
+        if self._ages is not None:
+            self._ages.clear()
+        self._notify('history_reset')
+        if self.blob_store is not None:
+            self.blob_store.clear()
+
+    @_locked
+    def set_limits(self, limits, policy=None):
+        """设置上限和淘汰策略（默认 OldestFirst），并立即按新上限淘汰"""
+        self.limits = limits
+        self._policy = (policy or OldestFirst()) if limits.bounded else None
+        self._ages = None
+        entries = [entry for entry in self._slots if entry is not None]
+        if self._policy is not None:
+            for entry in entries:
+                if not entry.pinned:
+                    self._policy.added(entry)
+        if limits.max_age is not None:
+            self._ages = deque(sorted((entry.created, entry.id) for entry in entries))
+        self._enforce_limits()
+
+    def is_full(self):
+        """条目数已达上限，再分页载入旧条目也会被立即淘汰"""
+        return self.limits.max_entries is not None and len(self._by_id) >= self.limits.max_entries
+
+    @_locked
+    def expire(self, now=None):
+        """删除超过保留时间的条目，返回删除的数量"""
+        if self._ages is None:
+            return 0
+        cutoff = (now if now is not None else time.time()) - self.limits.max_age
+        removed = 0
+        ages = self._ages
+        evicting, self.evicting = self.evicting, True
+        try:
+            while ages and ages[0][0] < cutoff:
+                created, entry_id = ages.popleft()
+                entry = self._by_id.get(entry_id)
+                if entry is not None and not entry.pinned:
+                    self.remove(entry_id)
+                    removed += 1
+        finally:
+            self.evicting = evicting
+        if removed:
+            metrics.counter('expired').inc(removed)
+        return removed
+
+    def _track(self, entry, older=False):
+        self.total_bytes += entry.size
+        if self._policy is not None and not entry.pinned:
+            self._policy.added(entry, older)
+        if self._ages is not None:
+            if older:
+                self._ages.appendleft((entry.created, entry.id))
+            else:
+                self._ages.append((entry.created, entry.id))
+
+    def _untrack(self, entry):
+        self.total_bytes -= entry.size
+        if self._policy is not None:
+            self._policy.removed(entry)
+
+    def _enforce_limits(self):
+        """超出上限时逐条淘汰；每条都像手动删除一样通知观察者"""
+        if self._policy is None:
+            return
+        self.expire()
+        # 至少保留一条，刚复制的超大内容不会被自己挤掉；只剩固定的条目时停止
+        self.evicting = True
+        try:
+            while len(self._by_id) > 1 and self.limits.over(len(self._by_id), self.total_bytes):
+                victim = self._policy.victim()
+                if victim is None:
+                    break
+                self.remove(victim.id)
+                metrics.counter('evictions').inc()
+        finally:
+            self.evicting = False
+        ages = self._ages
+        if ages is not None and len(ages) > 2 * len(self._by_id) + 64:
+            # 已删除条目留下的记录过多时重建，均摊 O(1)
+            self._ages = deque(item for item in ages if item[1] in self._by_id)
+
+    def get(self, entry_id):
+        return self._by_id.get(entry_id)
+
+    def get_by_digest(self, digest):
+        return self._by_digest.get(digest)
+
+    def find(self, text):
+        """按内容查找条目"""
+        return self._by_digest.get(content_digest(text))
+
+    def entry_at(self, row):
+        """按行号（0 为最新）获取条目"""
+        count = len(self._by_id)
+        if not 0 <= row < count:
+            return None
+        return self._slots[self._live.select(count - row)]
+
+    def get_by_number(self, number):
+        """按界面编号（从1开始）获取条目"""
+        return self.entry_at(number - 1)
+
+    def row_of(self, entry_id):
+        entry = self._by_id.get(entry_id)
+        if entry is None:
+            return -1
+        return self.row_of_entry(entry)
+
+    def row_of_entry(self, entry):
+        return len(self._by_id) - self._live.prefix(entry.slot + 1)
+
+    def _append_slot(self, entry):
+        entry.slot = len(self._slots)
+        self._slots.append(entry)
+        self._live.append(1)
+
+    def _release_slot(self, entry):
+        self._slots[entry.slot] = None
+        self._live.add(entry.slot, -1)
+        entry.slot = -1
+
+    def _maybe_compact(self):
+        # 空洞超过一半时重建槽位，均摊后仍为 O(1)
+        if len(self._slots) < 64 or len(self._by_id) * 2 > len(self._slots) - self._base:
+            return
+        self._rebuild(0)
+
+    def _rebuild(self, front):
+        """去掉空洞，并在头部预留 front 个空位"""
+        entries = [entry for entry in self._slots if entry is not None]
+        self._slots = [None] * front + entries
+        self._base = front
+        for slot, entry in enumerate(entries, front):
+            entry.slot = slot
+        self._live = _LiveCounter([0] * front + [1] * len(entries))
@@ -0,0 +1,249 @@
+import time
+
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex
+
+from clip_classify import TAG_LABELS
+from clip_history import HistoryObserver
+from metrics import metrics
+
+# 条目 id 所在的角色；完整文本只在粘贴、拖拽时通过 entry.text 读取
+EntryIdRole = Qt.UserRole + 1
+
+
+class ClipListModel(QAbstractListModel, HistoryObserver):
+    """以 ClipHistory（或按使用频率排列的 FrecencyView）为数据源的列表模型
+
+    历史记录变化时只发出受影响行的 rowsInserted / rowsRemoved / rowsMoved /
+    dataChanged 信号；"[n] ·" 编号在 data() 中按行号即时计算，
+    所以在顶部插入不会改写其他行。字体、颜色和行高由 ClipItemDelegate 负责。
+    """
+
+    COPIED_TEXT = "✓ 已复制"
+
+    def __init__(self, history, store=None, parent=None):
+        super().__init__(parent)
+        self.history = history
+        # 持久化存储，用于滚动到底部时分页载入更旧的条目
+        self.store = store
+        # 图片条目的缩略图缓存（ThumbnailCache），可选
+        self.thumbnails = None
+        # 正在显示"已复制"提示的条目 id
+        self.flashing = set()
+        # 记录视图处理一次行变化（begin 到 end）的耗时
+        self._update_started = 0.0
+        self.history.add_observer(self)
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.history)
+
+    def entry_at_row(self, row):
+        return self.history.entry_at(row)
+
+    def row_of_entry_id(self, entry_id):
+        return self.history.row_of(entry_id)
+
+    def number_of(self, row, entry):
+        """界面上显示的编号，与 alt+数字 快捷键对应"""
+        return row + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        entry = self.entry_at_row(index.row())
+        if entry is None:
+            return None
+        if role == Qt.DisplayRole:
+            if entry.id in self.flashing:
+                return self.COPIED_TEXT
+            mark = '📌' if entry.pinned else '·'
+            return f"[{self.number_of(index.row(), entry)}] {mark} {entry.preview}"
+        if role == EntryIdRole:
+            return entry.id
+        if role == Qt.ToolTipRole and entry.tags:
+            return '、'.join(TAG_LABELS[tag] for tag in sorted(entry.tags))
+        if role == Qt.DecorationRole:
+            if entry.kind == 'image' and self.thumbnails is not None:
+                return self.thumbnails.get(entry)
+        return None
+
+    def canFetchMore(self, parent):
+        if parent.isValid() or self.store is None:
+            return False
+        # 条目数已达上限时，载入的旧条目会被立即淘汰
+        return self.store.has_more() and not self.history.is_full()
+
+    def fetchMore(self, parent):
+        if not parent.isValid() and self.store is not None:
+            # 载入的条目会经由 history_inserted 逐行通知视图
+            self.store.load_older()
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def entry(self, index):
+        """根据索引获取历史条目"""
+        if not index.isValid():
+            return None
+        return self.entry_at_row(index.row())
+
+    def set_thumbnails(self, thumbnails):
+        self.thumbnails = thumbnails
+        thumbnails.thumbnail_ready.connect(self.on_thumbnail_ready)
+
+    def on_thumbnail_ready(self, digest):
+        entry = self.history.get_by_digest(digest)
+        if entry is not None:
+            self._entry_changed(entry.id, [Qt.DecorationRole])
+
+    def flash(self, entry_id):
+        """把条目暂时显示为"已复制"，只刷新这一行"""
+        self.flashing.add(entry_id)
+        self._entry_changed(entry_id)
+
+    def unflash(self, entry_id):
+        if entry_id in self.flashing:
+            self.flashing.discard(entry_id)
+            self._entry_changed(entry_id)
+
+    def _entry_changed(self, entry_id, roles=None):
+        row = self.row_of_entry_id(entry_id)
+        if row >= 0:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, roles or [Qt.DisplayRole])
+
+    def history_changed(self, row):
+        entry = self.history.entry_at(row)
+        if entry is not None:
+            self._entry_changed(entry.id, [Qt.DisplayRole, Qt.DecorationRole])
+
+    def _begin_update(self):
+        self._update_started = time.perf_counter()
+
+    def _end_update(self):
+        metrics.histogram('list_update').observe(time.perf_counter() - self._update_started)
+
+    def history_about_to_insert(self, row, count):
+        self._begin_update()
+        self.beginInsertRows(QModelIndex(), row, row + count - 1)
+
+    def history_inserted(self, row, count):
+        self.endInsertRows()
+        self._end_update()
+
+    def history_about_to_remove(self, row):
+        self._begin_update()
+        entry = self.history.entry_at(row)
+        if entry is not None:
+            self.flashing.discard(entry.id)
+        self.beginRemoveRows(QModelIndex(), row, row)
+
+    def history_removed(self, row):
+        self.endRemoveRows()
+        self._end_update()
+
+    def history_about_to_move(self, row, dest):
+        self._begin_update()
+        self.beginMoveRows(QModelIndex(), row, row, QModelIndex(), dest)
+
+    def history_moved(self, row, dest):
+        self.endMoveRows()
+        self._end_update()
+
+    def history_about_to_reset(self):
+        self.beginResetModel()
+
+    def history_reset(self):
+        self.flashing.clear()
+        self.endResetModel()
+
+
+class SearchResultModel(ClipListModel):
+    """搜索结果列表
+
+    结果由搜索线程分批送来，只在末尾追加行。编号显示条目在完整历史中的
+    编号，所以快捷键和搜索结果上的编号一致。
+    """
+
+    def __init__(self, history, parent=None):
+        super().__init__(history, None, parent)
+        self.results = []
+        self._removing = -1
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.results)
+
+    def entry_at_row(self, row):
+        if 0 <= row < len(self.results):
+            return self.history.get(self.results[row])
+        return None
+
+    def row_of_entry_id(self, entry_id):
+        try:
+            return self.results.index(entry_id)
+        except ValueError:
+            return -1
+
+    def number_of(self, row, entry):
+        return self.history.row_of_entry(entry) + 1
+
+    def canFetchMore(self, parent):
+        return False
+
+    def reset_results(self):
+        self.beginResetModel()
+        self.results = []
+        self.endResetModel()
+
+    def append_results(self, entry_ids):
+        """追加一批搜索结果"""
+        entry_ids = [i for i in entry_ids if self.history.get(i) is not None]
+        if not entry_ids:
+            return
+        first = len(self.results)
+        self.beginInsertRows(QModelIndex(), first, first + len(entry_ids) - 1)
+        self.results.extend(entry_ids)
+        self.endInsertRows()
+
+    def _renumber(self):
+        # 历史记录的插入和移动只会改变编号，通知视图重新取显示文本
+        if self.results:
+            self.dataChanged.emit(self.index(0), self.index(len(self.results) - 1), [Qt.DisplayRole])
+
+    def history_about_to_insert(self, row, count):
+        pass
+
+    def history_inserted(self, row, count):
+        self._renumber()
+
+    def history_about_to_remove(self, row):
+        entry = self.history.entry_at(row)
+        self._removing = self.row_of_entry_id(entry.id) if entry is not None else -1
+        if self._removing >= 0:
+            self.flashing.discard(entry.id)
+            self.beginRemoveRows(QModelIndex(), self._removing, self._removing)
+            del self.results[self._removing]
+
+    def history_removed(self, row):
+        if self._removing >= 0:
+            self.endRemoveRows()
+        self._renumber()
+
+    def history_about_to_move(self, row, dest):
+        pass
+
+    def history_moved(self, row, dest):
+        self._renumber()
+
+    def history_about_to_reset(self):
+        self.beginResetModel()
+
+    def history_reset(self):
+        self.results = []
+        self.flashing.clear()
+        self.endResetModel()
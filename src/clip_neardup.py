@@ -0,0 +1,193 @@
+"""近似重复内容的检测（不依赖 Qt）
+
+只差几个字符的内容（末尾多了空白、时间戳不同、改了一个词的日志行或代码块）
+哈希不同，精确去重认不出来。这里把内容开头的词和相邻词对作为特征，
+两段内容特征集合的 Jaccard 相似度不低于 SIMILARITY 时算作近似重复。
+
+每个条目计算一个 MinHash 签名（一次排列、分成 BINS 个桶，只需对特征哈希一遍），
+按 BANDS 段、每段 ROWS 个值分段哈希放进 LSH 索引：至少有一段完全相同的条目才是候选，
+再用特征集合精确比较。相似度 0.8 的两段内容成为候选的概率约 97%，
+不相关的内容几乎不会碰到一起，查找不随历史记录条数增长。
+"""
+import re
+import time
+
+from clip_history import HistoryObserver
+from metrics import metrics
+
+# 只比较开头的这么多字符
+SCAN_CHARS = 4096
+SIMILARITY = 0.8
+# 词太少的内容（短命令、数字、密码）改一个词就是不同的内容，不参与
+MIN_TOKENS = 8
+# 长度相差太多的不算近似重复（超出 SCAN_CHARS 的部分不比较）
+LENGTH_RATIO = 0.8
+BINS = 16
+BANDS = 5
+ROWS = 3
+# 每次查找至多精确比较这么多个候选
+MAX_CANDIDATES = 16
+
+_TOKEN = re.compile(r'\w+|[^\w\s]')
+_MASK = (1 << 64) - 1
+_EMPTY = _MASK >> 4
+
+
+def features(text):
+    """词和相邻词对的集合；词太少时返回 None"""
+    tokens = _TOKEN.findall(text, 0, SCAN_CHARS)
+    if len(tokens) < MIN_TOKENS:
+        return None
+    result = set(tokens)
+    result.update(zip(tokens, tokens[1:]))
+    return result
+
+
+def signature(feature_set):
+    """一次排列的 MinHash：哈希值的低 4 位选桶，其余位在桶内取最小"""
+    mins = [_EMPTY] * BINS
+    for value in map(hash, feature_set):
+        value &= _MASK
+        index = value & (BINS - 1)
+        value >>= 4
+        if value < mins[index]:
+            mins[index] = value
+    return mins
+
+
+def band_keys(mins):
+    return tuple(hash((band,) + tuple(mins[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS))
+
+
+def jaccard(a, b):
+    union = len(a | b)
+    return len(a & b) / union if union else 1.0
+
+
+class NearDuplicateIndex(HistoryObserver):
+    """历史记录中文本条目的 LSH 索引，随插入、删除增量更新
+
+    桶的值是一个条目 id，或多个条目时的 id 列表。为了少占内存，条目不保存自己的
+    分段哈希，删除时重新计算后移出。大条目（在 BlobStore 中）和图片不参与。
+    所有回调都在持有 history.lock 时执行；find 也需要在持有 lock 时调用。
+    """
+
+    def __init__(self, history):
+        self.history = history
+        self._buckets = {}
+        self.count = 0
+        # 最近一次计算的 (条目 id, 特征集合, 分段哈希)，新条目入索引后紧接着就会查找
+        self._last = (None, None, None)
+        with history.lock:
+            for entry in history:
+                self._add(entry)
+            history.add_observer(self)
+
+    def __len__(self):
+        return self.count
+
+    def _keys(self, entry):
+        """(特征集合, 分段哈希)；不参与的条目返回 (None, None)"""
+        last_id, feature_set, keys = self._last
+        if last_id == entry.id:
+            return feature_set, keys
+        if entry.kind != 'text' or entry.is_blob:
+            return None, None
+        try:
+            feature_set = features(entry.head(SCAN_CHARS))
+        except (OSError, ValueError):
+            return None, None
+        if feature_set is None:
+            return None, None
+        keys = band_keys(signature(feature_set))
+        self._last = (entry.id, feature_set, keys)
+        return feature_set, keys
+
+    def _add(self, entry):
+        keys = self._keys(entry)[1]
+        if keys is None:
+            return
+        self.count += 1
+        buckets = self._buckets
+        for key in keys:
+            ids = buckets.get(key)
+            if ids is None:
+                buckets[key] = entry.id
+            elif type(ids) is list:
+                ids.append(entry.id)
+            else:
+                buckets[key] = [ids, entry.id]
+
+    def _discard(self, entry):
+        keys = self._keys(entry)[1]
+        if keys is None:
+            return
+        entry_id = entry.id
+        buckets = self._buckets
+        removed = False
+        for key in keys:
+            ids = buckets.get(key)
+            if type(ids) is list:
+                if entry_id not in ids:
+                    continue
+                ids.remove(entry_id)
+                if len(ids) == 1:
+                    buckets[key] = ids[0]
+            elif ids == entry_id:
+                del buckets[key]
+            else:
+                continue
+            removed = True
+        if removed:
+            self.count -= 1
+        self._last = (None, None, None)
+
+    def find(self, entry):
+        """与 entry 近似重复的其它条目（固定的除外），相似度从高到低"""
+        feature_set, keys = self._keys(entry)
+        if keys is None:
+            return []
+        started = time.perf_counter()
+        votes = {}
+        for key in keys:
+            ids = self._buckets.get(key)
+            if ids is None:
+                continue
+            for other_id in (ids if type(ids) is list else (ids,)):
+                if other_id != entry.id:
+                    votes[other_id] = votes.get(other_id, 0) + 1
+        matches = []
+        if votes:
+            # 相同的段越多越可能相似，先比较这些
+            for other_id in sorted(votes, key=votes.get, reverse=True)[:MAX_CANDIDATES]:
+                other = self.history.get(other_id)
+                if other is None or other.pinned:
+                    continue
+                if min(entry.length, other.length) < LENGTH_RATIO * max(entry.length, other.length):
+                    continue
+                try:
+                    other_features = features(other.head(SCAN_CHARS))
+                except (OSError, ValueError):
+                    continue
+                if other_features is None:
+                    continue
+                similarity = jaccard(feature_set, other_features)
+                if similarity >= SIMILARITY:
+                    matches.append((similarity, other))
+            matches.sort(key=lambda match: match[0], reverse=True)
+        metrics.histogram('neardup_find').observe(time.perf_counter() - started)
+        return [other for _, other in matches]
+
+    # HistoryObserver
+
+    def history_inserted(self, row, count):
+        for offset in range(count):
+            self._add(self.history.entry_at(row + offset))
+
+    def history_about_to_remove(self, row):
+        self._discard(self.history.entry_at(row))
+
+    def history_reset(self):
+        self._buckets.clear()
+        self.count = 0
+        self._last = (None, None, None)
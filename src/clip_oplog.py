@@ -0,0 +1,571 @@
+"""历史记录的操作日志，用于多台机器之间同步
+
+每个实例有一个随机的 replica id。本地的插入、删除、清空、固定都记成一条
+操作，按来源实例编号（seq 从 1 连续递增）追加到日志里；实例当前看到的每个
+来源的最大 seq 组成向量时钟。两个实例同步时只需交换时钟，再把对方缺少的
+操作发过去（seq 大于对方时钟的部分）。
+
+冲突按操作本身确定地解决，与到达顺序无关：
+
+- 插入/删除/清空按“看到过才能删除”处理：删除和清空携带执行时的向量时钟，
+  只删除时钟覆盖到的插入；另一台机器并发复制的同一内容会保留下来。
+- 固定状态取 (lamport, replica) 最大的一次设置。重新复制已删除的内容时，
+  如果记录的固定状态与新条目不同，随插入再记一次固定操作。
+
+大条目（在 BlobStore 中）的插入只记哈希，发送给其它实例时才从 BlobStore 读出内容。
+
+已知的所有实例（本机和同步过的其它实例）都看到过的操作会定期并入快照（state.json），
+日志文件里只保留之后的操作，启动时先载入快照再重放剩下的部分。
+
+本模块不依赖 Qt。
+"""
+import json
+import logging
+import os
+import tempfile
+import uuid
+
+from clip_history import HistoryObserver
+
+log = logging.getLogger(__name__)
+
+INSERT = 'insert'
+REMOVE = 'remove'
+CLEAR = 'clear'
+PIN = 'pin'
+
+STATE_FILE = 'state.json'
+PEERS_FILE = 'peers.json'
+# 可以并入快照的操作达到这么多条时整理日志
+COMPACT_OPS = 10000
+
+
+class Operation:
+    """一条操作；text、created、blob 只用于插入，pinned 只用于固定，clock 只用于删除和清空
+
+    blob 为 True 的插入在本机日志里不带 text，发送前由 OpLog 从 BlobStore 读出。
+    """
+
+    __slots__ = ('origin', 'seq', 'lamport', 'kind', 'digest', 'text', 'created', 'pinned', 'clock',
+                 'blob')
+
+    def __init__(self, origin, seq, lamport, kind, digest=None, text=None, created=None,
+                 pinned=None, clock=None, blob=None):
+        self.origin = origin
+        self.seq = seq
+        self.lamport = lamport
+        self.kind = kind
+        self.digest = digest
+        self.text = text
+        self.created = created
+        self.pinned = pinned
+        self.clock = clock
+        self.blob = blob
+
+    @property
+    def stamp(self):
+        """全局唯一且全序的时间戳"""
+        return self.lamport, self.origin
+
+    def to_dict(self):
+        result = {'origin': self.origin, 'seq': self.seq, 'lamport': self.lamport, 'kind': self.kind}
+        if self.digest is not None:
+            result['digest'] = self.digest.hex()
+        for name in ('text', 'created', 'pinned', 'clock', 'blob'):
+            value = getattr(self, name)
+            if value is not None:
+                result[name] = value
+        return result
+
+    @classmethod
+    def from_dict(cls, values):
+        digest = values.get('digest')
+        kind = values['kind']
+        if kind not in (INSERT, REMOVE, CLEAR, PIN):
+            raise ValueError(f'unknown operation: {kind}')
+        return cls(str(values['origin']), int(values['seq']), int(values['lamport']), kind,
+                   bytes.fromhex(digest) if digest is not None else None, values.get('text'),
+                   values.get('created'), values.get('pinned'), values.get('clock'), values.get('blob'))
+
+    def __repr__(self):
+        return f"Operation({self.kind} {self.origin}:{self.seq})"
+
+
+def merge_clock(target, clock):
+    """把 clock 逐项取最大值合并进 target"""
+    for origin, seq in clock.items():
+        if seq > target.get(origin, 0):
+            target[origin] = seq
+
+
+def _write_json(path, value):
+    """先写临时文件再改名，中途退出不会留下不完整的文件"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(value, f, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError as e:
+        log.warning("Ignoring damaged %s: %s", path, e)
+        return None
+
+
+def encode_op(op):
+    return json.dumps(op.to_dict(), ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def decode_ops(data):
+    """解析若干完整的行；损坏的行记录日志后跳过"""
+    ops = []
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            ops.append(Operation.from_dict(json.loads(line)))
+        except (ValueError, KeyError, TypeError) as e:
+            log.warning("Skipping bad operation: %s", e)
+    return ops
+
+
+class OpLog:
+    """追加写的操作日志和由它得出的同步状态
+
+    日志按来源分文件保存在 directory 下（<replica>.jsonl，本机和收到的操作都记），
+    内存里只保留每条操作在文件中的偏移，向其它实例发送时再从文件读出。
+    merge() 合并操作并返回需要对本地历史记录做的修改。
+
+    peers 是同步过的其它实例的向量时钟（note_peer 记录，保存在 peers.json）。
+    所有已知时钟都覆盖到的操作不会再有实例需要，compact() 把它们并入快照并从
+    日志文件中删去；之后才第一次通过 IPC 同步的实例收不到这些操作
+    （通过共享目录同步的实例读的是共享目录里的完整记录）。
+    blob_store 用于发送只记了哈希的大条目插入。
+    """
+
+    def __init__(self, directory, blob_store=None):
+        self.directory = directory
+        self.blob_store = blob_store
+        os.makedirs(directory, exist_ok=True)
+        self.replica = self._load_replica_id()
+        self.clock = {}
+        self.lamport = 0
+        # digest -> {origin: (seq, lamport)}，只记每个来源最新的一次插入，为空即已删除
+        self._tags = {}
+        # 删除过的内容：digest -> 删除时的向量时钟（多次删除逐项取最大）
+        self._removed = {}
+        # 所有清空操作的时钟逐项取最大值
+        self._cleared = {}
+        # digest -> (lamport, origin, pinned)
+        self._pins = {}
+        self._offsets = {}
+        self._files = {}
+        # 每个来源已并入快照的最后一个 seq，日志文件从下一条开始
+        self._base = {}
+        self.peers = _read_json(os.path.join(directory, PEERS_FILE)) or {}
+        self._load()
+        self.maybe_compact()
+
+    def _load_replica_id(self):
+        path = os.path.join(self.directory, 'replica')
+        try:
+            with open(path, encoding='utf-8') as f:
+                replica = f.read().strip()
+            if replica:
+                return replica
+        except FileNotFoundError:
+            pass
+        replica = uuid.uuid4().hex[:12]
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(replica)
+        return replica
+
+    def _path(self, origin):
+        return os.path.join(self.directory, origin + '.jsonl')
+
+    def _load(self):
+        """启动时载入快照并重放日志，恢复时钟和状态（本地历史记录已由 HistoryStore 恢复）"""
+        state = _read_json(os.path.join(self.directory, STATE_FILE))
+        if state:
+            try:
+                self._restore(state)
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f'damaged operation log snapshot: {e}') from None
+        for name in os.listdir(self.directory):
+            if not name.endswith('.jsonl'):
+                continue
+            path = os.path.join(self.directory, name)
+            offsets = []
+            with open(path, 'rb') as f:
+                offset = 0
+                for line in f:
+                    # 上次写到一半退出留下的不完整或损坏的行，连同之后的内容一起截掉
+                    op = decode_ops(line) if line.endswith(b'\n') else None
+                    if op and op[0].seq <= self._base.get(op[0].origin, 0):
+                        # 整理日志时在改写文件之前退出，留下了已并入快照的操作
+                        offset += len(line)
+                        continue
+                    if not op or op[0].seq != self.clock.get(op[0].origin, 0) + 1:
+                        break
+                    self._apply(op[0])
+                    offsets.append(offset)
+                    offset += len(line)
+            if os.path.getsize(path) != offset:
+                with open(path, 'r+b') as f:
+                    f.truncate(offset)
+            if offsets:
+                self._offsets[name[:-len('.jsonl')]] = offsets
+
+    def _restore(self, state):
+        """载入快照；快照包含写入时的全部状态，重放日志里剩下的操作不会重复生效"""
+        self._base = {str(origin): int(seq) for origin, seq in state.get('base', {}).items()}
+        self.clock = dict(self._base)
+        self.lamport = int(state.get('lamport', 0))
+        self._tags = {bytes.fromhex(digest): {origin: tuple(tag) for origin, tag in tags.items()}
+                      for digest, tags in state.get('tags', {}).items()}
+        self._removed = {bytes.fromhex(digest): clock for digest, clock in state.get('removed', {}).items()}
+        self._cleared = dict(state.get('cleared', {}))
+        self._pins = {bytes.fromhex(digest): (lamport, origin, bool(pinned))
+                      for digest, (lamport, origin, pinned) in state.get('pins', {}).items()}
+
+    def _snapshot(self, base):
+        return {
+            'base': base,
+            'lamport': self.lamport,
+            'tags': {digest.hex(): {origin: list(tag) for origin, tag in tags.items()}
+                     for digest, tags in self._tags.items()},
+            'removed': {digest.hex(): clock for digest, clock in self._removed.items()},
+            'cleared': self._cleared,
+            'pins': {digest.hex(): list(register) for digest, register in self._pins.items()},
+        }
+
+    def note_peer(self, replica, clock):
+        """记录其它实例的向量时钟（它已经有了哪些操作），可能因此整理日志"""
+        if replica == self.replica:
+            return
+        known = self.peers.setdefault(replica, {})
+        before = dict(known)
+        merge_clock(known, clock)
+        if known != before:
+            try:
+                _write_json(os.path.join(self.directory, PEERS_FILE), self.peers)
+            except OSError as e:
+                log.warning("Error saving peer clocks: %s", e)
+            self.maybe_compact()
+
+    def stable_clock(self):
+        """本机和所有已知实例都有的操作"""
+        stable = dict(self.clock)
+        for clock in self.peers.values():
+            for origin in stable:
+                stable[origin] = min(stable[origin], int(clock.get(origin, 0)))
+        return stable
+
+    def maybe_compact(self):
+        stable = self.stable_clock()
+        if sum(seq - self._base.get(origin, 0) for origin, seq in stable.items()) >= COMPACT_OPS:
+            self.compact(stable)
+
+    def compact(self, stable=None):
+        """把 stable（默认为 stable_clock()）覆盖到的操作并入快照，从日志文件中删去"""
+        if stable is None:
+            stable = self.stable_clock()
+        base = {origin: max(seq, self._base.get(origin, 0)) for origin, seq in stable.items()}
+        # 先写快照，改写日志文件时退出的话，启动时跳过已并入快照的操作
+        _write_json(os.path.join(self.directory, STATE_FILE), self._snapshot(base))
+        for origin, offsets in self._offsets.items():
+            drop = base.get(origin, 0) - self._base.get(origin, 0)
+            if drop <= 0:
+                continue
+            f = self._files.pop(origin, None)
+            if f is not None:
+                f.close()
+            path = self._path(origin)
+            start = offsets[drop] if drop < len(offsets) else os.path.getsize(path)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as out, open(path, 'rb') as f:
+                    f.seek(start)
+                    while True:
+                        chunk = f.read(1 << 20)
+                        if not chunk:
+                            break
+                        out.write(chunk)
+                os.replace(tmp_path, path)
+            except OSError:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+            self._offsets[origin] = [offset - start for offset in offsets[drop:]]
+        folded = sum(base.values()) - sum(self._base.values())
+        self._base = base
+        log.info("Compacted operation log, %d operations folded into the snapshot", folded)
+
+    def close(self):
+        for f in self._files.values():
+            f.close()
+        self._files.clear()
+
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+
+    def _append(self, op):
+        f = self._files.get(op.origin)
+        if f is None:
+            f = self._files[op.origin] = open(self._path(op.origin), 'ab')
+        self._offsets.setdefault(op.origin, []).append(f.tell())
+        f.write(encode_op(op))
+
+    def ops_since(self, clock, limit=None):
+        """对方（时钟为 clock）缺少的操作，每个来源按 seq 升序"""
+        ops = []
+        for origin in list(self._offsets):
+            ops.extend(self.ops_from(origin, clock.get(origin, 0),
+                                     limit - len(ops) if limit is not None else None))
+            if limit is not None and len(ops) >= limit:
+                break
+        return ops
+
+    def ops_from(self, origin, seq, limit=None):
+        """来源 origin 在 seq 之后的操作（已并入快照的除外）"""
+        offsets = self._offsets.get(origin, ())
+        index = max(seq - self._base.get(origin, 0), 0)
+        if index >= len(offsets):
+            return []
+        f = self._files.get(origin)
+        if f is not None:
+            f.flush()
+        ops = []
+        with open(self._path(origin), 'rb') as f:
+            f.seek(offsets[index])
+            for line in f:
+                ops.extend(self._resolve(op) for op in decode_ops(line))
+                if limit is not None and len(ops) >= limit:
+                    break
+        return ops
+
+    def _resolve(self, op):
+        """只记了哈希的大条目插入，从 BlobStore 读出内容"""
+        if op.blob and op.text is None and self.blob_store is not None:
+            try:
+                op.text = self.blob_store.read_text(op.digest)
+            except (OSError, ValueError) as e:
+                # 条目已被删除，之后的删除操作会让对方也删掉
+                log.debug("Blob for operation %r is gone: %s", op, e)
+        return op
+
+    def is_live(self, digest):
+        return bool(self._tags.get(digest))
+
+    def pinned(self, digest):
+        register = self._pins.get(digest)
+        return register is not None and register[2]
+
+    def _new_op(self, kind, **fields):
+        self.lamport += 1
+        op = Operation(self.replica, self.clock.get(self.replica, 0) + 1, self.lamport, kind, **fields)
+        self._apply(op)
+        self._append(op)
+        return op
+
+    def record_insert(self, digest, text, created, blob=False):
+        """blob 为 True 时 text 为 None，内容在 BlobStore 中"""
+        return self._new_op(INSERT, digest=digest, text=text, created=created, blob=blob or None)
+
+    def record_remove(self, digest):
+        return self._new_op(REMOVE, digest=digest, clock=dict(self.clock))
+
+    def record_clear(self):
+        return self._new_op(CLEAR, clock=dict(self.clock))
+
+    def record_pin(self, digest, pinned):
+        return self._new_op(PIN, digest=digest, pinned=pinned)
+
+    def merge(self, ops):
+        """合并收到的操作，跳过已有的和不连续的，返回本地需要做的修改：
+
+        ('add', op, pinned)、('front', digest)、('remove', digest)、('pin', digest, pinned)
+        """
+        effects = []
+        # lamport 序与因果序一致：删除总排在它看到过的插入之后
+        for op in sorted(ops, key=lambda op: (op.lamport, op.origin, op.seq)):
+            if op.seq != self.clock.get(op.origin, 0) + 1:
+                continue
+            effects.extend(self._apply(op))
+            self._append(op)
+        self.maybe_compact()
+        return effects
+
+    def _apply(self, op):
+        self.clock[op.origin] = op.seq
+        if op.lamport > self.lamport:
+            self.lamport = op.lamport
+        if op.kind == INSERT:
+            return self._apply_insert(op)
+        if op.kind == REMOVE:
+            return self._apply_remove(op)
+        if op.kind == CLEAR:
+            return self._apply_clear(op)
+        return self._apply_pin(op)
+
+    def _covered(self, digest, origin, seq):
+        removed = self._removed.get(digest)
+        if removed is not None and removed.get(origin, 0) >= seq:
+            return True
+        return self._cleared.get(origin, 0) >= seq
+
+    def _apply_insert(self, op):
+        if self._covered(op.digest, op.origin, op.seq):
+            return ()
+        tags = self._tags.setdefault(op.digest, {})
+        top = max(((lamport, origin) for origin, (seq, lamport) in tags.items()), default=None)
+        tags[op.origin] = (op.seq, op.lamport)
+        if top is None:
+            return (('add', op, self.pinned(op.digest)),)
+        if op.stamp > top:
+            return (('front', op.digest),)
+        return ()
+
+    def _drop_covered(self, digest, clock):
+        """去掉 clock 覆盖到的插入，内容因此被删除时返回 True"""
+        tags = self._tags.get(digest)
+        if not tags:
+            return False
+        for origin in [origin for origin, (seq, _) in tags.items() if clock.get(origin, 0) >= seq]:
+            del tags[origin]
+        if tags:
+            return False
+        del self._tags[digest]
+        return True
+
+    def _apply_remove(self, op):
+        merge_clock(self._removed.setdefault(op.digest, {}), op.clock)
+        if self._drop_covered(op.digest, op.clock):
+            return (('remove', op.digest),)
+        return ()
+
+    def _apply_clear(self, op):
+        merge_clock(self._cleared, op.clock)
+        effects = [('remove', digest) for digest in list(self._tags)
+                   if self._drop_covered(digest, op.clock)]
+        # 已被清空覆盖的删除记录不再需要
+        cleared = self._cleared
+        for digest in [digest for digest, clock in self._removed.items()
+                       if all(cleared.get(origin, 0) >= seq for origin, seq in clock.items())]:
+            del self._removed[digest]
+        return effects
+
+    def _apply_pin(self, op):
+        register = self._pins.get(op.digest)
+        if register is not None and register[:2] >= op.stamp:
+            return ()
+        self._pins[op.digest] = (op.lamport, op.origin, bool(op.pinned))
+        if self.is_live(op.digest):
+            return (('pin', op.digest, bool(op.pinned)),)
+        return ()
+
+
+class Replicator(HistoryObserver):
+    """把 ClipHistory 的本地修改记入 OpLog，并把收到的操作应用到 ClipHistory
+
+    图片条目不参与同步；因上限或过期被淘汰的条目只在本机删除，不会同步出去。
+    store 为 HistoryStore 时，分页载入的旧条目不会被当成新复制记录下来。
+    """
+
+    def __init__(self, history, oplog, store=None):
+        self.history = history
+        self.oplog = oplog
+        self.store = store
+        self._applying = False
+        history.add_observer(self)
+
+    def close(self):
+        self.history.remove_observer(self)
+        self.oplog.close()
+
+    def _record_insert(self, entry):
+        if entry.kind == 'image':
+            return
+        oplog = self.oplog
+        if entry.is_blob:
+            # 不在界面线程里读出大条目，发送时再读
+            oplog.record_insert(entry.digest, None, entry.created, blob=True)
+        else:
+            oplog.record_insert(entry.digest, entry.text, entry.created)
+        if entry.pinned != oplog.pinned(entry.digest):
+            # 删除过的固定内容重新复制时没有固定，否则其它实例会按旧的固定状态恢复
+            oplog.record_pin(entry.digest, entry.pinned)
+
+    def history_inserted(self, row, count):
+        if self._applying or (self.store is not None and self.store.loading):
+            return
+        for offset in reversed(range(count)):
+            self._record_insert(self.history.entry_at(row + offset))
+
+    def history_moved(self, row, dest):
+        # 重新复制已有内容，其它实例上也移到最前
+        if not self._applying:
+            self._record_insert(self.history.entry_at(dest))
+
+    def history_about_to_remove(self, row):
+        if self._applying or self.history.evicting:
+            return
+        entry = self.history.entry_at(row)
+        if entry.kind != 'image':
+            self.oplog.record_remove(entry.digest)
+
+    def history_reset(self):
+        if not self._applying:
+            self.oplog.record_clear()
+
+    def history_changed(self, row):
+        if self._applying:
+            return
+        entry = self.history.entry_at(row)
+        if entry.kind != 'image' and entry.pinned != self.oplog.pinned(entry.digest):
+            self.oplog.record_pin(entry.digest, entry.pinned)
+
+    def apply(self, ops):
+        """合并其它实例的操作并更新历史记录，返回新合并的操作数"""
+        before = sum(self.oplog.clock.values())
+        effects = self.oplog.merge(ops)
+        history = self.history
+        self._applying = True
+        try:
+            with history.lock:
+                for effect in effects:
+                    kind = effect[0]
+                    if kind == 'add':
+                        op, pinned = effect[1], effect[2]
+                        if op.text is None:
+                            log.warning("Skipping operation %r without content", op)
+                            continue
+                        entry, added = history.add(op.text, op.created)
+                        if not added:
+                            history.move_to_front(entry.id)
+                        if pinned:
+                            history.set_pinned(entry.id, True)
+                        continue
+                    entry = history.get_by_digest(effect[1])
+                    if entry is None:
+                        continue
+                    if kind == 'front':
+                        history.move_to_front(entry.id)
+                    elif kind == 'remove':
+                        history.remove(entry.id)
+                    else:
+                        history.set_pinned(entry.id, effect[2])
+        finally:
+            self._applying = False
+        return sum(self.oplog.clock.values()) - before
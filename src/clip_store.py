@@ -0,0 +1,415 @@
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+from app_paths import default_data_dir
+from clip_classify import dump_tags, load_tags
+from clip_history import NO_SCORE, HistoryObserver
+from metrics import metrics
+
+log = logging.getLogger(__name__)
+
+# 大条目的正文保存在 BlobStore 中，这里 text 为空，只记录长度和预览；
+# formats 为 {格式名: BlobStore 哈希} 的 JSON，kind 为 'text' 或 'image'，
+# pinned 的条目不会被淘汰，score 为使用频率（从未使用过为 NULL），
+# tags 为逗号分隔的内容类型（还没识别过为 NULL），size 为计入容量限制的字节数。
+# imports 记录导入归档的进度（见 clip_archive）
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS clips (
+    digest  BLOB PRIMARY KEY,
+    seq     INTEGER NOT NULL,
+    created REAL NOT NULL,
+    text    TEXT NOT NULL,
+    blob    INTEGER NOT NULL DEFAULT 0,
+    length  INTEGER,
+    preview TEXT,
+    kind    TEXT NOT NULL DEFAULT 'text',
+    formats TEXT,
+    pinned  INTEGER NOT NULL DEFAULT 0,
+    score   REAL,
+    tags    TEXT,
+    size    INTEGER
+);
+CREATE INDEX IF NOT EXISTS clips_seq ON clips(seq);
+CREATE INDEX IF NOT EXISTS clips_created ON clips(created);
+CREATE INDEX IF NOT EXISTS clips_pinned ON clips(seq) WHERE pinned = 1;
+CREATE TABLE IF NOT EXISTS imports (
+    archive  TEXT PRIMARY KEY,
+    position INTEGER NOT NULL,
+    done     INTEGER NOT NULL DEFAULT 0
+);
+'''
+
+# 旧版本数据库缺少的列
+MIGRATIONS = [
+    ('blob', 'ALTER TABLE clips ADD COLUMN blob INTEGER NOT NULL DEFAULT 0'),
+    ('length', 'ALTER TABLE clips ADD COLUMN length INTEGER'),
+    ('preview', 'ALTER TABLE clips ADD COLUMN preview TEXT'),
+    ('kind', "ALTER TABLE clips ADD COLUMN kind TEXT NOT NULL DEFAULT 'text'"),
+    ('formats', 'ALTER TABLE clips ADD COLUMN formats TEXT'),
+    ('pinned', 'ALTER TABLE clips ADD COLUMN pinned INTEGER NOT NULL DEFAULT 0'),
+    ('score', 'ALTER TABLE clips ADD COLUMN score REAL'),
+    ('tags', 'ALTER TABLE clips ADD COLUMN tags TEXT'),
+    ('size', 'ALTER TABLE clips ADD COLUMN size INTEGER'),
+]
+
+# 补上旧版本数据库中条目的字节数（大条目和图片只能按长度估计）
+FILL_SIZE = ("UPDATE clips SET size = CASE WHEN blob = 0 AND kind = 'text' "
+             "THEN LENGTH(CAST(text AS BLOB)) ELSE COALESCE(length, 0) END WHERE size IS NULL")
+
+COLUMNS = 'seq, digest, created, text, blob, length, preview, kind, formats, pinned, score, tags'
+
+
+def _score(value):
+    return value if value is not None else NO_SCORE
+
+
+def _stored_score(score):
+    return score if score != NO_SCORE else None
+
+
+def dump_formats(formats):
+    # 还没写入 BlobStore 的格式（值为 None）等写完后再单独更新
+    stored = {fmt: digest.hex() for fmt, digest in formats.items() if digest is not None}
+    return json.dumps(stored) if stored else None
+
+
+def load_formats(value):
+    if not value:
+        return None
+    return {fmt: bytes.fromhex(digest) for fmt, digest in json.loads(value).items()}
+
+
+def create_schema(conn):
+    """建表，并给旧版本的数据库补上缺少的列"""
+    conn.executescript(SCHEMA)
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(clips)')}
+    missing = [statement for column, statement in MIGRATIONS if column not in columns]
+    if missing:
+        conn.executescript(';\n'.join(missing))
+    if 'size' not in columns:
+        with conn:
+            conn.execute(FILL_SIZE)
+    conn.execute('CREATE INDEX IF NOT EXISTS clips_score ON clips(score) WHERE score IS NOT NULL')
+
+
+def load_settings(data_dir):
+    """读取数据目录下的 settings.json，不存在或格式错误时返回空字典"""
+    path = os.path.join(data_dir, 'settings.json')
+    try:
+        with open(path, encoding='utf-8') as f:
+            settings = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        log.warning("Error reading settings: %s", e)
+        return {}
+    return settings if isinstance(settings, dict) else {}
+
+
+class HistoryStore(HistoryObserver):
+    """剪贴板历史的 SQLite 持久化（WAL 模式）
+
+    作为 ClipHistory 的观察者记录变化，写操作放进队列，由后台线程按批次
+    在一个事务里提交，剪贴板回调中不做磁盘 I/O。
+    启动时只载入第一页，其余条目在列表滚动到底部时按 seq 倒序分页载入，
+    启动耗时与历史总量无关。
+
+    历史记录的上限（history.limits）对整个数据库生效：内存中的条目由 ClipHistory
+    淘汰，每批新条目写入后，写线程再从还没载入的条目中按 seq 从旧到新删除未固定的，
+    直到总条数、总字节数不超过上限，并删除其中超过保留时间的。
+    """
+
+    PAGE_SIZE = 50
+    FLUSH_INTERVAL = 0.5  # 秒
+    MAX_BATCH = 500
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(default_data_dir(), 'history.db')
+        self.history = None
+        self._queue = queue.Queue()
+        # 正在从磁盘分页载入旧条目，这时的插入通知不是新的复制
+        self.loading = False
+        self._has_more = False
+
+        # 读连接只在界面线程使用，写连接属于后台线程
+        self._reader = sqlite3.connect(self.path)
+        self._reader.execute('PRAGMA journal_mode=WAL')
+        create_schema(self._reader)
+        row = self._reader.execute('SELECT MAX(seq) FROM clips').fetchone()
+        self._next_seq = (row[0] or 0) + 1
+        # 已载入的最旧条目的 seq，分页从它往前读
+        self._cursor = self._next_seq
+        # 不在分页顺序里、提前载入的条目（load_frecent）
+        self._early = set()
+        # 分页载入与写线程删除未载入的条目互斥，不会载入正要删除的行
+        self._load_lock = threading.Lock()
+        # 数据库的 (总条数, 总字节数)，只在写线程里使用，第一次需要时才统计
+        self._totals = None
+
+        self._writer = threading.Thread(target=self._write_loop, name='HistoryStoreWriter', daemon=True)
+        self._writer.start()
+
+    def attach(self, history):
+        """绑定历史记录，载入第一页和所有固定的条目，按 history.limits 清理还没载入的条目"""
+        self.history = history
+        history.add_observer(self)
+        self.load_older(self.PAGE_SIZE)
+        self.load_pinned()
+        self._queue.put(('trim',))
+
+    def has_more(self):
+        return self._has_more
+
+    def load_older(self, limit=None):
+        """从磁盘再载入一页更旧的条目，返回载入数量"""
+        limit = limit or self.PAGE_SIZE
+        with self._load_lock:
+            rows = self._reader.execute(
+                f'SELECT {COLUMNS} FROM clips WHERE seq < ? ORDER BY seq DESC LIMIT ?',
+                (self._cursor, limit + 1)).fetchall()
+            self._has_more = len(rows) > limit
+            rows = rows[:limit]
+            if rows:
+                self._cursor = rows[-1][0]
+        self._append_rows(rows)
+        return len(rows)
+
+    def load_pinned(self):
+        """载入第一页之外固定的条目
+
+        固定的条目不会被淘汰，也不会从数据库中清理；都放在内存里才能计入上限，
+        历史记录已满、不再分页载入时也能看到。
+        """
+        with self._load_lock:
+            rows = self._reader.execute(
+                f'SELECT {COLUMNS} FROM clips WHERE pinned = 1 AND seq < ? ORDER BY seq DESC',
+                (self._cursor,)).fetchall()
+            self._early.update(row[1] for row in rows)
+        self._append_rows(rows)
+
+    def load_frecent(self, limit):
+        """载入使用频率最高的 limit 条（已载入的跳过），供快捷键编号使用
+
+        它们不在分页顺序里，暂时排在已载入部分的末尾；之后分页载入到时按哈希跳过。
+        """
+        with self._load_lock:
+            rows = self._reader.execute(
+                f'SELECT {COLUMNS} FROM clips WHERE score IS NOT NULL ORDER BY score DESC LIMIT ?',
+                (limit,)).fetchall()
+            self._early.update(row[1] for row in rows)
+        self._append_rows(rows)
+
+    def _append_rows(self, rows):
+        self.loading = True
+        try:
+            for seq, digest, created, text, blob, length, preview, kind, formats, pinned, score, tags in rows:
+                formats = load_formats(formats)
+                pinned = bool(pinned)
+                score = _score(score)
+                tags = load_tags(tags)
+                if kind == 'image':
+                    self.history.append_older_image(digest, preview, formats, created, pinned, score, tags)
+                elif blob:
+                    self.history.append_older_blob(digest, length, preview, created, formats, pinned, score, tags)
+                else:
+                    self.history.append_older(text, created, formats, pinned, score, tags)
+        finally:
+            self.loading = False
+
+    def flush(self):
+        """等待队列中的写操作全部落盘"""
+        done = threading.Event()
+        self._queue.put(('sync', done))
+        done.wait()
+
+    def close(self):
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+        self._reader.close()
+
+    def _take_seq(self):
+        seq = self._next_seq
+        self._next_seq += 1
+        return seq
+
+    def history_inserted(self, row, count):
+        if self.loading:
+            return
+        # 从最旧的一行开始，保证 seq 与时间顺序一致
+        for offset in reversed(range(count)):
+            self._put(self.history.entry_at(row + offset))
+
+    def _put(self, entry):
+        # 正文在写线程里读取，压缩的条目不会在界面线程解压
+        self._queue.put(('put', entry, self._take_seq()))
+
+    def history_changed(self, row):
+        entry = self.history.entry_at(row)
+        self._queue.put(('update', entry.digest, dump_formats(entry.formats), int(entry.pinned),
+                         dump_tags(entry.tags)))
+
+    def history_used(self, row):
+        entry = self.history.entry_at(row)
+        self._queue.put(('score', entry.digest, _stored_score(entry.score)))
+
+    def history_about_to_remove(self, row):
+        entry = self.history.entry_at(row)
+        self._queue.put(('delete', entry.digest))
+
+    def history_moved(self, row, dest):
+        entry = self.history.entry_at(dest)
+        self._queue.put(('touch', entry.digest, self._take_seq()))
+
+    def history_reset(self):
+        self._has_more = False
+        self._cursor = self._next_seq
+        self._queue.put(('clear',))
+
+    def _write_loop(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        running = True
+        while running:
+            op = self._queue.get()
+            batch = [op]
+            # 攒一小段时间的操作，合并到一个事务里
+            deadline = time.monotonic() + self.FLUSH_INTERVAL
+            try:
+                while len(batch) < self.MAX_BATCH and batch[-1] is not None and batch[-1][0] != 'sync':
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                pass
+            waiters = []
+            trim = False
+            try:
+                with conn:
+                    for op in batch:
+                        if op is None:
+                            running = False
+                        elif op[0] == 'sync':
+                            waiters.append(op[1])
+                        elif op[0] == 'trim':
+                            trim = True
+                        else:
+                            trim = trim or op[0] == 'put'
+                            # 一个操作出错只丢掉这一个，写线程和同一事务里的其它操作照常
+                            try:
+                                self._apply(conn, op)
+                            except Exception:
+                                log.exception("Error writing history change %s", op[0])
+                if trim:
+                    self._trim(conn)
+            except sqlite3.Error as e:
+                log.error("History store error: %s", e)
+                # 事务可能已回滚，下次清理时重新统计
+                self._totals = None
+            except Exception:
+                log.exception("Error committing history changes")
+            finally:
+                # 无论写入是否成功都要唤醒 flush()，否则调用方会一直等待
+                for event in waiters:
+                    event.set()
+        conn.close()
+
+    def _apply(self, conn, op):
+        kind = op[0]
+        if kind == 'put':
+            entry, seq = op[1], op[2]
+            formats = dump_formats(entry.formats)
+            if entry.is_blob or entry.kind == 'image':
+                row = (seq, entry.digest, entry.created, '', int(entry.is_blob),
+                       entry.length, entry.preview, entry.kind, formats)
+            else:
+                row = (seq, entry.digest, entry.created, entry.text, 0, None, None, entry.kind, formats)
+            cursor = conn.execute(
+                f'INSERT INTO clips({COLUMNS}, size) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT(digest) DO NOTHING',
+                row + (int(entry.pinned), _stored_score(entry.score), dump_tags(entry.tags), entry.size))
+            if not cursor.rowcount:
+                conn.execute('UPDATE clips SET seq = ? WHERE digest = ?', (seq, entry.digest))
+            elif self._totals is not None:
+                count, total = self._totals
+                self._totals = (count + 1, total + entry.size)
+        elif kind == 'update':
+            conn.execute('UPDATE clips SET formats = ?, pinned = ?, tags = ? WHERE digest = ?',
+                         (op[2], op[3], op[4], op[1]))
+        elif kind == 'score':
+            conn.execute('UPDATE clips SET score = ? WHERE digest = ?', (op[2], op[1]))
+        elif kind == 'touch':
+            conn.execute('UPDATE clips SET seq = ? WHERE digest = ?', (op[2], op[1]))
+        elif kind == 'delete':
+            if self._totals is not None:
+                row = conn.execute('SELECT size FROM clips WHERE digest = ?', (op[1],)).fetchone()
+                if row is not None:
+                    count, total = self._totals
+                    self._totals = (count - 1, total - (row[0] or 0))
+            conn.execute('DELETE FROM clips WHERE digest = ?', (op[1],))
+        elif kind == 'clear':
+            conn.execute('DELETE FROM clips')
+            if self._totals is not None:
+                self._totals = (0, 0)
+
+    def _trim(self, conn):
+        """按上限删除还没载入的条目，返回删除的数量
+
+        已载入的条目都在数据库里，数据库的总量不超过上限时内存中的也不会超过。
+        """
+        limits = self.history.limits if self.history is not None else None
+        if limits is None or not limits.bounded:
+            return 0
+        if self._totals is None:
+            row = conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM clips').fetchone()
+            self._totals = (row[0], row[1])
+        count, total = self._totals
+        doomed = {}
+        with self._load_lock:
+            cursor, early = self._cursor, self._early
+            if limits.max_age is not None:
+                rows = conn.execute(
+                    'SELECT digest, size, blob, formats FROM clips '
+                    'WHERE created < ? AND seq < ? AND pinned = 0',
+                    (time.time() - limits.max_age, cursor))
+                for digest, size, blob, formats in rows:
+                    if digest not in early:
+                        doomed[digest] = (size or 0, blob, formats)
+                        count -= 1
+                        total -= size or 0
+            if limits.over(count, total):
+                rows = conn.execute(
+                    'SELECT digest, size, blob, formats FROM clips WHERE seq < ? AND pinned = 0 ORDER BY seq',
+                    (cursor,))
+                for digest, size, blob, formats in rows:
+                    if digest in early or digest in doomed:
+                        continue
+                    doomed[digest] = (size or 0, blob, formats)
+                    count -= 1
+                    total -= size or 0
+                    if not limits.over(count, total):
+                        break
+            if not doomed:
+                return 0
+            # 在锁内提交，界面线程之后读到的页里不会有这些行
+            with conn:
+                conn.executemany('DELETE FROM clips WHERE digest = ?', ((digest,) for digest in doomed))
+        self._totals = (count, total)
+        blob_store = self.history.blob_store
+        if blob_store is not None:
+            for digest, (size, blob, formats) in doomed.items():
+                if blob:
+                    blob_store.delete(digest)
+                for format_digest in (load_formats(formats) or {}).values():
+                    blob_store.delete(format_digest)
+        log.info("Trimmed %d stored history entries beyond the limits", len(doomed))
+        metrics.counter('evictions').inc(len(doomed))
+        return len(doomed)
@@ -0,0 +1,137 @@
+"""历史记录同步的两种传输方式（不依赖 Qt）
+
+DirectorySync：多台机器共用一个目录（网络共享、同步盘），每个实例只追加写
+自己的 <replica>.jsonl，读其它实例的文件中新增的部分，不需要加锁。
+每个实例还把自己的向量时钟写在 <replica>.clock 里，供其它实例判断哪些操作
+已经不再需要保留（见 OpLog.compact）。
+
+sync_instances：通过本地 IPC 让两个正在运行的实例互相补齐缺少的操作，
+由命令行 `cliplist sync` 调用。
+"""
+import json
+import logging
+import os
+
+from clip_oplog import decode_ops, encode_op
+from ipc_client import IpcError, request
+
+log = logging.getLogger(__name__)
+
+
+class DirectorySync:
+    """通过共享目录与其它实例同步
+
+    sync() 先导出本机新产生的操作，再读入其它实例文件中新增的行并应用到历史记录。
+    读到的位置只保存在内存里，重启后从头读，已有的操作由向量时钟跳过。
+    """
+
+    def __init__(self, replicator, directory):
+        self.replicator = replicator
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.oplog = replicator.oplog
+        self.path = os.path.join(directory, self.oplog.replica + '.jsonl')
+        self.clock_path = os.path.join(directory, self.oplog.replica + '.clock')
+        self._exported = self._exported_seq()
+        self._offsets = {}
+
+    def _exported_seq(self):
+        """共享目录中本机文件已有的最后一条操作的 seq"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return 0
+        end = data.rfind(b'\n')
+        if end + 1 != len(data):
+            # 截掉上次写到一半的行
+            with open(self.path, 'r+b') as f:
+                f.truncate(end + 1)
+        ops = decode_ops(data[data.rfind(b'\n', 0, end) + 1:end + 1]) if end >= 0 else []
+        return ops[-1].seq if ops else 0
+
+    def sync(self):
+        """导出并导入一次，返回新合并的操作数"""
+        self.push()
+        merged = self.pull()
+        self.exchange_clocks()
+        return merged
+
+    def push(self):
+        ops = self.oplog.ops_from(self.oplog.replica, self._exported)
+        if not ops:
+            return 0
+        with open(self.path, 'ab') as f:
+            f.write(b''.join(encode_op(op) for op in ops))
+        self._exported = ops[-1].seq
+        return len(ops)
+
+    def pull(self):
+        ops = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.jsonl') or path == self.path:
+                continue
+            offset = self._offsets.get(name, 0)
+            try:
+                with open(path, 'rb') as f:
+                    f.seek(offset)
+                    data = f.read()
+            except OSError as e:
+                log.warning("Error reading %s: %s", path, e)
+                continue
+            # 对方可能正写到一半，只处理完整的行
+            end = data.rfind(b'\n') + 1
+            if end:
+                ops.extend(decode_ops(data[:end]))
+                self._offsets[name] = offset + end
+        return self.replicator.apply(ops) if ops else 0
+
+    def exchange_clocks(self):
+        """写出本机的向量时钟，读入其它实例的"""
+        clock = dict(self.oplog.clock)
+        try:
+            with open(self.clock_path, 'w', encoding='utf-8') as f:
+                json.dump(clock, f)
+        except OSError as e:
+            log.warning("Error writing %s: %s", self.clock_path, e)
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not name.endswith('.clock') or path == self.clock_path:
+                continue
+            try:
+                with open(path, encoding='utf-8') as f:
+                    peer = json.load(f)
+            except (OSError, ValueError) as e:
+                # 对方可能正在写
+                log.debug("Error reading %s: %s", path, e)
+                continue
+            if isinstance(peer, dict):
+                self.oplog.note_peer(name[:-len('.clock')], {str(k): int(v) for k, v in peer.items()})
+
+
+def _call(data_dir, command):
+    result = request(data_dir, [command], timeout=30.0)[0]
+    if not result.get('ok'):
+        raise IpcError(result.get('error', 'sync failed'))
+    return result
+
+
+def sync_instances(data_dir, peer_dir, batch=1000):
+    """让两个运行中的实例互相补齐操作，返回 (发给 peer 的数量, 从 peer 收到的数量)"""
+    counts = []
+    for source, target in ((data_dir, peer_dir), (peer_dir, data_dir)):
+        reply = _call(target, {'op': 'sync_clock'})
+        clock = reply['clock']
+        sent = 0
+        while True:
+            ops = _call(source, {'op': 'sync_pull', 'clock': clock, 'limit': batch,
+                                 'replica': reply['replica']})['ops']
+            if not ops:
+                break
+            _call(target, {'op': 'sync_push', 'ops': ops})
+            for op in ops:
+                clock[op['origin']] = max(clock.get(op['origin'], 0), op['seq'])
+            sent += len(ops)
+        counts.append(sent)
+    return tuple(counts)
@@ -0,0 +1,327 @@
+"""历史记录正文的分层存放（不依赖 Qt）
+
+最近、最常用的条目（包括 alt+1..9 能直接粘贴的）正文留在内存里，其余条目的正文
+在内存超出预算时写入磁盘上只追加的段文件，条目只保留预览。读正文时通过 mmap
+从段文件读回，对列表、搜索、粘贴和拖拽都是透明的；粘贴、拖拽或重新复制的条目
+重新读回内存。
+
+段文件只是本次运行的缓存（持久保存的是 history.db），启动时清空。
+"""
+import glob
+import logging
+import mmap
+import os
+import threading
+from collections import OrderedDict
+
+from clip_history import HistoryObserver
+from metrics import metrics
+
+log = logging.getLogger(__name__)
+
+# 总是留在内存里的最新条目数和排列顺序最前面的条目数（alt+1..9）
+HOT_ROWS = 9
+# 段文件里已释放的空间超过这么多、并且多于仍在使用的空间时，换一个新的段文件
+ROTATE_BYTES = 64 * 1024 * 1024
+
+
+class SpilledBody:
+    """写入段文件的正文：str 以 UTF-8 保存，压缩的 bytes 原样保存"""
+
+    __slots__ = ('segment', 'offset', 'length', 'compressed')
+
+    def __init__(self, segment, offset, length, compressed):
+        self.segment = segment
+        self.offset = offset
+        self.length = length
+        self.compressed = compressed
+
+    def load(self, limit=None):
+        """读回原来的 str 或压缩的 bytes；limit 只读开头这么多字节（对压缩的正文无效）"""
+        metrics.counter('spill_reads').inc()
+        if self.compressed:
+            return self.segment.read(self.offset, self.length)
+        if limit is not None and limit < self.length:
+            return self.segment.read(self.offset, limit).decode('utf-8', 'ignore')
+        return self.segment.read(self.offset, self.length).decode('utf-8')
+
+
+class SpillSegment:
+    """只追加的段文件，读取时用 mmap 映射
+
+    写入只发生在持有 history.lock 的界面线程里；任何线程都可以读取。
+    文件变长后读取新的部分时重新映射，旧的映射留给还在读的线程，用完自行释放。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'w+b')
+        self._lock = threading.Lock()
+        self._map = None
+        # 文件长度和其中仍被条目引用的字节数
+        self.size = 0
+        self.live = 0
+
+    @property
+    def dead(self):
+        return self.size - self.live
+
+    def put(self, body):
+        compressed = type(body) is bytes
+        data = body if compressed else body.encode('utf-8')
+        with self._lock:
+            offset = self.size
+            self._file.write(data)
+            self.size += len(data)
+            self.live += len(data)
+        return SpilledBody(self, offset, len(data), compressed)
+
+    def read(self, offset, length):
+        end = offset + length
+        view = self._map
+        if view is None or end > len(view):
+            with self._lock:
+                view = self._map
+                if view is None or end > len(view):
+                    self._file.flush()
+                    view = self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return view[offset:end]
+
+    def release(self, spilled):
+        self.live -= spilled.length
+
+    def close(self):
+        """关闭并删除文件；映射不主动关闭，可能还有线程在读"""
+        with self._lock:
+            self._map = None
+            self._file.close()
+        try:
+            os.remove(self.path)
+        except OSError as e:
+            # Windows 上仍被映射的文件无法删除，下次启动时清理
+            log.debug("Error removing spill segment: %s", e)
+
+
+class MemoryGovernor(HistoryObserver):
+    """让内存中的正文不超过预算
+
+    内存中的文本条目按最近使用排列（新复制、移到最前、粘贴都算使用），
+    超出预算时从最久没用的开始把正文移到段文件；最新的 HOT_ROWS 条和 order
+    （ClipHistory 或 FrecencyView）最前面的 HOT_ROWS 条不会被移出。删除、移动
+    让已移到磁盘的条目进入这些行时立即读回内存。
+    粘贴、拖拽或重新复制的条目（history_used）读回内存。
+    大条目本来就在 BlobStore 里，图片没有正文，都不参与。
+
+    所有回调都在持有 history.lock 时执行。
+    """
+
+    def __init__(self, history, directory, budget, order=None):
+        self.history = history
+        self.order = order if order is not None else history
+        self.directory = directory
+        self.budget = budget
+        # 内存中的条目 id -> (条目, 字节数)，最久没用的在前
+        self._resident = OrderedDict()
+        self.resident_bytes = 0
+        # 已移到磁盘的条目 id -> SpilledBody
+        self._spilled = {}
+        # 在 about_to_remove 里记下、在 removed 里释放的条目
+        self._removing = None
+        self._retired = []
+        os.makedirs(directory, exist_ok=True)
+        for path in glob.glob(os.path.join(directory, 'segment-*.seg')):
+            try:
+                os.remove(path)
+            except OSError as e:
+                log.warning("Error removing stale spill segment: %s", e)
+        self._serial = 0
+        self.segment = self._new_segment()
+        metrics.gauge('memory_budget_bytes').set(budget)
+        # order 不是 history 时还要观察它的行变化
+        self._watcher = _OrderWatcher(self) if self.order is not history else None
+        with history.lock:
+            # 从新到旧遍历，最旧的排在最前
+            for entry in history:
+                self._add(entry, older=True)
+            history.add_observer(self)
+            if self._watcher is not None:
+                self.order.add_observer(self._watcher)
+            self._enforce()
+
+    def _new_segment(self):
+        self._serial += 1
+        return SpillSegment(os.path.join(self.directory, f'segment-{self._serial}.seg'))
+
+    def _add(self, entry, older=False):
+        if entry.kind != 'text' or entry.is_blob or entry.is_spilled:
+            return
+        size = entry.resident_size
+        self._resident[entry.id] = (entry, size)
+        self.resident_bytes += size
+        if older:
+            self._resident.move_to_end(entry.id, last=False)
+
+    def _discard(self, entry):
+        item = self._resident.pop(entry.id, None)
+        if item is not None:
+            self.resident_bytes -= item[1]
+        spilled = self._spilled.pop(entry.id, None)
+        if spilled is not None:
+            self._release(spilled)
+
+    def _release(self, spilled):
+        segment = spilled.segment
+        segment.release(spilled)
+        if segment is self.segment:
+            if segment.dead > ROTATE_BYTES and segment.dead > segment.live:
+                self._retired.append(segment)
+                self.segment = self._new_segment()
+                log.debug("Started spill segment %s", self.segment.path)
+        elif segment.live == 0 and segment in self._retired:
+            self._retired.remove(segment)
+            segment.close()
+
+    def _protected(self):
+        ids = set()
+        for row in range(HOT_ROWS):
+            for source in (self.history, self.order):
+                entry = source.entry_at(row)
+                if entry is not None:
+                    ids.add(entry.id)
+        return ids
+
+    def _page_in_hot(self):
+        """把进入受保护行的、已移到磁盘的条目读回内存"""
+        if not self._spilled:
+            return
+        for entry_id in self._protected():
+            if entry_id in self._spilled:
+                self.page_in(self.history.get(entry_id))
+
+    def _enforce(self):
+        if self.resident_bytes > self.budget:
+            protected = self._protected()
+            spilled = 0
+            # 每个受保护的条目至多跳过一次
+            skips = len(protected)
+            while self.resident_bytes > self.budget and self._resident:
+                entry_id, (entry, size) = next(iter(self._resident.items()))
+                if entry_id in protected:
+                    if not skips:
+                        break
+                    skips -= 1
+                    self._resident.move_to_end(entry_id)
+                    continue
+                del self._resident[entry_id]
+                self.resident_bytes -= size
+                try:
+                    self._spilled[entry_id] = entry.spill(self.segment)
+                except OSError as e:
+                    log.error("Error spilling history entry: %s", e)
+                    self._resident[entry_id] = (entry, size)
+                    self.resident_bytes += size
+                    break
+                spilled += 1
+            if spilled:
+                metrics.counter('spilled').inc(spilled)
+        self._update_gauges()
+
+    def _update_gauges(self):
+        metrics.gauge('resident_bytes').set(self.resident_bytes)
+        metrics.gauge('spilled_entries').set(len(self._spilled))
+        metrics.gauge('spill_file_bytes').set(self.spill_bytes)
+
+    def _touch(self, entry):
+        if entry.id in self._resident:
+            self._resident.move_to_end(entry.id)
+
+    def page_in(self, entry):
+        """把移到磁盘的正文读回内存"""
+        spilled = self._spilled.pop(entry.id, None)
+        if spilled is None:
+            self._touch(entry)
+            return
+        try:
+            entry.page_in()
+        except (OSError, ValueError) as e:
+            log.error("Error paging in history entry: %s", e)
+            self._spilled[entry.id] = spilled
+            return
+        metrics.counter('paged_in').inc()
+        self._release(spilled)
+        self._add(entry)
+        self._enforce()
+
+    @property
+    def spilled_count(self):
+        return len(self._spilled)
+
+    @property
+    def spill_bytes(self):
+        return self.segment.size + sum(segment.size for segment in self._retired)
+
+    # HistoryObserver
+
+    def history_inserted(self, row, count):
+        entries = [self.history.entry_at(row + offset) for offset in range(count)]
+        if row == 0:
+            # 新复制的内容，从旧到新加到最近使用的一端
+            for entry in reversed(entries):
+                self._add(entry)
+        else:
+            # 从磁盘分页载入的旧条目
+            for entry in entries:
+                self._add(entry, older=True)
+        self._enforce()
+
+    def history_about_to_remove(self, row):
+        self._removing = self.history.entry_at(row)
+
+    def history_removed(self, row):
+        # 等所有观察者都处理完 about_to_remove（可能还要读正文）再释放
+        entry, self._removing = self._removing, None
+        if entry is not None:
+            self._discard(entry)
+            self._update_gauges()
+        # 后面的条目上移，可能进入最新的 HOT_ROWS 条
+        self._page_in_hot()
+
+    def history_moved(self, row, dest):
+        self._touch(self.history.entry_at(dest))
+        self._page_in_hot()
+
+    def history_used(self, row):
+        self.page_in(self.history.entry_at(row))
+
+    def history_reset(self):
+        self._resident.clear()
+        self._spilled.clear()
+        self.resident_bytes = 0
+        for segment in self._retired + [self.segment]:
+            segment.close()
+        self._retired = []
+        self.segment = self._new_segment()
+        self._update_gauges()
+
+    def close(self):
+        """退出时删除段文件，之后移到磁盘的条目无法再读出正文"""
+        with self.history.lock:
+            self.history.remove_observer(self)
+            if self._watcher is not None:
+                self.order.remove_observer(self._watcher)
+            for segment in self._retired + [self.segment]:
+                segment.close()
+            self._retired = []
+
+
+class _OrderWatcher(HistoryObserver):
+    """order 的常用区变化（以行移动、删除通知）后检查它最前面的 HOT_ROWS 条"""
+
+    def __init__(self, governor):
+        self.governor = governor
+
+    def history_removed(self, row):
+        self.governor._page_in_hot()
+
+    def history_moved(self, row, dest):
+        self.governor._page_in_hot()
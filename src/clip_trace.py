@@ -0,0 +1,114 @@
+"""剪贴板事件的记录与读取（不依赖 Qt）
+
+记录是 JSON Lines：第一行是头部，之后每行一个事件，t 为相对开始的毫秒数。
+内容本身不写入文件，只记录长度、格式名和加盐哈希；盐只在记录期间保存在内存里，
+同一次记录中相同的内容哈希相同（重放时可以还原去重、重新复制），但无法由哈希反查内容。
+
+    {"format": "cliplist-trace", "version": 1, "started": 1700000000.0, "items": 120, "history": {...}}
+    {"t": 0, "e": "copy", "h": "3f2a9c1b7d0e", "n": 42, "f": ["text/html"]}
+    {"t": 1520, "e": "image", "px": [800, 600]}
+    {"t": 3010, "e": "hotkey", "n": 1}
+    {"t": 3400, "e": "paste", "h": "3f2a9c1b7d0e"}    # 点击粘贴；拖拽为 "drag"
+    {"t": 5000, "e": "remove", "h": "3f2a9c1b7d0e"}
+
+benchmarks/replay_trace.py 读取记录并驱动一个 ClipboardManager 重放。
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+
+from clip_history import content_digest
+
+FORMAT = 'cliplist-trace'
+VERSION = 1
+
+
+class TraceError(Exception):
+    pass
+
+
+class TraceRecorder:
+    """把事件逐行追加到记录文件，可以从任意线程调用"""
+
+    def __init__(self, path, items=0, history_settings=None):
+        self.path = path
+        self._key = os.urandom(16)
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.count = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'w', encoding='utf-8')
+        self._write({'format': FORMAT, 'version': VERSION, 'started': time.time(),
+                     'items': items, 'history': history_settings or {}})
+        self.count = 0
+
+    def _hash(self, digest):
+        return hashlib.blake2b(digest, key=self._key, digest_size=6).hexdigest()
+
+    def _write(self, record):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+            self.count += 1
+            # 事件频率是人手操作的量级，逐条落盘，崩溃时也保留已有的记录
+            self._file.flush()
+
+    def _event(self, name, **fields):
+        self._write({'t': round((time.monotonic() - self._started) * 1000), 'e': name, **fields})
+
+    def copy(self, text, formats=()):
+        """一次复制，text 为记录进历史的文本（已去掉首尾空白）"""
+        self._event('copy', h=self._hash(content_digest(text)), n=len(text), f=sorted(formats))
+
+    def image(self, width, height):
+        self._event('image', px=[width, height])
+
+    def hotkey(self, number):
+        self._event('hotkey', n=number)
+
+    def use(self, how, entry):
+        """点击粘贴（paste）或拖拽（drag）了条目"""
+        self._event(how, h=self._hash(entry.digest))
+
+    def remove(self, entry):
+        self._event('remove', h=self._hash(entry.digest))
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def read_trace(path):
+    """返回 (头部, 事件生成器)"""
+    f = open(path, encoding='utf-8')
+    try:
+        header = json.loads(f.readline())
+    except ValueError as e:
+        f.close()
+        raise TraceError(f'not a ClipList trace: {e}') from None
+    if not isinstance(header, dict) or header.get('format') != FORMAT:
+        f.close()
+        raise TraceError('not a ClipList trace')
+
+    def events():
+        with f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # 记录时崩溃留下的半行
+                    return
+
+    return header, events()
+
+
+def synthetic_text(content_hash, length):
+    """由哈希和长度生成重放用的文本：哈希相同则文本相同，长度与原内容一致"""
+    unit = content_hash + ' '
+    text = (unit * (length // len(unit) + 1))[:length].rstrip()
+    return text if len(text) >= len(content_hash) else content_hash
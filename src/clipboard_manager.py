@@ -1,25 +1,85 @@
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, 
-                           QListWidget, QListWidgetItem, QLabel, 
+                           QListView, QAbstractItemView, QLabel, 
                            QPushButton, QApplication,
-                           QSystemTrayIcon, QMenu, QAction, QCheckBox)
-from PyQt5.QtCore import Qt, QPoint, QMimeData, QTimer, QSize, QMetaObject, Q_ARG, pyqtSlot
+                           QSystemTrayIcon, QMenu, QAction, QCheckBox,
+                           QLineEdit, QStyle)
+from PyQt5.QtCore import Qt, QPoint, QMimeData, QTimer, QSize, QMetaObject, Q_ARG, pyqtSignal, pyqtSlot
 from PyQt5.QtGui import (QFont, QIcon, QDrag, QPainter, QPixmap,
                         QColor)
-import win32gui
-import win32api
-import win32con
+import logging
 import time
-from win32gui import GetForegroundWindow, GetWindowText
-import win32clipboard
-from ctypes import windll
-import keyboard
 import os
 import sys
 from functools import partial
+from clip_history import ClipHistory, content_digest
+from clip_frecency import FrecencyView
+from clip_classify import looks_secret
+from classify_worker import ClassifyPipeline
+from clip_model import ClipListModel, SearchResultModel, EntryIdRole
+from clip_delegate import ClipItemDelegate
+from clip_store import HistoryStore, default_data_dir, load_settings
+from clip_eviction import HistoryLimits, make_policy
+from blob_store import BlobStore
+from search_index import SearchIndex
+from search_worker import SearchController
+from clip_formats import ClipboardHolder, FormatPipeline, LazyMimeData, capture_clipboard
+from clip_coalescer import ClipboardCoalescer
+from paste_worker import KeyTracker, PasteJob, PasteWorker
+from hotkeys import HotkeyDispatcher, default_keymap
+from clip_backend import default_backend
+from startup import timeline
+from metrics import metrics
+from debug_panel import DebugPanel
+from ipc_protocol import CommandHandler, server_name
+from ipc_server import IpcServer
+from clip_oplog import OpLog, Replicator
+from clip_sync import DirectorySync
+from clip_trace import TraceRecorder
+from clip_tiers import MemoryGovernor
+from clip_neardup import NearDuplicateIndex
+
+log = logging.getLogger(__name__)
+
+# 历史记录的默认上限，可在数据目录的 settings.json 中用 "history" 覆盖
+HISTORY_DEFAULTS = {
+    'max_entries': 10000,
+    'max_bytes': 256 * 1024 * 1024,
+    'max_age_days': None,
+    'eviction': 'oldest',  # oldest / lru / largest
+    'order': 'recent',  # recent / frecency
+    'half_life_days': 7,  # frecency 排序中一次使用的权重减半所需的天数
+    'secrets': 'keep',  # 疑似密钥的内容：keep / skip（不记录）/ expire（secret_ttl_s 秒后删除）
+    'secret_ttl_s': 60,
+    'near_duplicates': 'keep',  # 只差几个词的内容：keep（各自保留）/ collapse（新的取代旧的）
+    'memory_budget_mb': 64,  # 内存中正文的预算，超出时较旧的正文移到磁盘；null 表示不限制
+    'coalesce_window_ms': 80,  # 剪贴板安静这么久才读取，期间的连续变化合并成一次
+    'coalesce_max_wait_ms': 500,  # 持续变化时至少每隔这么久读取一次
+    'keep_intermediate': False,  # 合并窗口内的中间状态也各自记录
+}
+
+# 通过共享目录同步的默认间隔（秒），可在 settings.json 的 "sync" 中用 interval_s 覆盖
+SYNC_INTERVAL_S = 10
+
 
 class ClipboardManager(QWidget):
-    def __init__(self):
+    # 托盘和全局快捷键在第一帧之后初始化，完成时发出
+    startup_finished = pyqtSignal()
+    # 快捷键线程请求显示或隐藏窗口
+    toggle_requested = pyqtSignal()
+    # 窗口一直没有显示时，最迟在这之后完成初始化
+    DEFERRED_INIT_FALLBACK_MS = 1000
+
+    def __init__(self, backend=None, data_dir=None):
         super().__init__()
+        # 系统剪贴板、全局快捷键和模拟粘贴都通过 backend 访问；
+        # 未指定时在第一帧之后才创建，免得启动时导入 keyboard / pywin32
+        self.backend = backend
+        self.startup_complete = False
+        self.debug_panel = None
+        self.replicator = None
+        self._painted = False
+        self.data_dir = data_dir or default_data_dir()
+        self.settings = load_settings(self.data_dir)
         # 添加图标路径
         self.icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'icons')
         if hasattr(sys, '_MEIPASS'):  # 如果是打包后的exe
@@ -37,20 +97,78 @@ class ClipboardManager(QWidget):
         self.setAttribute(Qt.WA_ShowWithoutActivating)  # 显示时不激活
         
         self.always_on_top = True
-        self.clip_history = []
+        # 快捷键粘贴后是否恢复原来的剪贴板内容
+        self.restore_clipboard = False
+        # 超大的剪贴板内容存入磁盘上的 BlobStore，内存里只保留预览
+        self.clip_history = ClipHistory(BlobStore(os.path.join(self.data_dir, 'blobs')))
+        self.setup_limits()
+        self.history_store = self.setup_store()
+        # 列表和 alt+数字 的排列顺序：ClipHistory 本身（从新到旧）或按使用频率的视图
+        self.order = self.setup_order()
+        # 粘贴线程直接写入剪贴板的内容哈希，再次捕获到时不算作重新复制
+        self._own_writes = set()
+        # 搜索索引随历史记录的插入、删除增量更新
+        self.search_index = SearchIndex(self.clip_history)
+        # 可选：近似重复的新内容取代旧的那条
+        self.near_duplicates = self.setup_near_duplicates()
+        # 内容类型（网址、路径、代码、疑似密钥等）在后台识别
+        self.setup_secrets()
+        self.classifier = ClassifyPipeline(self.clip_history, self)
+        self.classifier.tagged.connect(self.on_entry_tagged)
+        self.classifier.start()
+        QApplication.instance().aboutToQuit.connect(self.classifier.shutdown)
+        self.list_model = ClipListModel(self.order, self.history_store, self)
+        # 富文本、图片在后台写盘，缩略图在后台生成
+        self.format_pipeline = FormatPipeline(self.clip_history, self)
+        self.list_model.set_thumbnails(self.format_pipeline.thumbnails)
+        QApplication.instance().aboutToQuit.connect(self.format_pipeline.shutdown)
+        # 搜索在后台线程执行，结果分批填入 search_model
+        self.search_model = SearchResultModel(self.order, self)
+        self.search_model.set_thumbnails(self.format_pipeline.thumbnails)
+        self.search_controller = SearchController(self.search_index, self.search_model, self)
+        self.search_controller.active_changed.connect(self.on_search_active_changed)
+        QApplication.instance().aboutToQuit.connect(self.search_controller.shutdown)
+        # 内存超出预算时，较旧的正文移到磁盘上的段文件，列表只保留预览
+        self.memory_governor = self.setup_tiers()
         self.list_widget = None  # 初始化为 None
         self.init_ui()
+        # 可选的事件记录，用于重放复现性能问题
+        self.tracer = self.setup_trace()
         self.setup_clipboard()
         
         # 用于窗口拖动
         self.dragging = False
         self.drag_position = None
-        
+
+        # 托盘和快捷键等到窗口画出来之后再初始化
+        QTimer.singleShot(self.DEFERRED_INIT_FALLBACK_MS, self.finish_startup)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self._painted:
+            self._painted = True
+            timeline.mark('first_paint')
+            QTimer.singleShot(0, self.finish_startup)
+
+    def finish_startup(self):
+        """第一帧之后初始化系统后端、托盘和全局快捷键"""
+        if self.startup_complete:
+            return
+        self.startup_complete = True
+        if self.backend is None:
+            self.backend = default_backend()
+        # 初始化时尝试访问一次剪贴板
+        self.backend.init_clipboard()
         # 添加系统托盘
         self.setup_tray()
-        
         # 添加快捷键监听
         self.setup_shortcuts()
+        # 多个实例之间的同步，重放操作日志放在第一帧之后
+        self.setup_sync()
+        # 命令行客户端和再次启动的实例通过本地套接字访问
+        self.setup_ipc()
+        timeline.mark('hotkeys_ready')
+        self.startup_finished.emit()
 
     def init_ui(self):
         self.setFixedSize(400, 600)
@@ -119,13 +237,26 @@ class ClipboardManager(QWidget):
         title_layout.addWidget(min_btn)
         title_layout.addWidget(close_btn)
         
+        # 搜索框
+        self.search_box = QLineEdit()
+        self.search_box.setObjectName('searchBox')
+        self.search_box.setPlaceholderText('搜索...')
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.textChanged.connect(self.search_controller.set_query)
+        self.search_box.mousePressEvent = self.search_mousePressEvent
+        
         # 列表区域
-        self.list_widget = QListWidget()
+        self.list_widget = QListView()
         self.list_widget.setObjectName('clipList')
-        self.list_widget.itemEntered.connect(self.on_item_hover)
+        self.list_widget.setModel(self.list_model)
+        # 行由委托绘制：固定行高、单行省略的预览
+        self.list_widget.setItemDelegate(ClipItemDelegate(self.list_widget))
+        self.list_widget.setUniformItemSizes(True)
+        self.list_widget.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.list_widget.entered.connect(self.on_item_hover)
         self.list_widget.setMouseTracking(True)
         self.list_widget.setDragEnabled(True)
-        self.list_widget.setDragDropMode(QListWidget.DragOnly)
+        self.list_widget.setDragDropMode(QAbstractItemView.DragOnly)
         
         # 自定义拖拽的开始
         self.list_widget.mousePressEvent = self.list_mousePressEvent
@@ -146,6 +277,7 @@ class ClipboardManager(QWidget):
         
         # 添加所有组件
         container_layout.addWidget(title_bar)
+        container_layout.addWidget(self.search_box)
         container_layout.addWidget(self.list_widget)
         container_layout.addWidget(bottom_bar)
         
@@ -197,23 +329,19 @@ class ClipboardManager(QWidget):
             #closeButton:hover {{
                 background-color: #e74c3c;
             }}
-            QListWidget {{
+            QListView {{
                 background-color: #2c3e50;
                 border: none;
                 color: #ecf0f1;
                 padding: 5px;
             }}
-            QListWidget::item {{
+            #searchBox {{
                 background-color: #34495e;
+                color: #ecf0f1;
+                border: none;
                 border-radius: 5px;
-                margin: 2px 5px;
-                padding: 8px;
-            }}
-            QListWidget::item:hover {{
-                background-color: #3498db;
-            }}
-            QListWidget::item:selected {{
-                background-color: #2980b9;
+                margin: 5px 10px 0px 10px;
+                padding: 5px 8px;
             }}
             #clearButton {{
                 background-color: #3498db;
@@ -259,38 +387,224 @@ class ClipboardManager(QWidget):
             }}
         ''')
 
+    def setup_limits(self):
+        """按设置限制历史记录的条目数、总字节数和保留时间"""
+        options = dict(HISTORY_DEFAULTS, **self.settings.get('history', {}))
+        try:
+            policy = make_policy(options['eviction'])
+        except ValueError as e:
+            log.warning("Error in settings: %s", e)
+            policy = make_policy(HISTORY_DEFAULTS['eviction'])
+        limits = HistoryLimits.from_dict(options)
+        self.clip_history.set_limits(limits, policy)
+        if options.get('half_life_days'):
+            self.clip_history.half_life = float(options['half_life_days']) * 86400
+        if limits.max_age is not None:
+            # 没有新复制时也要定期清理过期条目
+            self.expire_timer = QTimer(self)
+            self.expire_timer.timeout.connect(self.clip_history.expire)
+            self.expire_timer.start(60 * 1000)
+
+    def setup_store(self):
+        """打开持久化存储并载入第一页历史，失败时仅保存在内存中"""
+        try:
+            store = HistoryStore(os.path.join(self.data_dir, 'history.db'))
+            store.attach(self.clip_history)
+        except Exception as e:
+            log.error("Error opening history store: %s", e)
+            return None
+        QApplication.instance().aboutToQuit.connect(store.close)
+        return store
+
+    def setup_order(self):
+        """settings.json 中 history.order 为 "frecency" 时按使用频率排列，最常用的占 alt+1..9"""
+        order = self.settings.get('history', {}).get('order', HISTORY_DEFAULTS['order'])
+        if order != 'frecency':
+            if order != 'recent':
+                log.warning("Error in settings: unknown history order %r", order)
+            return self.clip_history
+        view = FrecencyView(self.clip_history)
+        if self.history_store is not None:
+            # 常用条目可能很旧，不在第一页里
+            self.history_store.load_frecent(view.slots)
+        return view
+
+    def setup_near_duplicates(self):
+        """settings.json 中 history.near_duplicates 为 "collapse" 时索引文本条目的 MinHash 签名"""
+        mode = dict(HISTORY_DEFAULTS, **self.settings.get('history', {}))['near_duplicates']
+        if mode != 'collapse':
+            if mode != 'keep':
+                log.warning("Error in settings: unknown near_duplicates mode %r", mode)
+            return None
+        return NearDuplicateIndex(self.clip_history)
+
+    def setup_tiers(self):
+        """settings.json 中 history.memory_budget_mb 限制内存中正文的大小"""
+        options = dict(HISTORY_DEFAULTS, **self.settings.get('history', {}))
+        budget = options['memory_budget_mb']
+        if budget is None:
+            return None
+        try:
+            governor = MemoryGovernor(self.clip_history, os.path.join(self.data_dir, 'spill'),
+                                      int(float(budget) * 1024 * 1024), self.order)
+        except (OSError, ValueError) as e:
+            log.error("Error setting up memory budget: %s", e)
+            return None
+        # 在后台线程都停止之后才删除段文件
+        QApplication.instance().aboutToQuit.connect(governor.close)
+        return governor
+
+    def setup_secrets(self):
+        options = dict(HISTORY_DEFAULTS, **self.settings.get('history', {}))
+        self.secrets = options['secrets']
+        self.secret_ttl = float(options['secret_ttl_s'])
+        if self.secrets not in ('keep', 'skip', 'expire'):
+            log.warning("Error in settings: unknown secrets mode %r", self.secrets)
+            self.secrets = 'keep'
+
+    def on_entry_tagged(self, entry_id, tags):
+        if 'secret' not in tags or self.secrets != 'expire':
+            return
+        entry = self.clip_history.get(entry_id)
+        if entry is None or entry.pinned:
+            return
+        delay = max(0.0, entry.created + self.secret_ttl - time.time())
+        QTimer.singleShot(int(delay * 1000), lambda: self.expire_secret(entry_id))
+
+    def expire_secret(self, entry_id):
+        """删除到期的疑似密钥（期间被固定的保留）"""
+        entry = self.clip_history.get(entry_id)
+        if entry is not None and not entry.pinned:
+            metrics.counter('secrets_expired').inc()
+            self.remove_item(entry_id)
+
+    def setup_trace(self):
+        """settings.json 中有 "trace" 时记录剪贴板、快捷键、粘贴和删除事件（内容只记哈希）"""
+        options = self.settings.get('trace')
+        if not isinstance(options, dict):
+            return None
+        path = options.get('path') or os.path.join(
+            self.data_dir, 'traces', time.strftime('trace-%Y%m%d-%H%M%S.jsonl'))
+        try:
+            tracer = TraceRecorder(path, len(self.clip_history), self.settings.get('history'))
+        except OSError as e:
+            log.error("Error opening trace file: %s", e)
+            return None
+        QApplication.instance().aboutToQuit.connect(tracer.close)
+        log.info("Recording events to %s", path)
+        return tracer
+
     def setup_clipboard(self):
         self.clipboard = QApplication.clipboard()
+        # 放到剪贴板上的内容在粘贴时才读出，条目删除前由它读出备用
+        self.clipboard_holder = ClipboardHolder(self.clip_history)
+        # 连续的剪贴板变化合并成一批处理
+        self.coalescer = ClipboardCoalescer(lambda: capture_clipboard(self.clipboard), parent=self,
+                                            **self.coalesce_options())
+        self.coalescer.flushed.connect(self.apply_captures)
         self.clipboard.dataChanged.connect(self.on_clipboard_change)
-        # 初始化时尝试访问一次剪贴板
+
+    def coalesce_options(self):
+        """settings.json 中 history.coalesce_window_ms / coalesce_max_wait_ms / keep_intermediate"""
+        options = dict(HISTORY_DEFAULTS, **self.settings.get('history', {}))
         try:
-            import win32clipboard
-            win32clipboard.OpenClipboard()
-            win32clipboard.CloseClipboard()
-        except:
-            pass
+            window_ms = int(options['coalesce_window_ms'])
+            max_wait_ms = int(options['coalesce_max_wait_ms'])
+            if window_ms < 0 or max_wait_ms < 0:
+                raise ValueError('coalesce times must not be negative')
+        except (TypeError, ValueError) as e:
+            log.warning("Error in settings: %s", e)
+            window_ms = HISTORY_DEFAULTS['coalesce_window_ms']
+            max_wait_ms = HISTORY_DEFAULTS['coalesce_max_wait_ms']
+        return {'window_ms': window_ms, 'max_wait_ms': max_wait_ms,
+                'keep_intermediate': bool(options['keep_intermediate'])}
 
     def on_clipboard_change(self):
-        text = self.clipboard.text().strip()
-        # 只有当文本不在历史记录中，且不是我们自己触发的复制操作时才添加
-        if text and text not in self.clip_history and not hasattr(self, '_internal_copy'):
-            self.clip_history.insert(0, text)  # 在开头插入新项目
-            self.update_list()  # 使用新的更新方法替代直接插入
+        # 不是我们自己触发的复制操作时，交给合并器稍后统一处理
+        if not hasattr(self, '_internal_copy'):
+            self.clipboard_holder.release()
+            self.coalescer.notify()
+
+    def apply_captures(self, captures):
+        """把合并后的一批剪贴板内容一次加入历史记录"""
+        started = time.perf_counter()
+        texts = [capture for capture in captures if capture.text.strip()]
+        if self.tracer is not None:
+            for capture in captures:
+                if capture.text.strip():
+                    self.tracer.copy(capture.text.strip(), capture.raw)
+                elif capture.image is not None:
+                    self.tracer.image(capture.image.width(), capture.image.height())
+        if self.secrets == 'skip':
+            # 不记录就必须在加入历史之前判断，这里只检查 secret 一类规则
+            kept = [capture for capture in texts if not looks_secret(capture.text)]
+            metrics.counter('secrets_skipped').inc(len(texts) - len(kept))
+            texts = kept
+        # 按哈希去重，新项目排在最前；模型只会收到一次插入通知
+        results = self.clip_history.add_many(
+            [(capture.text.strip(), dict.fromkeys(capture.raw)) for capture in texts])
+        dedup_hits = 0
+        for capture, (entry, added) in zip(texts, results):
+            if added:
+                # 只记录有哪些格式，富文本的写盘在后台完成
+                self.format_pipeline.submit(entry, capture)
+            else:
+                dedup_hits += 1
+                if entry.digest in self._own_writes:
+                    self._own_writes.discard(entry.digest)
+                else:
+                    # 重新复制已有的内容：移到最前并计入一次使用
+                    self.clip_history.bump(entry.id)
+        if self.near_duplicates is not None:
+            self.collapse_near_duplicates([entry for entry, added in results if added])
+        metrics.counter('captures').inc(len(captures))
+        metrics.counter('dedup_hits').inc(dedup_hits)
+        metrics.histogram('capture_apply').observe(time.perf_counter() - started)
+        log.debug("Captured %d clipboard changes, %d duplicates", len(captures), dedup_hits)
+        for capture in captures:
+            if not capture.text.strip() and capture.image is not None:
+                self.format_pipeline.submit_image(capture.image)
+
+    def collapse_near_duplicates(self, entries):
+        """新条目取代与它近似重复的旧条目，旧条目的使用频率并入新条目"""
+        history = self.clip_history
+        collapsed = 0
+        with history.lock:
+            # 同一批里也可能有近似重复，从最新的开始，只取代排在它后面的
+            for entry in sorted(entries, key=history.row_of_entry):
+                if history.get(entry.id) is not entry:
+                    continue
+                row = history.row_of_entry(entry)
+                for old in self.near_duplicates.find(entry):
+                    if history.row_of_entry(old) > row and history.absorb(old.id, entry.id):
+                        collapsed += 1
+        if collapsed:
+            metrics.counter('near_duplicates').inc(collapsed)
+            log.debug("Collapsed %d near-duplicate entries", collapsed)
+
+    def set_clipboard(self, entry):
+        """把条目放到剪贴板（内部复制，不会重新记录）"""
+        # 先处理还在合并窗口里的外部复制，免得被这次内部复制覆盖
+        self.coalescer.flush()
+        self._internal_copy = True
+        try:
+            mime = LazyMimeData(self.clip_history, entry)
+            self.clipboard.setMimeData(mime)
+            self.clipboard_holder.hold(mime)
+        finally:
+            delattr(self, '_internal_copy')
 
-    def on_item_hover(self, item):
+    def on_item_hover(self, index):
         # 当鼠标悬停时，只选中项目但不触发粘贴
-        self.list_widget.setCurrentItem(item)
+        self.list_widget.setCurrentIndex(index)
 
-    def on_item_paste(self, item):
+    def on_item_paste(self, index):
         try:
-            text = item.text()
-            row = self.list_widget.row(item)
-            self.handle_paste(text, row)
-        except Exception as e:
-            print(f"Error in on_item_paste: {str(e)}")
+            self.handle_paste(index.data(EntryIdRole))
+        except Exception:
+            log.exception("Error in on_item_paste")
 
     def clear_history(self):
-        self.list_widget.clear()
         self.clip_history.clear()
 
     def mousePressEvent(self, event):
@@ -310,7 +624,41 @@ class ClipboardManager(QWidget):
 
     def keyPressEvent(self, event):
         if event.key() == Qt.Key_Escape:
-            self.hide()
+            # 正在搜索时，Esc 先清空搜索框并恢复不获取焦点的状态
+            if self.search_box.hasFocus() or self.search_box.text():
+                self.search_box.clear()
+                self.set_keyboard_input(False)
+            else:
+                self.hide()
+
+    def search_mousePressEvent(self, event):
+        # 窗口默认不获取焦点，点击搜索框时临时允许键盘输入
+        self.set_keyboard_input(True)
+        self.search_box.setFocus()
+        QLineEdit.mousePressEvent(self.search_box, event)
+
+    def set_keyboard_input(self, enabled):
+        """切换窗口能否获取焦点（用于在搜索框里输入）"""
+        flags = self.windowFlags()
+        accepts_focus = not (flags & Qt.WindowDoesNotAcceptFocus)
+        if accepts_focus == enabled:
+            return
+        current_pos = self.pos()
+        if enabled:
+            flags &= ~Qt.WindowDoesNotAcceptFocus
+        else:
+            flags |= Qt.WindowDoesNotAcceptFocus
+        self.hide()
+        self.setWindowFlags(flags)
+        self.setAttribute(Qt.WA_ShowWithoutActivating, not enabled)
+        self.move(current_pos)
+        self.show()
+        if enabled:
+            self.activateWindow()
+
+    def on_search_active_changed(self, active):
+        # 有搜索内容时列表显示搜索结果，否则显示完整历史
+        self.list_widget.setModel(self.search_model if active else self.list_model)
 
     def setup_tray(self):
         # 创建系统托盘图标
@@ -332,12 +680,20 @@ class ClipboardManager(QWidget):
         # 创建托盘菜单
         tray_menu = QMenu()
         show_action = QAction("显示", self)
+        restore_action = QAction("快捷键粘贴后恢复剪贴板", self)
+        debug_action = QAction("调试信息", self)
+        restore_action.setCheckable(True)
+        restore_action.setChecked(self.restore_clipboard)
         quit_action = QAction("退出", self)
         
         show_action.triggered.connect(self.toggle_window)
+        debug_action.triggered.connect(self.show_debug_panel)
+        restore_action.toggled.connect(lambda checked: setattr(self, 'restore_clipboard', checked))
         quit_action.triggered.connect(QApplication.quit)
         
         tray_menu.addAction(show_action)
+        tray_menu.addAction(restore_action)
+        tray_menu.addAction(debug_action)
         tray_menu.addSeparator()
         tray_menu.addAction(quit_action)
         
@@ -345,6 +701,30 @@ class ClipboardManager(QWidget):
         self.tray_icon.activated.connect(self.tray_icon_activated)
         self.tray_icon.show()
     
+    def show_debug_panel(self):
+        """显示运行指标"""
+        if self.debug_panel is None:
+            self.debug_panel = DebugPanel(self.debug_info)
+        self.debug_panel.show()
+        self.debug_panel.raise_()
+
+    def debug_info(self):
+        history = self.clip_history
+        yield f"历史记录 {len(history)} 条，{history.total_bytes / 1024 / 1024:.1f} MB"
+        if history.limits.bounded:
+            limits = history.limits
+            yield f"上限 {limits.max_entries} 条 / {limits.max_bytes} 字节 / {limits.max_age} 秒"
+        governor = self.memory_governor
+        if governor is not None:
+            yield (f"内存中的正文 {governor.resident_bytes / 1024 / 1024:.1f} MB / 预算 "
+                   f"{governor.budget / 1024 / 1024:.1f} MB，{governor.spilled_count} 条在磁盘上"
+                   f"（{governor.spill_bytes / 1024 / 1024:.1f} MB）")
+        if self.replicator is not None:
+            oplog = self.replicator.oplog
+            yield f"同步 replica {oplog.replica}，时钟 {oplog.clock}"
+        if self.tracer is not None:
+            yield f"记录事件 {self.tracer.count} 条到 {self.tracer.path}"
+
     def toggle_window(self):
         if self.isVisible():
             self.hide()
@@ -358,7 +738,8 @@ class ClipboardManager(QWidget):
     
     def closeEvent(self, event):
         # 在关闭程序前取消注册快捷键
-        keyboard.unhook_all()
+        if self.backend is not None:
+            self.backend.unhook_all()
         event.accept()
 
     def toggle_always_on_top(self, checked, btn, top_icon, untop_icon):
@@ -387,61 +768,23 @@ class ClipboardManager(QWidget):
     def list_mousePressEvent(self, event):
         if event.button() == Qt.LeftButton:
             self.drag_start_position = event.pos()
-        QListWidget.mousePressEvent(self.list_widget, event)
+        QListView.mousePressEvent(self.list_widget, event)
 
-    def remove_item(self, text, row):
+    def remove_item(self, entry_id):
         """统一处理删除项目的方法"""
         try:
-            print(f"Removing item: text={text}, row={row}")
-            print(f"Before removal: list count={self.list_widget.count()}")
-            
-            # 从列表控件中删除
-            if row >= 0 and row < self.list_widget.count():
-                removed_item = self.list_widget.takeItem(row)
-                if removed_item:
-                    # 从历史记录中删除
-                    if text in self.clip_history:
-                        self.clip_history.remove(text)
-                    del removed_item
-                    print(f"Successfully removed item at row {row}")
-                    
-                    # 删除后更新列表以重新编号
-                    self.update_list()
-            
-            print(f"After removal: list count={self.list_widget.count()}")
-            print(f"Current history: {self.clip_history}")
-            
-        except Exception as e:
-            print(f"Error removing item: {str(e)}")
-
-    def create_list_item(self, text, index):
-        item = QListWidgetItem()
-        
-        # 存储原始文本
-        item.setData(Qt.UserRole, text)
-        
-        # 设置显示文本
-        item.setText(f"[{index}] · {text}")
-        
-        # 设置字体
-        font = QFont("Arial", 9)
-        item.setFont(font)
-        
-        # 设置编号的颜色（浅蓝色）
-        brush = item.foreground()
-        brush.setColor(QColor("#7fb3d5"))
-        item.setForeground(brush)
-        
-        # 设置项目的样式
-        item.setSizeHint(QSize(self.list_widget.width() - 20, 32))
-        
-        return item
-
-    def update_list(self):
-        self.list_widget.clear()
-        for index, text in enumerate(self.clip_history, 1):
-            item = self.create_list_item(text, index)
-            self.list_widget.addItem(item)
+            if self.tracer is not None:
+                entry = self.clip_history.get(entry_id)
+                if entry is not None:
+                    self.tracer.remove(entry)
+            # 从历史记录中删除，模型只会移除对应的一行
+            with metrics.timer('remove'):
+                row = self.clip_history.remove(entry_id)
+            if row >= 0:
+                metrics.counter('removals').inc()
+                log.debug("Removed item id=%d at row %d, %d left", entry_id, row, len(self.clip_history))
+        except Exception:
+            log.exception("Error removing item id=%s", entry_id)
 
     def list_mouseMoveEvent(self, event):
         try:
@@ -455,17 +798,15 @@ class ClipboardManager(QWidget):
                 return
 
             # 获取当前项
-            current_item = self.list_widget.itemAt(self.drag_start_position)
-            if not current_item:
+            index = self.list_widget.indexAt(self.drag_start_position)
+            entry = self.list_widget.model().entry(index)
+            if entry is None:
                 return
 
-            # 获取原始文本（不含编号）
-            text = current_item.data(Qt.UserRole)
-            
-            # 创建拖拽对象
+            # 创建拖拽对象，带上条目记录的全部格式
             drag = QDrag(self.list_widget)
-            mimedata = QMimeData()
-            mimedata.setText(text)
+            # 内容在放下时才由目标程序索取，取消或被拒绝的拖拽不读取条目
+            mimedata = LazyMimeData(self.clip_history, entry)
             drag.setMimeData(mimedata)
 
             # 执行拖拽
@@ -473,124 +814,220 @@ class ClipboardManager(QWidget):
             
             # 如果拖拽成功
             if result == Qt.CopyAction:
-                row = self.list_widget.row(current_item)
+                metrics.counter('drags').inc()
+                self.clip_history.mark_pasted(entry.id)
+                if self.tracer is not None:
+                    self.tracer.use('drag', entry)
                 # 设置剪贴板
-                self._internal_copy = True
-                self.clipboard.setText(text)
+                self.set_clipboard(entry)
                 
-                # 如果启用了自动删除，删除该项
-                if self.auto_delete.isChecked():
-                    QTimer.singleShot(0, lambda: self.remove_item(text, row))
+                # 如果启用了自动删除，删除该项（固定的条目保留）
+                if self.auto_delete.isChecked() and not entry.pinned:
+                    QTimer.singleShot(0, lambda: self.remove_item(entry.id))
             
-        except Exception as e:
-            print(f"Drag error: {str(e)}")
-        finally:
-            if hasattr(self, '_internal_copy'):
-                delattr(self, '_internal_copy')
+        except Exception:
+            log.exception("Drag error")
 
-    def handle_paste(self, text, row):
+    def handle_paste(self, entry_id):
         """统一处理粘贴操作"""
         try:
-            # 获取原始文本（不含编号）
-            original_text = self.list_widget.item(row).data(Qt.UserRole)
+            entry = self.clip_history.get(entry_id)
+            if entry is None:
+                return
             
+            if self.tracer is not None:
+                self.tracer.use('paste', entry)
             # 设置剪贴板
-            self._internal_copy = True
-            self.clipboard.setText(original_text)
+            self.set_clipboard(entry)
+            self.clip_history.mark_pasted(entry_id)
+            metrics.counter('paste_click').inc()
             
-            # 如果用了自动删除，删除该项
-            if self.auto_delete.isChecked():
-                self.remove_item(original_text, row)  # remove_item 现在会自动更新列表
+            # 如果用了自动删除，删除该项（固定的条目保留）
+            if self.auto_delete.isChecked() and not entry.pinned:
+                self.remove_item(entry_id)
             else:
-                # 显示复制成功提示
-                current_item = self.list_widget.item(row)
-                if current_item:
-                    # 使用相同的字体显示复制成功提示
-                    font = QFont("Arial", 9)  # 使用相同的字体大小
-                    current_item.setFont(font)
-                    current_item.setText("✓ 已复制")
-                    QTimer.singleShot(500, lambda: self.update_list())
+                # 显示复制成功提示，只刷新这一行
+                model = self.list_widget.model()
+                model.flash(entry_id)
+                QTimer.singleShot(500, lambda: model.unflash(entry_id))
                 
-        except Exception as e:
-            print(f"Error in handle_paste: {str(e)}")
-        finally:
-            if hasattr(self, '_internal_copy'):
-                delattr(self, '_internal_copy')
+        except Exception:
+            log.exception("Error in handle_paste")
 
     def copy_selected_text(self):
-        current_item = self.list_widget.currentItem()
-        if current_item:
-            label = self.list_widget.itemWidget(current_item)
-            # 获取原始文本（不包含编号）
-            text = self.clip_history[self.list_widget.row(current_item)]
-            self.clipboard.setText(text)
+        entry = self.list_widget.model().entry(self.list_widget.currentIndex())
+        if entry is not None:
+            self.set_clipboard(entry)
+
+    def setup_sync(self):
+        """settings.json 中有 "sync" 时记录操作日志；指定了 directory 时定期通过共享目录同步"""
+        self.replicator = None
+        options = self.settings.get('sync')
+        if not isinstance(options, dict):
+            return
+        try:
+            oplog = OpLog(os.path.join(self.data_dir, 'oplog'), self.clip_history.blob_store)
+        except (OSError, ValueError) as e:
+            log.error("Error opening operation log: %s", e)
+            return
+        self.replicator = Replicator(self.clip_history, oplog, self.history_store)
+        QApplication.instance().aboutToQuit.connect(self.replicator.close)
+        log.info("Sync enabled, replica %s", oplog.replica)
+        if options.get('directory'):
+            self.directory_sync = DirectorySync(self.replicator, options['directory'])
+            self.sync_timer = QTimer(self)
+            self.sync_timer.timeout.connect(self.sync_directory)
+            self.sync_timer.start(int(options.get('interval_s', SYNC_INTERVAL_S) * 1000))
+            QTimer.singleShot(0, self.sync_directory)
+
+    def sync_directory(self):
+        try:
+            with metrics.timer('sync'):
+                merged = self.directory_sync.sync()
+        except OSError as e:
+            log.warning("Error syncing with %s: %s", self.directory_sync.directory, e)
+            return
+        if merged:
+            metrics.counter('sync_ops').inc(merged)
+            log.debug("Merged %d operations from other instances", merged)
+
+    def setup_ipc(self):
+        handler = CommandHandler(self.clip_history, self.search_index,
+                                 copy=self.set_clipboard, show=self.show_window,
+                                 replicator=self.replicator, order=self.order)
+        self.ipc_server = IpcServer(server_name(self.data_dir), handler, self)
+        if self.ipc_server.listen():
+            QApplication.instance().aboutToQuit.connect(self.ipc_server.close)
+
+    def show_window(self):
+        """再次启动程序时显示已在运行的窗口"""
+        self.show()
+        self.raise_()
 
     def setup_shortcuts(self):
-        """设置快捷键"""
-        # 为数字 1-9 设置快捷键
-        for i in range(1, 10):
-            keyboard.add_hotkey(f'alt+{i}', self.handle_number_shortcut, args=(i,))
+        """设置快捷键
+
+        所有快捷键共用一个键盘钩子，由 HotkeyDispatcher 查找并在它的线程里回调。
+        默认绑定见 hotkeys.default_keymap，settings.json 的 "hotkeys" 可以增加或覆盖，
+        值为 "paste N"、"toggle_window"，为 null 表示取消默认绑定：
 
-    def handle_number_shortcut(self, number):
-        """处理数字快捷键"""
+            {"hotkeys": {"ctrl+alt+v": "toggle_window", "alt+0": null}}
+        """
+        # 粘贴在专用线程里完成，按键松开由键盘事件通知，不再轮询
+        self.key_tracker = KeyTracker()
+        self.paste_worker = PasteWorker(self.key_tracker, self.paste_set_clipboard,
+                                        self.backend.send_paste,
+                                        read_clipboard=self.backend.read_text,
+                                        write_clipboard=self.write_clipboard_text,
+                                        on_done=self.on_paste_done)
+        QApplication.instance().aboutToQuit.connect(self.paste_worker.stop)
+        self.toggle_requested.connect(self.toggle_window)
+        self.hotkeys = HotkeyDispatcher(forward=self.key_tracker.on_event)
+        QApplication.instance().aboutToQuit.connect(self.hotkeys.stop)
+        keymap = default_keymap()
+        overrides = self.settings.get('hotkeys', {})
+        if isinstance(overrides, dict):
+            keymap.update(overrides)
+        else:
+            log.warning("Error in settings: hotkeys should be an object")
+        for combo, action in keymap.items():
+            if action is None:
+                continue
+            try:
+                self.hotkeys.add(combo, *self.hotkey_action(action))
+            except ValueError as e:
+                log.warning("Error in settings: %s", e)
+        self.backend.hook_keys(self.hotkeys.on_event)
+
+    def hotkey_action(self, action):
+        """快捷键动作 -> (回调, 参数)"""
+        name, _, argument = str(action).partition(' ')
+        if name == 'paste' and argument.strip().isdigit() and int(argument) > 0:
+            return self.handle_number_shortcut, (int(argument),)
+        if name == 'toggle_window' and not argument:
+            return (lambda press: self.toggle_requested.emit()), ()
+        raise ValueError(f'unknown hotkey action {action!r}')
+
+    def handle_number_shortcut(self, press, number):
+        """处理数字快捷键（在快捷键线程中调用，只负责把粘贴放进队列）"""
+        if self.tracer is not None:
+            self.tracer.hotkey(number)
         try:
-            # 因为列表索引从0开始，而显示的编号从1开始，所以这里需要减1
-            index = number - 1
-            if index < len(self.clip_history):
-                text = self.clip_history[index]
-                print(f"\n=== 剪贴板项目 [{number}] ===")
-                print(text)
-                print("=" * 30)
-                
-                try:
-                    # 使用 win32clipboard 来设置剪贴板
-                    win32clipboard.OpenClipboard()
-                    win32clipboard.EmptyClipboard()
-                    win32clipboard.SetClipboardText(text)
-                    win32clipboard.CloseClipboard()
-                    
-                    # 模拟粘贴操作
-                    def wait_for_keys_release():
-                        # 等待 alt 和数字键释放
-                        while any(keyboard.is_pressed(key) for key in ['alt'] + [str(i) for i in range(10)]):
-                            time.sleep(0.05)
-                    
-                    # 等待按键释放后执行粘贴
-                    wait_for_keys_release()
-                    keyboard.send('ctrl+v')
-                    
-                    # 如果启用了自动删除，删除该项
-                    if self.auto_delete.isChecked():
-                        # 使用 QMetaObject.invokeMethod 在主线程中执行删除操作
-                        QMetaObject.invokeMethod(self, "delayed_remove_item",
-                                               Qt.QueuedConnection,
-                                               Q_ARG(str, text),
-                                               Q_ARG(int, index))
-                finally:
-                    # 确保剪贴板被关闭
-                    try:
-                        win32clipboard.CloseClipboard()
-                    except:
-                        pass
+            # 显示的编号从1开始，按当前的排列顺序换算成行号
+            with self.clip_history.lock:
+                entry = self.order.get_by_number(number)
+            if entry is not None:
+                log.debug("Hotkey %s -> item id=%d (%d chars)", press.combo, entry.id, entry.length)
+                self.paste_worker.submit(PasteJob(entry.id, press.keys, press.time,
+                                                  restore=self.restore_clipboard))
             else:
-                print(f"没有找到编号为 {number} 的剪贴板项目")
-        except Exception as e:
-            print(f"处理快捷键时出错: {str(e)}")
+                log.info("没有找到编号为 %d 的剪贴板项目", number)
+        except Exception:
+            log.exception("处理快捷键时出错")
+
+    def paste_set_clipboard(self, job):
+        """在粘贴线程中设置剪贴板，条目已被删除时返回 False"""
+        with self.clip_history.lock:
+            entry = self.clip_history.get(job.entry_id)
+        if entry is None:
+            return False
+        if entry.formats or entry.kind == 'image':
+            # 富文本和图片需要在主线程里通过 QClipboard 设置
+            QMetaObject.invokeMethod(self, "set_clipboard_entry",
+                                   Qt.BlockingQueuedConnection,
+                                   Q_ARG(int, entry.id))
+        else:
+            self.write_clipboard_text(entry.text)
+        return True
+
+    def write_clipboard_text(self, text):
+        """在粘贴线程中直接写入剪贴板文本，随后捕获到的这次变化不算作重新复制"""
+        self._own_writes.add(content_digest(text.strip()))
+        self.backend.write_text(text)
+
+    def on_paste_done(self, job):
+        """粘贴线程完成一次粘贴后的回调"""
+        if not job.ok:
+            return
+        metrics.counter('paste_hotkey').inc()
+        metrics.histogram('hotkey_paste').observe(job.latency)
+        log.debug("Hotkey paste latency %.1f ms", job.latency * 1000)
+        # 使用频率的变化会移动列表中的行，要在主线程里记录
+        QMetaObject.invokeMethod(self, "mark_entry_pasted",
+                               Qt.QueuedConnection,
+                               Q_ARG(int, job.entry_id))
+        # 如果启用了自动删除，删除该项
+        if self.auto_delete.isChecked():
+            # 使用 QMetaObject.invokeMethod 在主线程中执行删除操作
+            QMetaObject.invokeMethod(self, "delayed_remove_item",
+                                   Qt.QueuedConnection,
+                                   Q_ARG(int, job.entry_id))
+
+    @pyqtSlot(int)
+    def set_clipboard_entry(self, entry_id):
+        """在主线程中把条目的全部格式放到剪贴板"""
+        entry = self.clip_history.get(entry_id)
+        if entry is not None:
+            self.set_clipboard(entry)
+
+    @pyqtSlot(int)
+    def mark_entry_pasted(self, entry_id):
+        self.clip_history.mark_pasted(entry_id)
 
     # 添加一个新的槽函数来处理延迟删除
-    @pyqtSlot(str, int)
-    def delayed_remove_item(self, text, index):
-        """在主线程中安全地删除项目"""
-        self.remove_item(text, index)
+    @pyqtSlot(int)
+    def delayed_remove_item(self, entry_id):
+        """在主线程中安全地删除项目（快捷键粘贴后的自动删除，固定的条目保留）"""
+        entry = self.clip_history.get(entry_id)
+        if entry is not None and not entry.pinned:
+            self.remove_item(entry_id)
 
     def get_item_by_number(self, number):
         """根据编号获取剪贴板项目"""
         try:
-            # 编号从1开始，所以需要减1来获取正确的索引
-            index = number - 1
-            if 0 <= index < len(self.clip_history):
-                return self.clip_history[index]
-            return None
-        except Exception as e:
-            print(f"获取剪贴板项目时出错: {str(e)}")
+            # 编号从1开始，按当前的排列顺序换算成行号
+            entry = self.order.get_by_number(number)
+            return entry.text if entry is not None else None
+        except Exception:
+            log.exception("获取剪贴板项目时出错")
             return None
\ No newline at end of file
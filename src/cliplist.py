@@ -0,0 +1,166 @@
+"""ClipList 命令行客户端
+
+连接正在运行的 ClipList（不启动 Qt），例如：
+
+    cliplist get 1            # 输出编号 1 的完整内容
+    cliplist get 1 2 3        # 一次往返取多条
+    cliplist list -n 10
+    cliplist search 关键字
+    cliplist search "type:url github"   # 按内容类型过滤：url path json code email secret
+    echo hello | cliplist push --copy
+    cliplist pin 2 / cliplist unpin 2
+    cliplist delete 3 4
+    cliplist sync ~/other-dir # 与使用另一个数据目录的实例互相同步
+    cliplist export backup.jsonl.gz
+    cliplist import backup.jsonl.gz   # 需先退出 ClipList，中断后再运行一次即从断点继续
+"""
+import argparse
+import json
+import sys
+
+from app_paths import default_data_dir
+from ipc_client import IpcError, request
+
+
+def build_batch(args):
+    if args.command == 'get':
+        return [{'op': 'get', 'n': n} for n in args.numbers]
+    if args.command == 'list':
+        return [{'op': 'list', 'limit': args.limit}]
+    if args.command == 'search':
+        return [{'op': 'search', 'q': args.query, 'limit': args.limit}]
+    if args.command == 'push':
+        text = args.text if args.text not in (None, '-') else sys.stdin.read()
+        return [{'op': 'push', 'text': text, 'copy': args.copy}]
+    if args.command in ('pin', 'unpin'):
+        return [{'op': 'pin', 'n': n, 'pinned': args.command == 'pin'} for n in args.numbers]
+    if args.command == 'delete':
+        return [{'op': 'delete', 'n': n} for n in args.numbers]
+    if args.command == 'copy':
+        return [{'op': 'copy', 'n': args.number}]
+    return [{'op': 'show'}]
+
+
+def print_items(items):
+    for item in items:
+        mark = '📌' if item['pinned'] else '·'
+        preview = ' '.join(item['preview'].split())
+        tags = ''.join(f"  #{tag}" for tag in item.get('tags', ()))
+        print(f"[{item['n']}] {mark} {preview}{tags}")
+
+
+def print_result(command, result):
+    if command == 'get':
+        sys.stdout.write(result['text'])
+        sys.stdout.write('\n')
+    elif command in ('list', 'search'):
+        print_items(result['items'])
+    elif command == 'push':
+        print(f"[{result['n']}]" + ('' if result['added'] else ' (已存在)'))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='cliplist', description='ClipList 命令行客户端')
+    parser.add_argument('--data-dir', help='与 ClipList 相同的数据目录')
+    parser.add_argument('--json', action='store_true', help='输出原始 JSON 结果')
+    sub = parser.add_subparsers(dest='command', required=True)
+    get = sub.add_parser('get', help='输出指定编号的完整内容')
+    get.add_argument('numbers', type=int, nargs='+')
+    for name, help_text in (('list', '列出最新的条目'), ('search', '搜索')):
+        command = sub.add_parser(name, help=help_text)
+        if name == 'search':
+            command.add_argument('query')
+        command.add_argument('-n', '--limit', type=int, default=20)
+    push = sub.add_parser('push', help='添加一条记录，省略 TEXT 或为 - 时读取标准输入')
+    push.add_argument('text', nargs='?')
+    push.add_argument('--copy', action='store_true', help='同时放到剪贴板')
+    for name, help_text in (('pin', '固定，不会被自动淘汰'), ('unpin', '取消固定'), ('delete', '删除')):
+        command = sub.add_parser(name, help=help_text)
+        command.add_argument('numbers', type=int, nargs='+')
+    copy = sub.add_parser('copy', help='把指定编号放到剪贴板')
+    copy.add_argument('number', type=int)
+    sub.add_parser('show', help='显示主窗口')
+    sync = sub.add_parser('sync', help='与使用另一个数据目录的运行中实例互相同步历史记录')
+    sync.add_argument('peer_dir')
+    export = sub.add_parser('export', help='导出全部历史记录，文件名以 .gz 结尾时压缩')
+    export.add_argument('file')
+    export.add_argument('--level', type=int, default=1, choices=range(1, 10), metavar='1-9',
+                        help='gzip 压缩级别')
+    restore = sub.add_parser('import', help='导入归档，跳过已有的内容（需先退出 ClipList）')
+    restore.add_argument('file')
+    return parser.parse_args(argv)
+
+
+def sync(args):
+    from clip_sync import sync_instances
+    try:
+        sent, received = sync_instances(args.data_dir or default_data_dir(), args.peer_dir)
+    except IpcError as e:
+        print(f"cliplist: {e}", file=sys.stderr)
+        return 2
+    print(f"发送 {sent} 条操作，收到 {received} 条")
+    return 0
+
+
+def archive(args):
+    """导出、导入直接读写数据目录中的 history.db，不经过运行中的实例"""
+    import os
+    import sqlite3
+    from blob_store import BlobStore
+    from clip_archive import ArchiveError, ArchiveImporter, export_records, write_archive
+
+    data_dir = args.data_dir or default_data_dir()
+    db_path = os.path.join(data_dir, 'history.db')
+    blob_store = BlobStore(os.path.join(data_dir, 'blobs'))
+    try:
+        if args.command == 'export':
+            count = write_archive(args.file, export_records(db_path, blob_store), args.level)
+            print(f"导出 {count} 条")
+            return 0
+        try:
+            request(data_dir, [{'op': 'ping'}], timeout=1.0)
+        except IpcError:
+            pass
+        else:
+            print("cliplist: 请先退出 ClipList 再导入", file=sys.stderr)
+            return 1
+        importer = ArchiveImporter(db_path, blob_store)
+        try:
+            added, skipped = importer.run(
+                args.file, lambda position: print(f"\r已读取 {position} 条", end='', file=sys.stderr))
+        finally:
+            importer.close()
+        print(file=sys.stderr)
+        print(f"导入 {added} 条，{skipped} 条已存在")
+        return 0
+    except (ArchiveError, OSError, sqlite3.Error) as e:
+        print(f"cliplist: {e}", file=sys.stderr)
+        return 1
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'sync':
+        return sync(args)
+    if args.command in ('export', 'import'):
+        return archive(args)
+    try:
+        results = request(args.data_dir or default_data_dir(), build_batch(args))
+    except IpcError as e:
+        print(f"cliplist: {e}", file=sys.stderr)
+        return 2
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return 0 if all(r.get('ok') for r in results) else 1
+    status = 0
+    for result in results:
+        if not result.get('ok'):
+            print(f"cliplist: {result.get('error')}", file=sys.stderr)
+            status = 1
+        else:
+            print_result(args.command, result)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
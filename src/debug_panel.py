@@ -0,0 +1,64 @@
+import logging
+import os
+import time
+
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QFont
+from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QPushButton, QFileDialog
+
+from metrics import metrics
+
+log = logging.getLogger(__name__)
+
+
+class DebugPanel(QWidget):
+    """显示运行指标的调试窗口，每秒刷新一次，可导出为 JSON"""
+
+    REFRESH_MS = 1000
+
+    def __init__(self, extra=None, parent=None):
+        super().__init__(parent, Qt.Window)
+        self.setWindowTitle('ClipList 调试信息')
+        self.resize(560, 480)
+        # 返回附加信息行的函数，如历史记录条数、占用字节数
+        self.extra = extra
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setFont(QFont('Consolas', 9))
+        export_btn = QPushButton('导出...')
+        export_btn.clicked.connect(self.export)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        buttons.addWidget(export_btn)
+        layout = QVBoxLayout(self)
+        layout.addWidget(self.text)
+        layout.addLayout(buttons)
+
+        self.timer = QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start(self.REFRESH_MS)
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.timer.stop()
+
+    def refresh(self):
+        lines = list(self.extra()) if self.extra is not None else []
+        if lines:
+            lines.append('')
+        self.text.setPlainText('\n'.join(lines) + metrics.format())
+
+    def export(self):
+        default = os.path.join(os.path.expanduser('~'), time.strftime('cliplist-metrics-%Y%m%d-%H%M%S.json'))
+        path, _ = QFileDialog.getSaveFileName(self, '导出指标', default, 'JSON (*.json)')
+        if path:
+            try:
+                metrics.export(path)
+            except OSError as e:
+                log.error("Error exporting metrics: %s", e)
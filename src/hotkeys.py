@@ -0,0 +1,198 @@
+"""全局快捷键的分发（不依赖 Qt）
+
+只注册一个键盘钩子，所有快捷键放在一棵按键前缀树里：每个按下事件只做
+一两次字典查找，和绑定了多少快捷键无关。快捷键可以是单个组合（alt+1、alt+shift+2），
+也可以是用逗号分隔的连续组合（alt+shift+1, 2）。连续组合中后面的按键没写修饰键时，
+按住或松开修饰键都可以。
+
+    dispatcher = HotkeyDispatcher(forward=key_tracker.on_event)
+    dispatcher.add('alt+1', paste, args=(1,))
+    backend.hook_keys(dispatcher.on_event)
+
+回调在专用线程里执行，键盘钩子线程只负责查找和入队，不会被回调阻塞。
+"""
+import logging
+import queue
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+MODIFIERS = {'ctrl': 1, 'shift': 2, 'alt': 4, 'windows': 8}
+# 连续组合的两次按键之间最多间隔这么久（秒）
+CHORD_TIMEOUT = 1.5
+# 按住 shift 时数字键报告的是符号（美式键盘布局）
+_SHIFTED = dict(zip('!@#$%^&*()', '1234567890'))
+# 修饰键之外的任意修饰键状态都匹配
+_ANY = None
+
+
+def key_name(name):
+    """统一按键名：'left alt' / 'right alt' 都记作 'alt'"""
+    name = (name or '').lower()
+    for prefix in ('left ', 'right '):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    if name == 'alt gr':
+        name = 'alt'
+    elif name == 'control':
+        name = 'ctrl'
+    return _SHIFTED.get(name, name)
+
+
+def parse_combo(text):
+    """'alt+shift+1, 2' -> ((6, '1'), (None, '2'))：每一步为 (修饰键位掩码, 按键)"""
+    steps = []
+    for position, part in enumerate(text.split(',')):
+        mask = 0
+        key = None
+        for name in part.split('+'):
+            name = key_name(name.strip())
+            if not name:
+                raise ValueError(f'empty key in hotkey {text!r}')
+            if name in MODIFIERS:
+                mask |= MODIFIERS[name]
+            elif key is None:
+                key = name
+            else:
+                raise ValueError(f'more than one key in {part.strip()!r} of hotkey {text!r}')
+        if key is None:
+            raise ValueError(f'no key besides modifiers in hotkey {text!r}')
+        steps.append((mask if mask or position == 0 else _ANY, key))
+    return tuple(steps)
+
+
+class KeyPress:
+    """触发快捷键的那次按键"""
+
+    __slots__ = ('combo', 'keys', 'time')
+
+    def __init__(self, combo, keys, time):
+        self.combo = combo
+        # 触发时按住的修饰键和最后按下的键，粘贴前要等它们松开
+        self.keys = keys
+        # 按下时的 time.perf_counter()，用于计算延迟
+        self.time = time
+
+
+class _Binding:
+    __slots__ = ('combo', 'callback', 'args')
+
+    def __init__(self, combo, callback, args):
+        self.combo = combo
+        self.callback = callback
+        self.args = args
+
+
+class HotkeyDispatcher:
+    """单个键盘钩子上的快捷键分发
+
+    前缀树的节点是字典：(修饰键位掩码, 按键) -> 子节点或 _Binding。
+    一个快捷键不能是另一个的前缀，add 时检查，这样不需要等待超时就能确定触发哪个。
+    按住不放产生的重复按下事件不会重复触发。
+
+    forward 可以接收所有按键事件（例如 KeyTracker），不必再注册第二个钩子。
+    回调以 callback(KeyPress, *args) 的形式在专用线程里调用。
+    """
+
+    def __init__(self, forward=None):
+        self.forward = forward
+        self._root = {}
+        self._node = self._root
+        self._deadline = 0.0
+        self._mask = 0
+        self._down = set()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='HotkeyWorker', daemon=True)
+        self._thread.start()
+
+    def add(self, combo, callback, args=()):
+        """绑定快捷键；与已有的快捷键重复或互为前缀时抛出 ValueError"""
+        steps = parse_combo(combo)
+        node = self._root
+        for step in steps[:-1]:
+            child = node.get(step)
+            if child is None:
+                child = node[step] = {}
+            elif type(child) is not dict:
+                raise ValueError(f'hotkey {combo!r} starts with hotkey {child.combo!r}')
+            node = child
+        existing = node.get(steps[-1])
+        if existing is not None:
+            other = existing.combo if type(existing) is not dict else 'longer hotkeys'
+            raise ValueError(f'hotkey {combo!r} conflicts with {other}')
+        node[steps[-1]] = _Binding(combo, callback, tuple(args))
+
+    def clear(self):
+        self._root = {}
+        self._node = self._root
+
+    def on_event(self, event):
+        """键盘钩子回调"""
+        if self.forward is not None:
+            self.forward(event)
+        name = key_name(event.name)
+        bit = MODIFIERS.get(name)
+        if event.event_type != 'down':
+            if bit:
+                self._mask &= ~bit
+            else:
+                self._down.discard(name)
+            return
+        if bit:
+            self._mask |= bit
+            return
+        if name in self._down:
+            return
+        self._down.add(name)
+
+        now = time.perf_counter()
+        root = self._root
+        node = self._node
+        if node is not root and now > self._deadline:
+            node = root
+        step = (self._mask, name)
+        found = node.get(step)
+        if found is None and node is not root:
+            found = node.get((_ANY, name))
+            if found is None:
+                # 不是连续组合的下一步，当作新的开始
+                found = root.get(step)
+        if found is None:
+            self._node = root
+        elif type(found) is dict:
+            self._node = found
+            self._deadline = now + CHORD_TIMEOUT
+        else:
+            self._node = root
+            keys = tuple(mod for mod, mod_bit in MODIFIERS.items() if self._mask & mod_bit) + (name,)
+            self._queue.put((found, KeyPress(found.combo, keys, now)))
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            binding, press = item
+            try:
+                binding.callback(press, *binding.args)
+            except Exception:
+                log.exception("Error handling hotkey %s", binding.combo)
+
+
+def default_keymap():
+    """默认的快捷键 -> 动作
+
+    alt+1..9 粘贴第 1~9 条，alt+0 粘贴第 10 条，
+    alt+shift+N 再按 M（0~9）粘贴第 NM 条（10~99）。
+    """
+    keymap = {f'alt+{n}': f'paste {n}' for n in range(1, 10)}
+    keymap['alt+0'] = 'paste 10'
+    for tens in range(1, 10):
+        for ones in range(10):
+            keymap[f'alt+shift+{tens}, {ones}'] = f'paste {tens * 10 + ones}'
+    return keymap
@@ -0,0 +1,77 @@
+"""不依赖 Qt 的客户端，连接正在运行的 ClipList"""
+import socket
+import sys
+import time
+
+from ipc_protocol import encode, decode, server_name
+
+
+class IpcError(Exception):
+    pass
+
+
+def _read_line(read):
+    chunks = []
+    while True:
+        chunk = read(65536)
+        if not chunk:
+            raise IpcError('connection closed')
+        end = chunk.find(b'\n')
+        if end >= 0:
+            chunks.append(chunk[:end])
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+def _pipe_reader(pipe, timeout):
+    """命名管道的读取函数，timeout 秒内没有读完回复时抛出 TimeoutError
+
+    以同步方式打开的管道读取时会一直阻塞，这里用 PeekNamedPipe 轮询到有数据再读。
+    """
+    import ctypes
+    import msvcrt
+    from ctypes import wintypes
+
+    handle = msvcrt.get_osfhandle(pipe.fileno())
+    peek = ctypes.windll.kernel32.PeekNamedPipe
+    deadline = time.monotonic() + timeout
+
+    def read(size):
+        available = wintypes.DWORD()
+        while True:
+            if not peek(wintypes.HANDLE(handle), None, 0, None, ctypes.byref(available), None):
+                # 服务端关闭了管道
+                return b''
+            if available.value:
+                return pipe.read(min(size, available.value))
+            if time.monotonic() >= deadline:
+                raise TimeoutError('timed out')
+            time.sleep(0.005)
+
+    return read
+
+
+def request(data_dir, batch, timeout=2.0):
+    """发送一批命令，返回对应的结果列表；ClipList 未运行时抛出 IpcError
+
+    timeout 为等待回复的秒数，超时也抛出 IpcError。
+    """
+    name = server_name(data_dir)
+    message = encode(batch)
+    try:
+        if sys.platform == 'win32':
+            # QLocalServer 在 Windows 上是命名管道，可以像文件一样读写
+            with open('\\\\.\\pipe\\' + name, 'r+b', buffering=0) as pipe:
+                pipe.write(message)
+                line = _read_line(_pipe_reader(pipe, timeout))
+        else:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.settimeout(timeout)
+                sock.connect(name)
+                sock.sendall(message)
+                line = _read_line(sock.recv)
+    except (FileNotFoundError, ConnectionRefusedError):
+        raise IpcError('ClipList 没有运行') from None
+    except OSError as e:
+        raise IpcError(str(e)) from None
+    return decode(line)
@@ -0,0 +1,254 @@
+"""本地进程间通信协议
+
+客户端每次发送一行 UTF-8 JSON，内容是一批命令组成的数组，服务端按顺序执行，
+回复一行同样长度的结果数组。一批命令只需要一次往返，例如：
+
+    [{"op": "get", "n": 1}, {"op": "get", "n": 2}]
+    [{"ok": true, "id": 42, "n": 1, "text": "..."}, {"ok": false, "error": "..."}]
+
+sync_clock / sync_pull / sync_push 用于两个实例之间同步操作日志（见 clip_oplog）。
+
+命令里的条目用 "n"（界面编号，从 1 开始）或 "id" 指定；同一批中的编号都按
+执行前的列表解析，批内的删除不会让后面的编号错位。
+
+本模块不依赖 Qt，服务端（ipc_server）和命令行客户端（ipc_client）共用。
+"""
+import hashlib
+import json
+import logging
+import os
+import sys
+
+log = logging.getLogger(__name__)
+
+# 单个请求的最大字节数，超过时断开连接
+MAX_REQUEST = 64 * 1024 * 1024
+
+# 命令参数的类型，执行前统一检查（各命令中同名参数的类型相同）
+ARGUMENT_TYPES = {
+    'op': str,
+    'id': int,
+    'n': int,
+    'limit': int,
+    'q': str,
+    'text': str,
+    'copy': bool,
+    'pinned': bool,
+    'replica': str,
+    'clock': dict,
+    'ops': list,
+}
+_TYPE_NAMES = {str: 'a string', int: 'an integer', bool: 'a boolean', dict: 'an object', list: 'an array'}
+
+
+def server_name(data_dir):
+    """与数据目录对应的服务名：Windows 下为命名管道名，其它系统为套接字路径"""
+    data_dir = os.path.abspath(data_dir)
+    if sys.platform == 'win32':
+        return 'cliplist-' + hashlib.blake2b(data_dir.encode('utf-8'), digest_size=6).hexdigest()
+    return os.path.join(data_dir, 'cliplist.sock')
+
+
+def encode(message):
+    return json.dumps(message, ensure_ascii=False, separators=(',', ':')).encode('utf-8') + b'\n'
+
+
+def decode(line):
+    return json.loads(line.decode('utf-8'))
+
+
+class CommandError(Exception):
+    pass
+
+
+def check_arguments(command):
+    """检查命令和参数的类型，不对时抛出 CommandError；值为 null 的参数视为未提供"""
+    if not isinstance(command, dict):
+        raise CommandError('command must be an object')
+    for name, kind in ARGUMENT_TYPES.items():
+        value = command.get(name)
+        if value is None:
+            continue
+        # bool 是 int 的子类，编号和数量不接受 true / false
+        if not isinstance(value, kind) or (kind is int and isinstance(value, bool)):
+            raise CommandError(f'{name} must be {_TYPE_NAMES[kind]}')
+    clock = command.get('clock')
+    if clock is not None and not all(type(seq) is int for seq in clock.values()):
+        raise CommandError('clock values must be integers')
+    ops = command.get('ops')
+    if ops is not None and not all(isinstance(op, dict) for op in ops):
+        raise CommandError('ops must be objects')
+
+
+class CommandHandler:
+    """在界面线程中执行一批命令
+
+    copy(entry) 把条目放到剪贴板，show() 显示主窗口，均可不提供。
+    replicator 为 clip_oplog.Replicator 时支持 sync_* 命令。
+    order 为界面上的排列顺序（如 clip_frecency.FrecencyView），编号按它解析，默认即 history。
+    """
+
+    LIST_LIMIT = 20
+    SYNC_LIMIT = 1000
+
+    def __init__(self, history, search_index, copy=None, show=None, replicator=None, order=None):
+        self.history = history
+        self.order = order if order is not None else history
+        self.search_index = search_index
+        self.copy = copy
+        self.show = show
+        self.replicator = replicator
+
+    def handle_line(self, line):
+        try:
+            batch = decode(line)
+        except ValueError as e:
+            return [{'ok': False, 'error': f'invalid request: {e}'}]
+        if not isinstance(batch, list):
+            batch = [batch]
+        return self.handle_batch(batch)
+
+    def handle_batch(self, batch):
+        # 先检查参数，再按当前列表把编号换算成 id
+        errors = []
+        for command in batch:
+            try:
+                check_arguments(command)
+            except CommandError as e:
+                errors.append(e)
+            else:
+                errors.append(None)
+        targets = [self._resolve(command) if error is None else None
+                   for command, error in zip(batch, errors)]
+        results = []
+        for command, error, entry_id in zip(batch, errors, targets):
+            try:
+                if error is not None:
+                    raise error
+                handler = getattr(self, 'op_' + str(command.get('op')), None)
+                if handler is None:
+                    raise CommandError(f"unknown op: {command.get('op')}")
+                result = handler(command, entry_id)
+                result['ok'] = True
+            except (CommandError, ValueError, OSError) as e:
+                result = {'ok': False, 'error': str(e)}
+            except Exception:
+                # 一条命令出错不影响同一批的其它命令，也不让连接断开
+                log.exception("Error handling IPC command %s", command.get('op'))
+                result = {'ok': False, 'error': 'internal error'}
+            results.append(result)
+        return results
+
+    def _resolve(self, command):
+        if command.get('id') is not None:
+            return command['id']
+        if command.get('n') is not None:
+            entry = self.order.get_by_number(command['n'])
+            return entry.id if entry is not None else None
+        return None
+
+    def _entry(self, entry_id):
+        entry = self.history.get(entry_id) if entry_id is not None else None
+        if entry is None:
+            raise CommandError('no such item')
+        return entry
+
+    def _summary(self, entry):
+        return {
+            'id': entry.id,
+            'n': self.order.row_of_entry(entry) + 1,
+            'preview': entry.preview,
+            'length': entry.length,
+            'kind': entry.kind,
+            'pinned': entry.pinned,
+            'tags': sorted(entry.tags or ()),
+            'created': entry.created,
+        }
+
+    def op_ping(self, command, entry_id):
+        return {'items': len(self.history)}
+
+    def op_get(self, command, entry_id):
+        entry = self._entry(entry_id)
+        result = self._summary(entry)
+        result['text'] = entry.text
+        return result
+
+    def op_list(self, command, entry_id):
+        limit = command.get('limit')
+        limit = self.LIST_LIMIT if limit is None else limit
+        entries = (self.order.entry_at(row) for row in range(min(limit, len(self.order))))
+        return {'items': [self._summary(entry) for entry in entries]}
+
+    def op_search(self, command, entry_id):
+        query = command.get('q') or ''
+        limit = command.get('limit')
+        limit = self.LIST_LIMIT if limit is None else limit
+        return {'items': [self._summary(entry) for entry in self.search_index.search(query, limit)]}
+
+    def op_push(self, command, entry_id):
+        text = command.get('text')
+        if not isinstance(text, str) or not text.strip():
+            raise CommandError('text is required')
+        entry, added = self.history.add(text.strip())
+        if command.get('copy') and self.copy is not None:
+            self.copy(entry)
+        result = self._summary(entry)
+        result['added'] = added
+        return result
+
+    def op_pin(self, command, entry_id):
+        entry = self._entry(entry_id)
+        pinned = command.get('pinned')
+        self.history.set_pinned(entry.id, pinned if pinned is not None else True)
+        return self._summary(entry)
+
+    def op_delete(self, command, entry_id):
+        entry = self._entry(entry_id)
+        self.history.remove(entry.id)
+        return {'id': entry.id}
+
+    def op_copy(self, command, entry_id):
+        entry = self._entry(entry_id)
+        if self.copy is None:
+            raise CommandError('copy is not available')
+        self.copy(entry)
+        return self._summary(entry)
+
+    def op_show(self, command, entry_id):
+        if self.show is not None:
+            self.show()
+        return {}
+
+    def _oplog(self):
+        if self.replicator is None:
+            raise CommandError('sync is not enabled')
+        return self.replicator.oplog
+
+    def op_sync_clock(self, command, entry_id):
+        oplog = self._oplog()
+        return {'replica': oplog.replica, 'clock': dict(oplog.clock)}
+
+    def op_sync_pull(self, command, entry_id):
+        """对方（replica）时钟为 clock，返回它缺少的操作，最多 limit 条"""
+        clock = command.get('clock') or {}
+        limit = command.get('limit')
+        limit = self.SYNC_LIMIT if limit is None else limit
+        oplog = self._oplog()
+        if command.get('replica') is not None:
+            # 对方已经有了 clock 覆盖到的操作，整理日志时可以不再保留
+            oplog.note_peer(command['replica'], clock)
+        ops = oplog.ops_since(clock, limit)
+        return {'ops': [op.to_dict() for op in ops]}
+
+    def op_sync_push(self, command, entry_id):
+        # 命令行客户端也会导入本模块，用到时才导入
+        from clip_oplog import Operation
+        self._oplog()
+        try:
+            ops = [Operation.from_dict(op) for op in command.get('ops') or ()]
+        except KeyError as e:
+            raise CommandError(f'bad operation: missing {e}') from None
+        except (TypeError, ValueError) as e:
+            raise CommandError(f'bad operation: {e}') from None
+        return {'applied': self.replicator.apply(ops)}
@@ -0,0 +1,69 @@
+import logging
+from functools import partial
+
+from PyQt5.QtCore import QObject
+from PyQt5.QtNetwork import QLocalServer
+
+from ipc_protocol import MAX_REQUEST, encode
+from metrics import metrics
+
+log = logging.getLogger(__name__)
+
+
+class IpcServer(QObject):
+    """本地套接字（Windows 下为命名管道）服务，供命令行客户端和第二个启动的实例使用
+
+    请求在界面线程中由 CommandHandler 执行，只有当前用户可以连接。
+    """
+
+    def __init__(self, name, handler, parent=None):
+        super().__init__(parent)
+        self.name = name
+        self.handler = handler
+        self._buffers = {}
+        self.server = QLocalServer(self)
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        self.server.newConnection.connect(self.on_new_connection)
+
+    def listen(self):
+        # 上次异常退出留下的套接字文件会导致 listen 失败；调用前已确认没有实例在运行
+        QLocalServer.removeServer(self.name)
+        if not self.server.listen(self.name):
+            log.error("Cannot listen on %s: %s", self.name, self.server.errorString())
+            return False
+        return True
+
+    def close(self):
+        self.server.close()
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            sock = self.server.nextPendingConnection()
+            self._buffers[sock] = bytearray()
+            sock.readyRead.connect(partial(self.on_ready_read, sock))
+            sock.disconnected.connect(partial(self.on_disconnected, sock))
+
+    def on_disconnected(self, sock):
+        self._buffers.pop(sock, None)
+        sock.deleteLater()
+
+    def on_ready_read(self, sock):
+        buffer = self._buffers.get(sock)
+        if buffer is None:
+            return
+        buffer += bytes(sock.readAll())
+        if len(buffer) > MAX_REQUEST:
+            log.warning("IPC request too large, closing connection")
+            sock.abort()
+            return
+        while True:
+            end = buffer.find(b'\n')
+            if end < 0:
+                break
+            line = bytes(buffer[:end])
+            del buffer[:end + 1]
+            with metrics.timer('ipc_request'):
+                results = self.handler.handle_line(line)
+            metrics.counter('ipc_commands').inc(len(results))
+            sock.write(encode(results))
+        sock.flush()
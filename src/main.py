@@ -1,19 +1,69 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QSystemTrayIcon
-from PyQt5.QtGui import QCursor, QIcon
-from PyQt5.QtCore import Qt
+# 最先导入，从这里开始计时
+from startup import timeline
+import argparse
+import logging
+from PyQt5.QtWidgets import QApplication
 from clipboard_manager import ClipboardManager
+from app_paths import default_data_dir
+from ipc_client import IpcError, request
+from metrics import metrics
+
+timeline.mark('import')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(prog='ClipList')
+    parser.add_argument('--data-dir', help='数据目录，默认 %%APPDATA%%\\ClipList 或 ~/.cliplist')
+    parser.add_argument('--startup-timeline', action='store_true', help='启动完成后打印各阶段耗时')
+    parser.add_argument('--startup-budget', action='store_true',
+                        help='启动完成后与默认启动预算比较并退出，超出时状态码为 1（隐含 --exit-after-startup）')
+    parser.add_argument('--exit-after-startup', action='store_true', help='启动完成后立即退出')
+    parser.add_argument('--log-level', default='INFO',
+                        choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'], help='日志级别')
+    parser.add_argument('--metrics-file', help='退出时把运行指标写入这个 JSON 文件')
+    # 其余参数留给 Qt
+    return parser.parse_known_args(argv[1:])
+
 
 def main():
-    app = QApplication(sys.argv)
-    
+    args, qt_args = parse_args(sys.argv)
+    logging.basicConfig(level=args.log_level,
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    data_dir = args.data_dir or default_data_dir()
+    try:
+        # 已有实例在运行时只让它显示窗口，不再启动第二个剪贴板监听
+        request(data_dir, [{'op': 'show'}], timeout=1.0)
+        logging.info("ClipList 已在运行")
+        return
+    except IpcError:
+        pass
+    app = QApplication(sys.argv[:1] + qt_args)
+    if args.metrics_file:
+        app.aboutToQuit.connect(lambda: metrics.export(args.metrics_file))
+
     # 设置应用程序样式
     app.setStyle('Fusion')
-    
-    manager = ClipboardManager()
+
+    manager = ClipboardManager(data_dir=data_dir)
+    timeline.mark('construct')
+
+    def on_startup_finished():
+        status = 0
+        if args.startup_timeline:
+            print(timeline.report())
+        if args.startup_budget:
+            for name, elapsed, limit in timeline.over_budget():
+                shown = f"{elapsed:.1f} ms" if elapsed is not None else "未完成"
+                print(f"启动超出预算: {name} {shown} > {limit} ms")
+                status = 1
+        if args.exit_after_startup or args.startup_budget:
+            app.exit(status)
+
+    manager.startup_finished.connect(on_startup_finished)
     manager.show()
-    
+
     sys.exit(app.exec_())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Counter:
+    def __init__(self, lock):
+        self._lock = lock
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge:
+    """当前值，例如占用的内存；每次 set 覆盖上一次的值"""
+
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def snapshot(self):
+        return self.value
+
+
+class Histogram:
+    """耗时直方图（秒）
+
+    桶按 2 的幂划分，从 BASE 开始，共 BUCKETS 个，记录一次只做一次位运算；
+    分位数按桶的上界估算，误差不超过一倍，足以看出量级和变化。
+    """
+
+    BASE = 1e-5  # 10 微秒
+    BUCKETS = 32
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.buckets = [0] * self.BUCKETS
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        index = min(int(seconds / self.BASE).bit_length(), self.BUCKETS - 1)
+        with self._lock:
+            self.buckets[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, q):
+        """第 q（0~1）分位数的上界估计（秒）"""
+        with self._lock:
+            if not self.count:
+                return None
+            rank = q * self.count
+            seen = 0
+            for index, hits in enumerate(self.buckets):
+                seen += hits
+                if seen >= rank and hits:
+                    return min(self.BASE * (1 << index), self.max)
+            return self.max
+
+    def snapshot(self):
+        if not self.count:
+            return {'count': 0}
+        return {
+            'count': self.count,
+            'mean_ms': self.total / self.count * 1000,
+            'p50_ms': self.percentile(0.5) * 1000,
+            'p95_ms': self.percentile(0.95) * 1000,
+            'p99_ms': self.percentile(0.99) * 1000,
+            'max_ms': self.max * 1000,
+        }
+
+
+class MetricsRegistry:
+    """进程内的运行指标：计数器、当前值和耗时直方图
+
+    按名称取用，第一次取用时创建；任何线程都可以更新。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.started = time.time()
+
+    def counter(self, name):
+        counter = self.counters.get(name)
+        if counter is None:
+            counter = self.counters.setdefault(name, Counter(self._lock))
+        return counter
+
+    def gauge(self, name):
+        gauge = self.gauges.get(name)
+        if gauge is None:
+            gauge = self.gauges.setdefault(name, Gauge())
+        return gauge
+
+    def histogram(self, name):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms.setdefault(name, Histogram(self._lock))
+        return histogram
+
+    @contextmanager
+    def timer(self, name):
+        """with metrics.timer('name'): 记录代码块的耗时"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name).observe(time.perf_counter() - started)
+
+    def snapshot(self):
+        return {
+            'uptime_s': time.time() - self.started,
+            'counters': {name: c.snapshot() for name, c in sorted(self.counters.items())},
+            'gauges': {name: g.snapshot() for name, g in sorted(self.gauges.items())},
+            'histograms': {name: h.snapshot() for name, h in sorted(self.histograms.items())},
+        }
+
+    def export(self, path):
+        """把当前指标写入 JSON 文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2, ensure_ascii=False)
+
+    def format(self):
+        """便于阅读的文本形式，用于调试面板"""
+        snapshot = self.snapshot()
+        lines = [f"运行时间 {snapshot['uptime_s']:.0f} s", '', '计数']
+        for name, value in snapshot['counters'].items():
+            lines.append(f"  {name:<24} {value:>10}")
+        if snapshot['gauges']:
+            lines += ['', '当前值']
+            for name, value in snapshot['gauges'].items():
+                lines.append(f"  {name:<24} {value:>10}")
+        lines += ['', f"  {'耗时 (ms)':<24} {'count':>7} {'mean':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}"]
+        for name, h in snapshot['histograms'].items():
+            if not h['count']:
+                continue
+            lines.append(f"  {name:<24} {h['count']:>7} {h['mean_ms']:>9.2f} {h['p50_ms']:>9.2f} "
+                         f"{h['p95_ms']:>9.2f} {h['p99_ms']:>9.2f} {h['max_ms']:>9.2f}")
+        return '\n'.join(lines)
+
+
+# 进程内共用的指标
+metrics = MetricsRegistry()
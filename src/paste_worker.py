@@ -0,0 +1,124 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+
+from hotkeys import key_name
+
+log = logging.getLogger(__name__)
+
+
+class KeyTracker:
+    """根据按键事件维护当前按下的键，供粘贴线程等待按键松开
+
+    回调运行在键盘钩子线程里，只更新集合并唤醒等待者，不做其它工作。
+    """
+
+    def __init__(self):
+        self.pressed = set()
+        self._cond = threading.Condition()
+
+    def on_event(self, event):
+        name = key_name(event.name)
+        with self._cond:
+            if event.event_type == 'down':
+                self.pressed.add(name)
+            else:
+                self.pressed.discard(name)
+                self._cond.notify_all()
+
+    def wait_released(self, keys, timeout=1.0):
+        """等待 keys 全部松开；超时返回 False"""
+        keys = {key_name(k) for k in keys}
+        with self._cond:
+            return self._cond.wait_for(lambda: not (keys & self.pressed), timeout)
+
+
+class PasteJob:
+    """一次快捷键粘贴"""
+
+    def __init__(self, entry_id, keys, started=None, restore=False):
+        self.entry_id = entry_id
+        # 触发粘贴的按键，松开后才发送 ctrl+v
+        self.keys = keys
+        self.started = started if started is not None else time.perf_counter()
+        self.restore = restore
+        self.latency = None
+        self.ok = False
+
+
+class PasteWorker:
+    """专用的粘贴线程
+
+    快捷键回调只把 PasteJob 放进队列就返回，不再阻塞键盘钩子线程。
+    线程内依次完成：设置剪贴板 -> 等待按键松开（事件驱动，不轮询）
+    -> 发送 ctrl+v -> 可选地恢复原剪贴板，并记录从按下快捷键到发出粘贴的延迟。
+
+    set_clipboard(job) 返回 False 表示条目已不存在；send_paste() 发送粘贴键；
+    read_clipboard() / write_clipboard(value) 用于恢复原剪贴板，可以不提供。
+    """
+
+    RESTORE_DELAY = 0.2  # 秒，给目标程序读取剪贴板的时间
+    KEY_RELEASE_TIMEOUT = 1.0
+
+    def __init__(self, key_tracker, set_clipboard, send_paste,
+                 read_clipboard=None, write_clipboard=None, on_done=None):
+        self.key_tracker = key_tracker
+        self.set_clipboard = set_clipboard
+        self.send_paste = send_paste
+        self.read_clipboard = read_clipboard
+        self.write_clipboard = write_clipboard
+        self.on_done = on_done
+        self.latencies = deque(maxlen=256)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='PasteWorker', daemon=True)
+        self._thread.start()
+
+    def submit(self, job):
+        self._queue.put(job)
+
+    def stop(self):
+        self._queue.put(None)
+        self._thread.join(timeout=2)
+
+    def latency_summary(self):
+        """最近粘贴延迟（毫秒）的统计"""
+        values = sorted(self.latencies)
+        if not values:
+            return {'count': 0}
+        return {
+            'count': len(values),
+            'mean_ms': sum(values) / len(values) * 1000,
+            'p50_ms': values[len(values) // 2] * 1000,
+            'p95_ms': values[min(len(values) - 1, int(len(values) * 0.95))] * 1000,
+            'last_ms': self.latencies[-1] * 1000,
+        }
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            try:
+                self._paste(job)
+            except Exception:
+                log.exception("Paste error")
+            if self.on_done is not None:
+                self.on_done(job)
+
+    def _paste(self, job):
+        previous = None
+        if job.restore and self.read_clipboard is not None:
+            previous = self.read_clipboard()
+        if not self.set_clipboard(job):
+            return
+        # 等待触发键松开，避免目标程序收到 alt+ctrl+v
+        self.key_tracker.wait_released(job.keys, self.KEY_RELEASE_TIMEOUT)
+        self.send_paste()
+        job.latency = time.perf_counter() - job.started
+        job.ok = True
+        self.latencies.append(job.latency)
+        if previous is not None and self.write_clipboard is not None:
+            time.sleep(self.RESTORE_DELAY)
+            self.write_clipboard(previous)
@@ -0,0 +1,204 @@
+from array import array
+from bisect import bisect_left
+from itertools import islice
+
+from clip_classify import TAGS
+from clip_history import HistoryObserver
+
+# 查询中按内容类型过滤的写法，如 "type:url github"
+TYPE_PREFIX = 'type:'
+
+
+def _grams(text):
+    """切分出文本中的字符二元组，以及非 ASCII 字符（中文等）的单字"""
+    grams = set()
+    for i in range(len(text) - 1):
+        grams.add(text[i:i + 2])
+    for ch in text:
+        if ord(ch) > 127:
+            grams.add(ch)
+    return grams
+
+
+def parse_query(query):
+    """把查询拆成 (要查找的文本, 要求的内容类型集合)；不认识的 type: 当作普通文本"""
+    words = []
+    tags = set()
+    for word in query.split():
+        tag = word[len(TYPE_PREFIX):].lower() if word.lower().startswith(TYPE_PREFIX) else None
+        if tag in TAGS:
+            tags.add(tag)
+        else:
+            words.append(word)
+    if not tags:
+        return query, frozenset()
+    return ' '.join(words), frozenset(tags)
+
+
+class SearchIndex(HistoryObserver):
+    """剪贴板历史的增量倒排索引
+
+    以字符二元组（以及中文单字）为词项，不需要分词器。倒排表是按条目 id
+    递增的 array，插入时直接追加；删除时只给条目的每个词项记一次失效，
+    某个倒排表中失效的 id 多于有效的 id 时才重建这一个倒排表（均摊 O(1)），
+    所有倒排表的总长度不超过有效条目词项数的两倍。
+    查询先用最短的倒排表求交集得到候选，再做一次子串校验，结果按新旧排序。
+    另外按内容类型记录条目 id 的集合，查询中的 type:xxx 只保留该类型的条目。
+    """
+
+    MAX_INDEXED_CHARS = 4096  # 超长条目只索引开头部分，其余部分查询时直接比对
+    SCAN_RATIO = 0.2  # 候选超过历史总量的这个比例时，改为从新到旧顺序扫描
+
+    def __init__(self, history):
+        self.history = history
+        self._postings = {}
+        # 词项 -> 倒排表中已删除条目的个数
+        self._dead = {}
+        # 只有部分内容进了索引的超长条目，查询时总是作为候选
+        self._overflow = set()
+        self._tagged = {tag: set() for tag in TAGS}
+        history.add_observer(self)
+        for entry in history:
+            self._add(entry)
+
+    def _add(self, entry):
+        if entry.length > self.MAX_INDEXED_CHARS:
+            self._overflow.add(entry.id)
+        text = entry.head(self.MAX_INDEXED_CHARS).casefold()
+        for gram in _grams(text):
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = array('I')
+            # 条目 id 单调递增（分页载入的旧条目也一样），追加即保持有序
+            posting.append(entry.id)
+        self._tag(entry)
+
+    def _tag(self, entry):
+        tags = entry.tags or ()
+        for tag, ids in self._tagged.items():
+            if tag in tags:
+                ids.add(entry.id)
+            else:
+                ids.discard(entry.id)
+
+    def history_inserted(self, row, count):
+        # 倒排表要求 id 递增，批量插入时从最旧的一行开始
+        for offset in reversed(range(count)):
+            self._add(self.history.entry_at(row + offset))
+
+    def history_changed(self, row):
+        # 内容类型在后台识别完成后才写入条目
+        self._tag(self.history.entry_at(row))
+
+    def history_about_to_remove(self, row):
+        entry = self.history.entry_at(row)
+        self._overflow.discard(entry.id)
+        for ids in self._tagged.values():
+            ids.discard(entry.id)
+        try:
+            text = entry.head(self.MAX_INDEXED_CHARS).casefold()
+        except (OSError, ValueError):
+            # 读不出正文时不计数，失效的 id 在这些倒排表下次重建时一并清除
+            return
+        for gram in _grams(text):
+            posting = self._postings.get(gram)
+            if posting is None:
+                continue
+            dead = self._dead.get(gram, 0) + 1
+            if dead * 2 > len(posting):
+                self._rebuild(gram, posting, entry.id)
+            else:
+                self._dead[gram] = dead
+
+    def _rebuild(self, gram, posting, removing):
+        """去掉倒排表中已删除的 id（removing 正在删除，仍在历史记录中）"""
+        get = self.history.get
+        live = array('I', (i for i in posting if i != removing and get(i) is not None))
+        self._dead.pop(gram, None)
+        if live:
+            self._postings[gram] = live
+        else:
+            del self._postings[gram]
+
+    def history_reset(self):
+        self._postings.clear()
+        self._dead.clear()
+        self._overflow.clear()
+        for ids in self._tagged.values():
+            ids.clear()
+
+    def search(self, query, limit=200):
+        """返回包含 query（不区分大小写）的条目，按从新到旧排序"""
+        return list(islice(self.iter_matches(query), limit))
+
+    def iter_matches(self, query):
+        """按从新到旧的顺序逐条产出匹配的条目
+
+        从其它线程调用时，每次取值都应持有 history.lock；两次取值之间
+        历史记录可能已经变化，已删除的条目会被跳过。
+        """
+        text, tags = parse_query(query)
+        if not tags:
+            yield from self._matches(text)
+        elif not text:
+            # 只按类型过滤：从最小的类型集合出发，按新旧排好再逐条校验
+            smallest = min((self._tagged[tag] for tag in tags), key=len)
+            yield from self._with_tags(self._verify(None, set(smallest)), tags)
+        else:
+            yield from self._with_tags(self._matches(text), tags)
+
+    @staticmethod
+    def _with_tags(entries, tags):
+        for entry in entries:
+            if entry.tags is not None and tags <= entry.tags:
+                yield entry
+
+    def _matches(self, query):
+        needle = query.casefold()
+        if not needle:
+            return
+        grams = _grams(needle)
+        if not grams:
+            yield from self._scan(needle)
+            return
+
+        postings = []
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                # 索引里没有这个词项，只可能出现在超长条目未索引的部分
+                yield from self._verify(needle, set(self._overflow))
+                return
+            postings.append((len(posting), gram))
+        postings.sort()
+        if postings[0][0] > len(self.history) * self.SCAN_RATIO:
+            yield from self._scan(needle)
+            return
+
+        smallest = self._postings[postings[0][1]]
+        others = [self._postings[gram] for _, gram in postings[1:]]
+        candidates = set(self._overflow)
+        for entry_id in smallest:
+            if all(self._contains(posting, entry_id) for posting in others):
+                candidates.add(entry_id)
+        yield from self._verify(needle, candidates)
+
+    @staticmethod
+    def _contains(posting, entry_id):
+        i = bisect_left(posting, entry_id)
+        return i < len(posting) and posting[i] == entry_id
+
+    def _verify(self, needle, candidates):
+        # 先按新旧排好候选，再逐条做子串校验，调用方取够即可停止
+        entries = [self.history.get(entry_id) for entry_id in candidates]
+        entries = [entry for entry in entries if entry is not None]
+        entries.sort(key=self.history.row_of_entry)
+        for entry in entries:
+            if entry.slot >= 0 and (needle is None or entry.contains(needle)):
+                yield entry
+
+    def _scan(self, needle):
+        # 候选太多时，按从新到旧的顺序直接比对
+        for entry in self.history:
+            if entry.contains(needle):
+                yield entry
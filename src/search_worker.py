@@ -0,0 +1,99 @@
+from itertools import islice
+
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
+
+
+class SearchWorker(QObject):
+    """在后台线程里执行搜索，并分批送回结果"""
+
+    # (查询代号, 条目 id 列表, 是否已结束)
+    chunk_ready = pyqtSignal(int, list, bool)
+
+    FIRST_CHUNK = 30  # 第一批足够填满一屏
+    CHUNK = 200
+    MAX_RESULTS = 2000
+
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+        # 最新查询的代号，由界面线程写入；与之不符的查询会被放弃
+        self.generation = 0
+
+    @pyqtSlot(int, str)
+    def run(self, generation, query):
+        matches = self.index.iter_matches(query)
+        history = self.index.history
+        sent = 0
+        size = self.FIRST_CHUNK
+        while generation == self.generation:
+            # 每一批在持有锁时计算，批与批之间让界面线程可以修改历史
+            with history.lock:
+                chunk = [entry.id for entry in islice(matches, size)]
+            sent += len(chunk)
+            done = len(chunk) < size or sent >= self.MAX_RESULTS
+            if generation != self.generation:
+                return
+            self.chunk_ready.emit(generation, chunk, done)
+            if done:
+                return
+            size = min(self.CHUNK, self.MAX_RESULTS - sent)
+
+
+class SearchController(QObject):
+    """搜索框与搜索线程之间的调度
+
+    输入停顿 DEBOUNCE_MS 后才发起查询；新的查询会让旧查询在下一批结束时放弃。
+    """
+
+    search_requested = pyqtSignal(int, str)
+    # 查询是否生效（搜索框非空）
+    active_changed = pyqtSignal(bool)
+
+    DEBOUNCE_MS = 150
+
+    def __init__(self, index, result_model, parent=None):
+        super().__init__(parent)
+        self.result_model = result_model
+        self.generation = 0
+        self.query = ''
+        self.active = False
+
+        self.thread = QThread(self)
+        self.worker = SearchWorker(index)
+        self.worker.moveToThread(self.thread)
+        self.search_requested.connect(self.worker.run)
+        self.worker.chunk_ready.connect(self.on_chunk_ready)
+        self.thread.start()
+
+        self.debounce = QTimer(self)
+        self.debounce.setSingleShot(True)
+        self.debounce.setInterval(self.DEBOUNCE_MS)
+        self.debounce.timeout.connect(self.dispatch)
+
+    def set_query(self, text):
+        """搜索框内容变化时调用"""
+        self.query = text.strip()
+        self.debounce.start()
+
+    def dispatch(self):
+        self.generation += 1
+        self.worker.generation = self.generation
+        self.result_model.reset_results()
+        active = bool(self.query)
+        if active != self.active:
+            self.active = active
+            self.active_changed.emit(active)
+        if active:
+            self.search_requested.emit(self.generation, self.query)
+
+    @pyqtSlot(int, list, bool)
+    def on_chunk_ready(self, generation, entry_ids, done):
+        # 过期查询的结果直接丢弃
+        if generation == self.generation:
+            self.result_model.append_results(entry_ids)
+
+    def shutdown(self):
+        self.debounce.stop()
+        self.worker.generation = -1
+        self.thread.quit()
+        self.thread.wait()
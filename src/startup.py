@@ -0,0 +1,56 @@
+import time
+
+# 各阶段相对于 main.py 开始执行的时间上限（毫秒）
+DEFAULT_BUDGET = {
+    'import': 400,
+    'construct': 700,
+    'first_paint': 1000,
+    'hotkeys_ready': 1500,
+}
+
+
+class StartupTimeline:
+    """记录启动各阶段完成的时间
+
+    main.py 最先导入本模块，之后依次标记：
+    import（模块导入完成）、construct（主窗口构造完成）、
+    first_paint（第一帧绘制）、hotkeys_ready（托盘和全局快捷键就绪）。
+    """
+
+    def __init__(self, origin=None):
+        self.origin = origin if origin is not None else time.perf_counter()
+        self.marks = []
+
+    def mark(self, name):
+        self.marks.append((name, time.perf_counter() - self.origin))
+
+    def elapsed_ms(self, name):
+        """阶段完成时距开始的毫秒数，没有记录时返回 None"""
+        for mark, seconds in self.marks:
+            if mark == name:
+                return seconds * 1000
+        return None
+
+    def as_dict(self):
+        return {name: seconds * 1000 for name, seconds in self.marks}
+
+    def report(self):
+        lines = []
+        previous = 0.0
+        for name, seconds in self.marks:
+            lines.append(f"{name:<14} {seconds * 1000:8.1f} ms  (+{(seconds - previous) * 1000:.1f})")
+            previous = seconds
+        return '\n'.join(lines)
+
+    def over_budget(self, budget=None):
+        """返回超出预算的阶段 [(name, 实际毫秒或 None, 预算毫秒)]，缺少的阶段也算超出"""
+        violations = []
+        for name, limit in (budget or DEFAULT_BUDGET).items():
+            elapsed = self.elapsed_ms(name)
+            if elapsed is None or elapsed > limit:
+                violations.append((name, elapsed, limit))
+        return violations
+
+
+# 进程内唯一的时间线，导入时开始计时
+timeline = StartupTimeline()
@@ -0,0 +1,85 @@
+import random
+
+from clip_eviction import HistoryLimits
+from clip_frecency import FrecencyView
+from clip_history import ClipHistory, HistoryObserver
+
+
+class Mirror(HistoryObserver):
+    """只根据 FrecencyView 转发的通知维护的条目列表"""
+
+    def __init__(self, view):
+        self.view = view
+        self.rows = [view.entry_at(row) for row in range(len(view))]
+        self._move = None
+        view.add_observer(self)
+
+    def history_inserted(self, row, count):
+        self.rows[row:row] = [self.view.entry_at(row + offset) for offset in range(count)]
+
+    def history_about_to_remove(self, row):
+        assert self.rows[row] is self.view.entry_at(row)
+
+    def history_removed(self, row):
+        del self.rows[row]
+
+    def history_about_to_move(self, row, dest):
+        assert dest != row and dest != row + 1
+        self._move = (row, dest)
+
+    def history_moved(self, row, dest):
+        assert self._move == (row, dest)
+        entry = self.rows.pop(row)
+        self.rows.insert(dest - 1 if dest > row else dest, entry)
+        self._move = None
+
+    def history_changed(self, row):
+        assert self.rows[row] is self.view.entry_at(row)
+
+    def history_used(self, row):
+        assert self.rows[row] is self.view.entry_at(row)
+
+    def history_reset(self):
+        self.rows = [self.view.entry_at(row) for row in range(len(self.view))]
+
+
+def check(view, mirror):
+    assert len(view) == len(mirror.rows)
+    for row, entry in enumerate(mirror.rows):
+        assert view.entry_at(row) is entry
+        assert view.row_of_entry(entry) == row
+        assert view.get_by_number(row + 1) is entry
+    top = [entry.score for entry in mirror.rows[:len(view.top())]]
+    assert top == sorted(top, reverse=True)
+
+
+def test_forwarded_rows_match_view():
+    rng = random.Random(19)
+    history = ClipHistory(limits=HistoryLimits(max_entries=60))
+    view = FrecencyView(history, slots=5)
+    mirror = Mirror(view)
+    older = 0
+    for step in range(4000):
+        action = rng.random()
+        if action < 0.3 or len(history) < 10:
+            history.add(f'item {rng.randrange(150)}')
+        elif action < 0.35:
+            history.add_many([(f'batch {rng.randrange(150)}', None) for _ in range(rng.randrange(1, 4))])
+        elif action < 0.4:
+            older += 1
+            history.append_older(f'older {older}', created=0)
+        else:
+            entry = history.entry_at(rng.randrange(len(history)))
+            if action < 0.65:
+                history.mark_pasted(entry.id, now=step)
+            elif action < 0.75:
+                history.bump(entry.id, now=step)
+            elif action < 0.8:
+                history.move_to_front(entry.id)
+            elif action < 0.9:
+                history.remove(entry.id)
+            else:
+                history.set_pinned(entry.id, not entry.pinned)
+        check(view, mirror)
+    history.clear()
+    check(view, mirror)
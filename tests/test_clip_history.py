@@ -0,0 +1,86 @@
+import random
+
+from clip_history import ClipHistory, _LiveCounter
+
+
+def test_live_counter_matches_brute_force():
+    rng = random.Random(1)
+    values = [rng.randrange(2) for _ in range(37)]
+    counter = _LiveCounter(values)
+    for step in range(2000):
+        if rng.random() < 0.1:
+            value = rng.randrange(2)
+            values.append(value)
+            counter.append(value)
+        else:
+            slot = rng.randrange(len(values))
+            delta = 1 - 2 * values[slot]
+            values[slot] += delta
+            counter.add(slot, delta)
+        count = rng.randrange(len(values) + 1)
+        assert counter.prefix(count) == sum(values[:count])
+        live = [slot for slot, value in enumerate(values) if value]
+        if live:
+            rank = rng.randrange(1, len(live) + 1)
+            assert counter.select(rank) == live[rank - 1]
+
+
+def test_add_deduplicates_without_reordering():
+    history = ClipHistory()
+    first, added = history.add('a')
+    assert added
+    history.add('b')
+    again, added = history.add('a')
+    assert again is first and not added
+    assert [entry.text for entry in history] == ['b', 'a']
+    assert len(history) == 2
+
+
+def test_move_to_front_and_numbers():
+    history = ClipHistory()
+    entries = [history.add(text)[0] for text in 'abcde']
+    assert history.get_by_number(1) is entries[-1]
+    assert history.move_to_front(entries[1].id) == 3
+    assert [entry.text for entry in history] == list('bedca')
+    assert history.get_by_number(1) is entries[1]
+    assert history.get_by_number(5) is entries[0]
+    assert history.get_by_number(6) is None
+    assert history.get_by_number(0) is None
+    assert history.row_of_entry(entries[3]) == 2
+
+
+def test_random_operations_match_reference_list():
+    rng = random.Random(2)
+    history = ClipHistory()
+    reference = []  # 从新到旧的内容
+    older = 0
+    for step in range(5000):
+        action = rng.random()
+        if action < 0.4 or not reference:
+            text = f'item {rng.randrange(300)}'
+            _, added = history.add(text)
+            assert added == (text not in reference)
+            if added:
+                reference.insert(0, text)
+        elif action < 0.45:
+            older += 1
+            text = f'older {older}'
+            history.append_older(text)
+            reference.append(text)
+        elif action < 0.7:
+            row = rng.randrange(len(reference))
+            entry = history.entry_at(row)
+            assert history.remove(entry.id) == row
+            del reference[row]
+        else:
+            row = rng.randrange(len(reference))
+            assert history.move_to_front(history.entry_at(row).id) == row
+            reference.insert(0, reference.pop(row))
+        assert len(history) == len(reference)
+        row = rng.randrange(len(reference)) if reference else 0
+        if reference:
+            entry = history.get_by_number(row + 1)
+            assert entry.text == reference[row]
+            assert history.row_of_entry(entry) == row
+            assert history.find(reference[row]) is entry
+    assert [entry.text for entry in history] == reference
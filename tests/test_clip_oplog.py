@@ -0,0 +1,85 @@
+from blob_store import BlobStore
+from clip_history import BLOB_THRESHOLD, ClipHistory
+from clip_oplog import OpLog, Replicator
+from clip_sync import DirectorySync
+import clip_oplog
+
+
+class Replica:
+    def __init__(self, root, shared):
+        self.history = ClipHistory(BlobStore(str(root / 'blobs')))
+        self.oplog = OpLog(str(root / 'oplog'), self.history.blob_store)
+        self.replicator = Replicator(self.history, self.oplog)
+        self.sync = DirectorySync(self.replicator, str(shared))
+
+    def state(self):
+        return [(entry.text, entry.pinned) for entry in self.history]
+
+
+def sync_all(*replicas):
+    for _ in range(2):
+        for replica in replicas:
+            replica.sync.sync()
+
+
+def test_pin_remove_readd_converges(tmp_path):
+    a = Replica(tmp_path / 'a', tmp_path / 'shared')
+    b = Replica(tmp_path / 'b', tmp_path / 'shared')
+    entry, _ = a.history.add('pinned then removed')
+    a.history.set_pinned(entry.id, True)
+    a.history.remove(entry.id)
+    a.history.add('pinned then removed')
+    sync_all(a, b)
+    assert a.state() == [('pinned then removed', False)]
+    assert b.state() == a.state()
+
+
+def test_pin_remove_readd_converges_across_syncs(tmp_path):
+    a = Replica(tmp_path / 'a', tmp_path / 'shared')
+    b = Replica(tmp_path / 'b', tmp_path / 'shared')
+    entry, _ = a.history.add('x')
+    a.history.set_pinned(entry.id, True)
+    sync_all(a, b)
+    assert b.state() == [('x', True)]
+    a.history.remove(entry.id)
+    sync_all(a, b)
+    assert b.state() == []
+    a.history.add('x')
+    sync_all(a, b)
+    assert a.state() == b.state() == [('x', False)]
+
+
+def test_blob_insert_is_logged_by_digest(tmp_path):
+    a = Replica(tmp_path / 'a', tmp_path / 'shared')
+    b = Replica(tmp_path / 'b', tmp_path / 'shared')
+    text = 'b' * (BLOB_THRESHOLD + 1)
+    a.history.add(text)
+    a.oplog.flush()
+    with open(tmp_path / 'a' / 'oplog' / (a.oplog.replica + '.jsonl'), encoding='utf-8') as f:
+        assert text not in f.read()
+    sync_all(a, b)
+    assert b.state() == [(text, False)]
+
+
+def test_compaction_keeps_state_and_unseen_ops(tmp_path, monkeypatch):
+    monkeypatch.setattr(clip_oplog, 'COMPACT_OPS', 10)
+    a = Replica(tmp_path / 'a', tmp_path / 'shared')
+    b = Replica(tmp_path / 'b', tmp_path / 'shared')
+    for i in range(30):
+        a.history.add(f'item {i}')
+    for entry in list(a.history)[:10]:
+        a.history.remove(entry.id)
+    sync_all(a, b)
+    # 两边都已看到全部操作，日志被整理
+    assert a.oplog._base.get(a.oplog.replica) == a.oplog.clock[a.oplog.replica]
+    a.history.add('after compaction')
+    a.oplog.flush()
+    assert [op.text for op in a.oplog.ops_since(b.oplog.clock)] == ['after compaction']
+
+    a.oplog.close()
+    reopened = OpLog(str(tmp_path / 'a' / 'oplog'))
+    assert reopened.clock == a.oplog.clock
+    assert reopened._tags == a.oplog._tags
+    assert reopened._removed == a.oplog._removed
+    sync_all(a, b)
+    assert a.state() == b.state()
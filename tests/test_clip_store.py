@@ -0,0 +1,86 @@
+from clip_eviction import HistoryLimits
+from clip_history import ClipHistory
+from clip_store import HistoryStore
+
+
+def test_failed_write_does_not_stop_writer(tmp_path, caplog):
+    path = str(tmp_path / 'history.db')
+    store = HistoryStore(path)
+    history = ClipHistory()
+    store.attach(history)
+    history.add('before')
+    # 不是条目的对象，写入时出错
+    store._queue.put(('put', object(), 0))
+    history.add('after')
+    store.flush()
+    assert store._writer.is_alive()
+    assert 'Error writing history change put' in caplog.text
+    store.close()
+
+    reopened = HistoryStore(path)
+    history = ClipHistory()
+    reopened.attach(history)
+    assert [entry.text for entry in history] == ['after', 'before']
+    reopened.close()
+
+
+def stored_rows(path):
+    import sqlite3
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute('SELECT COUNT(*), SUM(pinned) FROM clips').fetchone()
+    finally:
+        conn.close()
+
+
+def test_limits_apply_to_rows_on_disk(tmp_path):
+    path = str(tmp_path / 'history.db')
+    for session in range(4):
+        history = ClipHistory(limits=HistoryLimits(max_entries=100))
+        store = HistoryStore(path)
+        store.attach(history)
+        if session == 0:
+            entry, _ = history.add('pinned')
+            history.set_pinned(entry.id, True)
+        for i in range(150):
+            history.add(f'session {session} copy {i}')
+        store.flush()
+        assert len(history) <= 100
+        store.close()
+        assert stored_rows(path) == (100, 1)
+
+    history = ClipHistory(limits=HistoryLimits(max_entries=100))
+    store = HistoryStore(path)
+    store.attach(history)
+    while store.has_more():
+        store.load_older()
+    texts = {entry.text for entry in history}
+    assert len(texts) == 100
+    assert 'pinned' in texts and 'session 3 copy 149' in texts
+    store.close()
+
+
+def test_age_and_byte_limits_apply_to_rows_on_disk(tmp_path):
+    path = str(tmp_path / 'history.db')
+    history = ClipHistory()
+    store = HistoryStore(path)
+    store.attach(history)
+    for i in range(200):
+        history.add(f'{i:04d}' + 'x' * 96, created=1000.0 + i)
+    store.close()
+
+    history = ClipHistory(limits=HistoryLimits(max_bytes=10000, max_age=1e12))
+    store = HistoryStore(path)
+    store.attach(history)
+    store.flush()
+    assert stored_rows(path)[0] == 100
+    store.close()
+
+    history = ClipHistory(limits=HistoryLimits(max_age=1))
+    store = HistoryStore(path)
+    store.attach(history)
+    store.flush()
+    # 已载入的第一页由 ClipHistory 按时间清理，其余的在数据库里清理
+    assert len(history) == 0
+    assert stored_rows(path)[0] == 0
+    store.close()
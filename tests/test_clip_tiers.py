@@ -0,0 +1,38 @@
+import random
+
+from clip_frecency import FrecencyView
+from clip_history import ClipHistory
+from clip_tiers import MemoryGovernor
+
+
+def check_hot(governor):
+    spilled = [entry_id for entry_id in governor._protected() if entry_id in governor._spilled]
+    assert spilled == []
+
+
+def test_protected_entries_are_never_spilled(tmp_path):
+    rng = random.Random(7)
+    history = ClipHistory()
+    view = FrecencyView(history)
+    governor = MemoryGovernor(history, str(tmp_path / 'spill'), 4000, view)
+    texts = {}
+    try:
+        for step in range(3000):
+            action = rng.random()
+            if action < 0.5 or len(history) < 20:
+                text = f'entry {rng.randrange(400)} ' + 'x' * rng.randrange(50, 300)
+                entry, _ = history.add(text)
+                texts[entry.id] = entry.text
+            else:
+                entry = history.entry_at(rng.randrange(len(history)))
+                if action < 0.7:
+                    history.remove(entry.id)
+                elif action < 0.85:
+                    history.mark_pasted(entry.id)
+                else:
+                    history.bump(entry.id)
+            check_hot(governor)
+        assert governor.spilled_count
+        assert all(entry.text == texts[entry.id] for entry in history)
+    finally:
+        governor.close()
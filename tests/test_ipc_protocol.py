@@ -0,0 +1,40 @@
+from clip_history import ClipHistory
+from ipc_protocol import CommandHandler
+from search_index import SearchIndex
+
+
+def make_handler():
+    history = ClipHistory()
+    history.add('first')
+    history.add('second')
+    return CommandHandler(history, SearchIndex(history))
+
+
+def test_bad_argument_types_are_rejected():
+    handler = make_handler()
+    results = handler.handle_batch([
+        {'op': 'search', 'q': 5},
+        {'op': 'get', 'n': '1'},
+        {'op': 'list', 'limit': True},
+        {'op': 'sync_pull', 'clock': []},
+        {'op': 'sync_pull', 'clock': {'a': 'x'}},
+        {'op': 'sync_push', 'ops': [1]},
+        'get',
+        {'op': 'get', 'n': 1},
+    ])
+    assert [result['ok'] for result in results] == [False] * 7 + [True]
+    assert results[0]['error'] == 'q must be a string'
+    assert results[3]['error'] == 'clock must be an object'
+    assert results[-1]['text'] == 'second'
+
+
+def test_unexpected_error_is_reported_per_command(caplog):
+    handler = make_handler()
+
+    def broken(command, entry_id):
+        raise AttributeError('boom')
+
+    handler.op_broken = broken
+    results = handler.handle_batch([{'op': 'broken'}, {'op': 'ping'}])
+    assert results == [{'ok': False, 'error': 'internal error'}, {'ok': True, 'items': 2}]
+    assert 'boom' in caplog.text
@@ -0,0 +1,15 @@
+from clip_eviction import HistoryLimits
+from clip_history import ClipHistory
+from search_index import SearchIndex, _grams
+
+
+def test_postings_stay_bounded_under_churn():
+    history = ClipHistory(limits=HistoryLimits(max_entries=1000))
+    index = SearchIndex(history)
+    for i in range(100000):
+        history.add(f'copied item {i} at {i * 7919 % 100003}')
+    live = sum(len(_grams(entry.text.casefold())) for entry in history)
+    total = sum(len(posting) for posting in index._postings.values())
+    assert len(history) == 1000
+    assert total <= 2 * live
+    assert [entry.text for entry in index.search('item 99999 ')] == [f'copied item 99999 at {99999 * 7919 % 100003}']